@@ -0,0 +1,77 @@
+"""
+Compares how far from the airdrop target the aircraft stops with the old trigger, which
+sends the loiter once a 100 ms check finds it inside the drop radius, against the
+DropPredictor, which sends it early by the measured command latency and the braking
+distance. Each approach is flown at constant speed along a straight line passing the
+target, with a random mode change latency around --latency and a braking deceleration
+around --decel, both unknown to the trigger beyond their configured values. Run from the
+repository root:
+
+    python -m benchmarks.airdrop [--speeds 5 10 15 20] [--approaches 200]
+"""
+import argparse
+
+import numpy as np
+
+from src.library.airdrop import DropPredictor
+from src.library.location import Location
+from src.library.projection import LocalProjection
+
+POLL = 0.1
+
+
+def stop_distance(start, velocity, fire, latency, decel):
+    """distance from the target (the origin) where the aircraft stops, loiter sent at time fire"""
+    position = start + velocity * (fire + latency)
+    speed = np.hypot(*velocity)
+    return np.hypot(*(position + velocity / speed * speed ** 2 / (2 * decel)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--speeds", type=float, nargs="+", default=[5, 10, 15, 20], help="m/s")
+    parser.add_argument("--approaches", type=int, default=200, help="approaches per speed")
+    parser.add_argument("--radius", type=float, default=1, help="drop radius, metres")
+    parser.add_argument("--latency", type=float, default=0.5, help="mean mode change latency, seconds")
+    parser.add_argument("--decel", type=float, default=2.5, help="mean braking deceleration, m/s^2")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    projection = LocalProjection(49.2578, -123.2470)
+    predictor = DropPredictor(projection, Location(49.2578, -123.2470, 0), args.radius, args.decel)
+    print("%.0f m radius, latency %.2f s and deceleration %.1f m/s^2 +-20%%, %d approaches per speed" % (
+        args.radius, args.latency, args.decel, args.approaches))
+    print("%8s  %14s  %14s  %14s" % ("speed", "radius trigger", "predictive", "predicted err"))
+    for speed in args.speeds:
+        old, new, errors = [], [], []
+        for _ in range(args.approaches):
+            heading = rng.uniform(0, 2 * np.pi)
+            direction = np.array([np.sin(heading), np.cos(heading)])
+            # 300 m out, passing within half the radius of the target
+            side = np.array([direction[1], -direction[0]]) * rng.uniform(-0.5, 0.5) * args.radius
+            start, velocity = side - direction * 300, direction * speed
+            latency = args.latency * rng.uniform(0.8, 1.2)
+            decel = args.decel * rng.uniform(0.8, 1.2)
+            phase = rng.uniform(0, POLL)
+
+            # checks every POLL seconds, from a random phase
+            checks = phase + POLL * np.arange(int(600 / speed / POLL))
+            positions = start + velocity * checks[:, None]
+            inside = np.flatnonzero(np.hypot(*positions.T) < args.radius)
+            if len(inside):
+                old.append(stop_distance(start, velocity, checks[inside[0]], latency, decel))
+
+            for check, position in zip(checks, positions):
+                plan = predictor.plan(position, velocity, args.latency)
+                if plan["fire_in"] is not None and plan["fire_in"] < POLL:
+                    actual = stop_distance(start, velocity, check + plan["fire_in"], latency, decel)
+                    new.append(actual)
+                    errors.append(abs(actual - plan["predicted"]))
+                    break
+
+        print("%6.0f m/s  %10.2f m    %10.2f m    %10.2f m" % (
+            speed, np.mean(old) if old else np.nan, np.mean(new), np.mean(errors)))
+
+
+if __name__ == "__main__":
+    main()
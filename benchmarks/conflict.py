@@ -0,0 +1,84 @@
+"""
+Measures conflict prediction for random moving obstacle tracks around our own: the
+vectorised closest_approach against a per-track loop, and a ConflictMonitor.check as
+run on every GLOBAL_POSITION_INT. Reports the time per position update and the share
+of a 10 Hz telemetry period it takes, and checks that both give the same answers. Run
+from the repository root:
+
+    python -m benchmarks.conflict [--tracks 100 300 1000] [--repeat 200]
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from src.library.conflict import ConflictMonitor, closest_approach
+from src.library.projection import LocalProjection
+
+PERIOD = 0.1  # 10 Hz telemetry
+
+
+def loop(position, velocity, positions, velocities, horizon):
+    times, distances = [], []
+    for p, v in zip(positions.tolist(), velocities.tolist()):
+        offset = [p[i] - position[i] for i in range(3)]
+        closing = [v[i] - velocity[i] for i in range(3)]
+        speed2 = sum(c * c for c in closing)
+        t = -sum(o * c for o, c in zip(offset, closing)) / speed2 if speed2 > 0 else 0
+        t = min(max(t, 0), horizon)
+        times.append(t)
+        distances.append(math.sqrt(sum((o + c * t) ** 2 for o, c in zip(offset, closing))))
+    return np.array(times), np.array(distances)
+
+
+def timed(repeat, function, *args):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function(*args)
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--repeat", type=int, default=200, help="position updates timed per count")
+    parser.add_argument("--field", type=float, default=5000, help="side of the square field, metres")
+    parser.add_argument("--horizon", type=float, default=60, help="seconds")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    projection = LocalProjection(49.2578, -123.2470)
+    position, velocity = (0.0, 0.0, 30.0), (15.0, 5.0, 0.0)
+    print("%.0f m field, tracks at up to 30 m/s, %.0f s horizon, %.0f ms telemetry period" % (
+        args.field, args.horizon, PERIOD * 1000))
+    print("%8s  %10s  %10s  %10s  %8s  %9s" % ("tracks", "vectorised", "loop", "check", "period", "conflicts"))
+    for count in args.tracks:
+        positions = np.column_stack([rng.uniform(-args.field / 2, args.field / 2, (count, 2)),
+                                     rng.uniform(0, 120, count)])
+        velocities = rng.uniform(-30, 30, (count, 3)) * [1, 1, 0.1]
+
+        expected, looped = timed(max(args.repeat // 10, 1), loop, position, velocity, positions, velocities,
+                                 args.horizon)
+        result, vectorised = timed(args.repeat, closest_approach, position, velocity, positions, velocities,
+                                   args.horizon)
+        if not (np.allclose(result[0], expected[0]) and np.allclose(result[1], expected[1])):
+            raise Exception("The vectorised and looped closest approaches disagree")
+
+        monitor = ConflictMonitor(projection, separation=30, horizon=args.horizon)
+        tracks = []
+        for (east, north, up), (ve, vn, vu) in zip(positions.tolist(), velocities.tolist()):
+            location = projection.from_enu(east, north, up)
+            tracks.append({"lat": location.lat, "lng": location.lng, "alt": location.alt,
+                           "vx": vn, "vy": ve, "vz": -vu, "timestamp": 0})
+        monitor.set_tracks(tracks)
+        here = projection.from_enu(*position)
+        own = (here.lat, here.lng, here.alt, (velocity[1], velocity[0], -velocity[2]), 0)
+        conflicts, check = timed(args.repeat, monitor.check, *own)
+
+        print("%8d  %7.1f us  %7.1f us  %7.1f us  %7.2f%%  %9d" % (
+            count, vectorised * 1e6, looped * 1e6, check * 1e6, check / PERIOD * 100, len(conflicts)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Feeds recorded messages through the per-message work of Telemetry.poll_for_data and
+reports messages per second on one core.
+
+    legacy    two string keyed Observables (observers + wait notifiers), snapshot
+              update for every message
+    dispatch  Dispatcher keyed by message id; untracked ids are skipped
+
+Run from the repository root:
+
+    python -m benchmarks.dispatch_throughput [--tlog flight.tlog] [--repeat 20]
+"""
+import argparse
+import time
+from functools import partial
+
+from observable import Observable
+
+from benchmarks.recording import decode, load_tlog, synthetic_stream
+from src.library.dispatch import Dispatcher
+from src.library.snapshots import SnapshotStore
+from src.library.waiters import MessageWaiters
+
+OBSERVED = ("HEARTBEAT", "GLOBAL_POSITION_INT", "VFR_HUD", "GPS_RAW_INT")
+
+
+class State:
+    """stands in for the Telemetry attributes the observers write"""
+    lat = lng = alt = heading = groundspeed = base_mode = None
+
+
+def observers(state):
+    def hb_listener(msg):
+        state.base_mode = msg.base_mode
+
+    def gpi_listener(msg):
+        state.alt = msg.relative_alt / 1000
+        state.heading = msg.hdg / 100
+
+    def vfr_listener(msg):
+        state.groundspeed = msg.groundspeed
+
+    def gps_listener(msg):
+        state.lat = msg.lat * 1.0e-7
+        state.lng = msg.lon * 1.0e-7
+
+    return dict(zip(OBSERVED, (hb_listener, gpi_listener, vfr_listener, gps_listener)))
+
+
+def legacy_path():
+    event = Observable()
+    notifiers = Observable()
+    snapshots = SnapshotStore(MessageWaiters())
+    for msg_type, handler in observers(State()).items():
+        event.on(msg_type, handler)
+
+    def process(msg):
+        event.trigger(msg.get_type(), msg)
+        snapshots.update(msg.get_type(), msg)
+        notifiers.trigger(msg.get_type(), msg)
+
+    return process
+
+
+def dispatch_path():
+    dispatcher = Dispatcher()
+    waiters = MessageWaiters()
+    snapshots = SnapshotStore(waiters)
+    for msg_type, handler in observers(State()).items():
+        dispatcher.on(msg_type, handler)
+
+    def record(msg_type, msg):
+        snapshots.update(msg_type, msg)
+        waiters.notify(msg_type, msg)
+
+    for msg_type in OBSERVED:
+        dispatcher.on(msg_type, partial(record, msg_type), last=True)
+    return dispatcher.dispatch
+
+
+def measure(process, messages, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        for msg in messages:
+            process(msg)
+    elapsed = time.process_time() - start
+    return len(messages) * repeat / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tlog", help="telemetry log to replay instead of the synthetic stream")
+    parser.add_argument("--repeat", type=int, default=20, help="passes over the recording")
+    args = parser.parse_args()
+
+    frames = load_tlog(args.tlog) if args.tlog else synthetic_stream()
+    messages = decode(frames)
+    print("%d recorded messages, %d passes" % (len(messages), args.repeat))
+    for name, process in (("legacy", legacy_path()), ("dispatch", dispatch_path())):
+        print("%-8s %12.0f msg/s" % (name, measure(process, messages, args.repeat)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+A minimal ArduPilot stand-in for benchmarking ACOM's MAVLink transfers without SITL.
+
+FakeAutopilot listens on a local TCP port and emulates a telemetry radio: every frame
+in either direction takes len * 10 / baud seconds on the wire plus a fixed latency,
+and frames can be dropped at random. It streams HEARTBEAT, GPS_RAW_INT,
+GLOBAL_POSITION_INT, VFR_HUD and MISSION_CURRENT, and implements the mission
+protocol (upload, partial write, download and clear).
+
+connect() returns a vehicle-like object with a running Telemetry and Waypoints, the
+same way Vehicle.setup_mavlink_connection wires them.
+"""
+import queue
+import random
+import socket
+import threading
+import time
+from types import SimpleNamespace
+
+from pymavlink import mavutil
+from pymavlink.dialects.v20 import all as mavlink2
+
+# seconds the autopilot waits for the next mission item before requesting it again
+REQUEST_TIMEOUT = 0.75
+
+
+class Link:
+    """one direction of the emulated radio link"""
+
+    def __init__(self, baud, latency, loss, rng):
+        self.seconds_per_byte = 10 / baud if baud else 0
+        self.latency = latency
+        self.loss = loss
+        self.rng = rng
+        self.free_at = 0
+        self.queue = queue.Queue()
+
+    def put(self, item, size):
+        if self.loss and self.rng.random() < self.loss:
+            return
+        now = time.monotonic()
+        # frames are serialised one after another on the wire
+        self.free_at = max(now, self.free_at) + size * self.seconds_per_byte
+        self.queue.put((self.free_at + self.latency, item))
+
+    def get(self):
+        deliver_at, item = self.queue.get()
+        delay = deliver_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return item
+
+
+class FakeAutopilot:
+    def __init__(self, baud=57600, latency=0.02, loss=0.0, stream_rate=10, legacy_requests=False, seed=0):
+        """
+        Args:
+            baud (number, optional): emulated radio baud rate, 0 for no serialisation delay
+            latency (number, optional): one way latency in seconds
+            loss (number, optional): probability of dropping a frame, in each direction
+            stream_rate (number, optional): hz of the position streams, 0 to disable
+            legacy_requests (bool, optional): request items with MISSION_REQUEST instead
+                of MISSION_REQUEST_INT, like older firmware
+            seed (number, optional): random seed for frame loss
+        """
+        rng = random.Random(seed)
+        self.uplink = Link(baud, latency, loss, rng)  # acom -> autopilot
+        self.downlink = Link(baud, latency, loss, rng)  # autopilot -> acom
+        self.stream_rate = stream_rate
+        self.legacy_requests = legacy_requests
+
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(1)
+        self.port = self.server.getsockname()[1]
+        self.client = None
+
+        self.send_lock = threading.Lock()
+        self.mav = mavlink2.MAVLink(None, srcSystem=1, srcComponent=1)
+        self.parser = mavlink2.MAVLink(None)
+
+        self.mission = []  # MISSION_ITEM_INT messages
+        self.upload = None
+        self.upload_requested_at = None
+        self.position = (49.2578, -123.2470, 100.0)
+        self.items_received = 0
+        self.requests_sent = 0
+        self.running = True
+
+    # link
+
+    def start(self):
+        threading.Thread(target=self.serve, daemon=True).start()
+        return self
+
+    def serve(self):
+        self.client, _ = self.server.accept()
+        self.client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        for target in (self.read, self.process, self.write, self.stream, self.watchdog):
+            threading.Thread(target=target, daemon=True).start()
+
+    def read(self):
+        while self.running:
+            data = self.client.recv(4096)
+            if not data:
+                self.running = False
+                return
+            msg = self.parser.parse_char(data)
+            while msg is not None:
+                if msg.get_type() != "BAD_DATA":
+                    self.uplink.put(msg, len(msg.get_msgbuf()))
+                msg = self.parser.parse_char(b"")
+
+    def write(self):
+        while self.running:
+            frame = self.downlink.get()
+            try:
+                self.client.sendall(frame)
+            except OSError:
+                self.running = False
+
+    def send(self, msg):
+        with self.send_lock:
+            frame = bytes(msg.pack(self.mav))
+        self.downlink.put(frame, len(frame))
+
+    def close(self):
+        self.running = False
+        if self.client is not None:
+            self.client.close()
+        self.server.close()
+
+    # telemetry
+
+    def stream(self):
+        next_heartbeat = 0
+        next_current = 0
+        period = 1 / self.stream_rate if self.stream_rate else 1
+        while self.running:
+            now = time.monotonic()
+            if now >= next_heartbeat:
+                self.send(mavlink2.MAVLink_heartbeat_message(
+                    mavutil.mavlink.MAV_TYPE_QUADROTOR, mavutil.mavlink.MAV_AUTOPILOT_ARDUPILOTMEGA,
+                    mavutil.mavlink.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED, 0, mavutil.mavlink.MAV_STATE_STANDBY, 3))
+                next_heartbeat = now + 1
+            if now >= next_current:
+                self.send(mavlink2.MAVLink_mission_current_message(0, len(self.mission)))
+                next_current = now + 1
+            if self.stream_rate:
+                lat, lng, alt = self.position
+                boot_ms = int(now * 1000) & 0xFFFFFFFF
+                self.send(mavlink2.MAVLink_gps_raw_int_message(
+                    boot_ms * 1000, 3, int(lat * 1e7), int(lng * 1e7), int(alt * 1000), 100, 100, 0, 0, 10))
+                self.send(mavlink2.MAVLink_global_position_int_message(
+                    boot_ms, int(lat * 1e7), int(lng * 1e7), int(alt * 1000), int(alt * 1000), 0, 0, 0, 0))
+                self.send(mavlink2.MAVLink_vfr_hud_message(0, 0, 0, 0, alt, 0))
+            time.sleep(period)
+
+    # mission protocol
+
+    def process(self):
+        while self.running:
+            msg = self.uplink.get()
+            handler = getattr(self, "on_" + msg.get_type().lower(), None)
+            if handler is not None and getattr(msg, "mission_type", 0) == 0:
+                handler(msg)
+
+    def request_item(self, seq):
+        self.requests_sent += 1
+        self.upload_requested_at = time.monotonic()
+        if self.legacy_requests:
+            self.send(mavlink2.MAVLink_mission_request_message(255, 0, seq))
+        else:
+            self.send(mavlink2.MAVLink_mission_request_int_message(255, 0, seq))
+
+    def ack(self, result=mavutil.mavlink.MAV_MISSION_ACCEPTED):
+        self.send(mavlink2.MAVLink_mission_ack_message(255, 0, result))
+
+    def watchdog(self):
+        """re-requests the expected item when the groundstation goes quiet, like ArduPilot"""
+        while self.running:
+            upload = self.upload
+            if upload is not None and time.monotonic() - self.upload_requested_at > REQUEST_TIMEOUT:
+                self.request_item(upload["next"])
+            time.sleep(0.05)
+
+    def on_mission_count(self, msg):
+        self.upload = {"start": 0, "end": msg.count - 1, "next": 0, "items": [], "partial": False}
+        if msg.count == 0:
+            self.mission = []
+            self.upload = None
+            self.ack()
+            return
+        self.request_item(0)
+
+    def on_mission_write_partial_list(self, msg):
+        if not 0 <= msg.start_index <= msg.end_index < len(self.mission):
+            self.ack(mavutil.mavlink.MAV_MISSION_ERROR)
+            return
+        self.upload = {"start": msg.start_index, "end": msg.end_index, "next": msg.start_index,
+                       "items": [], "partial": True}
+        self.request_item(msg.start_index)
+
+    def on_mission_item(self, msg):
+        item = mavlink2.MAVLink_mission_item_int_message(
+            msg.target_system, msg.target_component, msg.seq, msg.frame, msg.command, msg.current,
+            msg.autocontinue, msg.param1, msg.param2, msg.param3, msg.param4,
+            int(round(msg.x * 1e7)), int(round(msg.y * 1e7)), msg.z)
+        self.on_mission_item_int(item)
+
+    def on_mission_item_int(self, msg):
+        upload = self.upload
+        if upload is None:
+            return
+        if msg.seq != upload["next"]:
+            # out of order or duplicate, ask for the one we need
+            self.request_item(upload["next"])
+            return
+
+        self.items_received += 1
+        upload["items"].append(msg)
+        upload["next"] += 1
+        if upload["next"] <= upload["end"]:
+            self.request_item(upload["next"])
+            return
+
+        if upload["partial"]:
+            self.mission[upload["start"]:upload["end"] + 1] = upload["items"]
+        else:
+            self.mission = upload["items"]
+        self.upload = None
+        self.ack()
+
+    def on_mission_request_list(self, msg):
+        self.send(mavlink2.MAVLink_mission_count_message(255, 0, len(self.mission)))
+
+    def on_mission_request_int(self, msg):
+        if 0 <= msg.seq < len(self.mission):
+            item = self.mission[msg.seq]
+            item.target_system = 255
+            self.send(item)
+
+    def on_mission_request(self, msg):
+        if 0 <= msg.seq < len(self.mission):
+            item = self.mission[msg.seq]
+            self.send(mavlink2.MAVLink_mission_item_message(
+                255, 0, item.seq, item.frame, item.command, item.current, item.autocontinue,
+                item.param1, item.param2, item.param3, item.param4, item.x * 1e-7, item.y * 1e-7, item.z))
+
+    def on_mission_clear_all(self, msg):
+        self.mission = []
+        self.ack()
+
+
+def connect(autopilot):
+    """connects ACOM's telemetry and waypoints to a started FakeAutopilot"""
+    from src.library.airdrop import CommandLatency
+    from src.library.telemetry import Telemetry
+    from src.library.waypoints import Waypoints
+
+    # what the telemetry observers use of Vehicle
+    vehicle = SimpleNamespace(conflicts=None, mode_latency=CommandLatency())
+    vehicle.mavlink_connection = mavutil.mavlink_connection("tcp:127.0.0.1:%d" % autopilot.port)
+    vehicle.mavlink_connection.wait_heartbeat(timeout=5)
+    vehicle.telemetry = Telemetry(vehicle)
+    vehicle.waypoints = Waypoints(vehicle)
+    return vehicle
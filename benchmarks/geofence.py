@@ -0,0 +1,79 @@
+"""
+Measures SpatialIndex queries against a brute force test of every route segment against
+every polygon edge and circle, both vectorised with NumPy, for random scenes of
+polygons and circles in a square field. Reports microseconds per segment or point for
+a batch, and checks that both give the same answers. Run from the repository root:
+
+    python -m benchmarks.geofence [--shapes 100 300 1000] [--segments 1000] [--cell 50]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from benchmarks.planner import random_scene
+from src.library.planner import CircleObstacle, segment_distance
+from src.library.spatial_index import SpatialIndex
+
+
+def brute_force(shapes, starts, ends):
+    circles = [s for s in shapes if isinstance(s, CircleObstacle)]
+    polygons = [s for s in shapes if not isinstance(s, CircleObstacle)]
+    centers = np.array([c.center for c in circles])
+    radii = np.array([c.radius for c in circles])
+    a = np.concatenate([p.vertices for p in polygons])
+    b = np.concatenate([np.roll(p.vertices, -1, axis=0) for p in polygons])
+    crossing = np.zeros(len(starts), dtype=bool)
+    # in chunks, so the (segments, edges) arrays stay small
+    for i in range(0, len(starts), 100):
+        s, e = starts[i:i + 100, None], ends[i:i + 100, None]
+        circle = (segment_distance(s, e, centers[None], centers[None]) < radii).any(axis=1)
+        polygon = (segment_distance(s, e, a[None], b[None]) < 1e-6).any(axis=1)
+        crossing[i:i + 100] = circle | polygon
+    return crossing
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shapes", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--segments", type=int, default=1000, help="segments and points per batch")
+    parser.add_argument("--cell", type=float, default=50, help="grid cell size, metres")
+    parser.add_argument("--field", type=float, default=5000, help="side of the square field, metres")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    numpy_rng = np.random.default_rng(0)
+    print("%.0f m field, %.0f m cells, %d segments of 50 to 500 m and %d points per batch" % (
+        args.field, args.cell, args.segments, args.segments))
+    print("%8s  %10s  %14s  %14s  %14s" % ("shapes", "build", "grid segment", "brute segment", "grid point"))
+    for count in args.shapes:
+        shapes = random_scene(rng, count, args.field)
+        starts = numpy_rng.uniform(0, args.field, (args.segments, 2))
+        angles = numpy_rng.uniform(0, 2 * np.pi, args.segments)
+        ends = starts + numpy_rng.uniform(50, 500, (args.segments, 1)) * np.column_stack(
+            [np.cos(angles), np.sin(angles)])
+
+        index, build = timed(SpatialIndex, shapes, args.cell)
+        index.crossings(starts[:10], ends[:10])
+        (segments, _), grid = timed(index.crossings, starts, ends)
+        expected, brute = timed(brute_force, shapes, starts, ends)
+        crossing = np.zeros(args.segments, dtype=bool)
+        crossing[segments] = True
+        if not np.array_equal(crossing, expected):
+            raise Exception("The grid and brute force disagree")
+        _, points = timed(index.containing, starts)
+
+        print("%8d  %7.1f ms  %11.1f us  %11.1f us  %11.1f us" % (
+            count, build * 1000, grid / args.segments * 1e6, brute / args.segments * 1e6,
+            points / args.segments * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Measures mission download time against a FakeAutopilot behind an emulated telemetry radio.
+
+Compares the previous download (MISSION_REQUEST_LIST, then one MISSION_REQUEST and a
+blocking Telemetry.wait per item) against MissionDownload, which keeps a window of
+MISSION_REQUEST_INTs outstanding, and against GET /aircraft/mission served from the
+mission cache. Run from the repository root:
+
+    python -m benchmarks.mission_download [--counts 5 10 25 50 100] [--baud 57600]
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.fake_autopilot import FakeAutopilot, connect
+from benchmarks.mission_upload import build_items
+from src.library.mission_transfer import MissionDownload, MissionUpload
+
+
+def legacy_download(vehicle):
+    """the transfer Waypoints.download_mission_wps used to do, without its retry loop"""
+    connection = vehicle.mavlink_connection
+    connection.waypoint_request_list_send()
+    count = vehicle.telemetry.wait("MISSION_COUNT", timeout=5).count
+    items = []
+    for seq in range(count):
+        connection.waypoint_request_send(seq)
+        items.append(vehicle.telemetry.wait("MISSION_ITEM", timeout=5))
+    return items
+
+
+def pipelined_download(vehicle):
+    return MissionDownload(vehicle.telemetry).run()
+
+
+def cached_download(vehicle):
+    return vehicle.waypoints.get_mission()
+
+
+def measure(download, count, runs, args):
+    times = []
+    for run in range(runs):
+        autopilot = FakeAutopilot(baud=args.baud, latency=args.latency, seed=run).start()
+        vehicle = connect(autopilot)
+        time.sleep(0.5)
+        MissionUpload(vehicle.telemetry, build_items(vehicle, count)).run()
+        # fills the cache
+        vehicle.waypoints.get_mission(refresh=True)
+
+        start = time.perf_counter()
+        download(vehicle)
+        times.append(time.perf_counter() - start)
+        autopilot.close()
+        vehicle.mavlink_connection.close()
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--counts", type=int, nargs="+", default=[5, 10, 25, 50, 100])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--baud", type=int, default=57600)
+    parser.add_argument("--latency", type=float, default=0.02, help="one way latency in seconds")
+    args = parser.parse_args()
+
+    print("%d baud, %.0f ms latency, median of %d runs" % (args.baud, args.latency * 1000, args.runs))
+    print("%6s  %12s  %14s  %10s" % ("items", "previous", "MissionDownload", "cached"))
+    for count in args.counts:
+        print("%6d  %9.0f ms  %11.0f ms  %7.3f ms" % (
+            count,
+            measure(legacy_download, count, args.runs, args),
+            measure(pipelined_download, count, args.runs, args),
+            measure(cached_download, count, args.runs, args),
+        ))
+
+
+if __name__ == "__main__":
+    main()
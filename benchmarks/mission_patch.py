@@ -0,0 +1,72 @@
+"""
+Measures how long changing part of a mission takes against a FakeAutopilot behind an
+emulated telemetry radio: a full upload of the edited mission against
+Waypoints.patch_mission_wps, which sends only the changed ranges with
+MISSION_WRITE_PARTIAL_LIST. Run from the repository root:
+
+    python -m benchmarks.mission_patch [--wps 50] [--changed 1 5 10] [--baud 57600]
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.fake_autopilot import FakeAutopilot, connect
+
+
+def build_waypoints(count):
+    return [{"lat": 49.2578 + i * 1e-4, "lng": -123.2470, "alt": 50} for i in range(count)]
+
+
+def edit(waypoints, changed):
+    """moves changed waypoints spread over the mission"""
+    edited = [dict(waypoint) for waypoint in waypoints]
+    step = max(len(edited) // changed, 1)
+    for i in range(0, step * changed, step):
+        edited[i]["alt"] += 10
+    return edited
+
+
+def measure(patch, count, changed, runs, args):
+    times = []
+    for run in range(runs):
+        autopilot = FakeAutopilot(baud=args.baud, latency=args.latency, seed=run).start()
+        vehicle = connect(autopilot)
+        time.sleep(0.5)
+        waypoints = build_waypoints(count)
+        vehicle.waypoints.upload_mission_wps(waypoints, 20, True)
+        vehicle.waypoints.get_mission(refresh=True)
+
+        edited = edit(waypoints, changed)
+        start = time.perf_counter()
+        if patch:
+            vehicle.waypoints.patch_mission_wps(edited, 20, True)
+        else:
+            vehicle.waypoints.upload_mission_wps(edited, 20, True)
+        times.append(time.perf_counter() - start)
+        autopilot.close()
+        vehicle.mavlink_connection.close()
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--wps", type=int, default=50)
+    parser.add_argument("--changed", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--baud", type=int, default=57600)
+    parser.add_argument("--latency", type=float, default=0.02, help="one way latency in seconds")
+    args = parser.parse_args()
+
+    print("%d wps, %d baud, %.0f ms latency, median of %d runs" % (
+        args.wps, args.baud, args.latency * 1000, args.runs))
+    print("%8s  %12s  %12s" % ("changed", "full upload", "patch"))
+    for changed in args.changed:
+        print("%8d  %9.0f ms  %9.0f ms" % (
+            changed,
+            measure(False, args.wps, changed, args.runs, args),
+            measure(True, args.wps, changed, args.runs, args),
+        ))
+
+
+if __name__ == "__main__":
+    main()
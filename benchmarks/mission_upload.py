@@ -0,0 +1,110 @@
+"""
+Measures mission upload time against a FakeAutopilot behind an emulated telemetry radio.
+
+Compares the previous upload (MISSION_CLEAR_ALL, one blocking Telemetry.wait per
+MISSION_REQUEST, then a MISSION_REQUEST_LIST round trip to check the count) against
+MissionUpload, which answers MISSION_REQUEST_INT straight from the link and finishes
+on the autopilot's MISSION_ACK. With --loss, frames are dropped in both directions;
+the previous upload has no retransmit and fails when a request or item is lost.
+Run from the repository root:
+
+    python -m benchmarks.mission_upload [--counts 5 10 25 50 100] [--baud 57600] [--loss 0.02]
+"""
+import argparse
+import statistics
+import time
+
+from pymavlink import mavutil
+
+from benchmarks.fake_autopilot import FakeAutopilot, connect
+from src.library.mission_transfer import MissionUpload
+
+
+def build_items(vehicle, count):
+    """count MISSION_ITEM_INT waypoints in a line north of the field"""
+    connection = vehicle.mavlink_connection
+    return [
+        mavutil.mavlink.MAVLink_mission_item_int_message(
+            connection.target_system, connection.target_component, seq,
+            mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT, mavutil.mavlink.MAV_CMD_NAV_WAYPOINT,
+            0, 0, 0, 0, 0, 0, int((49.2578 + seq * 1e-4) * 1e7), int(-123.2470 * 1e7), 50)
+        for seq in range(count)
+    ]
+
+
+def legacy_upload(vehicle, items):
+    """the upload Waypoints.upload_mission_wps used to do"""
+    connection = vehicle.mavlink_connection
+    legacy_items = [
+        mavutil.mavlink.MAVLink_mission_item_message(
+            item.target_system, item.target_component, item.seq, item.frame, item.command,
+            item.current, item.autocontinue, item.param1, item.param2, item.param3, item.param4,
+            item.x * 1e-7, item.y * 1e-7, item.z)
+        for item in items
+    ]
+    connection.waypoint_clear_all_send()
+    connection.waypoint_count_send(len(items))
+    for _ in range(len(items)):
+        msg = vehicle.telemetry.wait("MISSION_REQUEST", timeout=5)
+        connection.mav.send(legacy_items[msg.seq])
+    connection.waypoint_request_list_send()
+    count = int(vehicle.telemetry.wait("MISSION_COUNT", timeout=5).count)
+    if count != len(items):
+        raise Exception("Waypoints failed to upload.")
+
+
+def pipelined_upload(vehicle, items):
+    MissionUpload(vehicle.telemetry, items).run()
+
+
+def measure(upload, count, runs, legacy_requests, args):
+    """returns the upload times in seconds of the successful runs, and the number of failures"""
+    times = []
+    failures = 0
+    for run in range(runs):
+        autopilot = FakeAutopilot(baud=args.baud, latency=args.latency, loss=args.loss,
+                                  legacy_requests=legacy_requests, seed=run).start()
+        vehicle = connect(autopilot)
+        # let the connection settle before timing
+        time.sleep(0.5)
+        items = build_items(vehicle, count)
+        start = time.perf_counter()
+        try:
+            upload(vehicle, items)
+            if len(autopilot.mission) != count:
+                raise Exception("autopilot holds %d items" % len(autopilot.mission))
+            times.append(time.perf_counter() - start)
+        except Exception:
+            failures += 1
+        autopilot.close()
+        vehicle.mavlink_connection.close()
+    return times, failures
+
+
+def describe(times, failures):
+    if not times:
+        return "%8s %8s  %d failed" % ("-", "-", failures)
+    return "%6.0f ms %6.0f ms  %d failed" % (
+        statistics.median(times) * 1000, max(times) * 1000, failures)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--counts", type=int, nargs="+", default=[5, 10, 25, 50, 100])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--baud", type=int, default=57600)
+    parser.add_argument("--latency", type=float, default=0.02, help="one way latency in seconds")
+    parser.add_argument("--loss", type=float, default=0.0, help="frame loss probability")
+    args = parser.parse_args()
+
+    print("%d baud, %.0f ms latency, %.1f%% loss, %d runs (median, max)" % (
+        args.baud, args.latency * 1000, args.loss * 100, args.runs))
+    print("%6s  %-28s  %-28s" % ("items", "previous", "MissionUpload"))
+    for count in args.counts:
+        legacy = measure(legacy_upload, count, args.runs, True, args)
+        pipelined = measure(pipelined_upload, count, args.runs, False, args)
+        print("%6d  %-28s  %-28s" % (count, describe(*legacy), describe(*pipelined)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Measures how long VisibilityPlanner takes to plan a reroute through random scenes of
+circular and polygonal obstacles in a square field, including building the planner,
+and how long a second plan through the same scene takes once node visibility is
+cached. Also reports the smallest clearance left along the planned paths, which
+should not be below the margin. Run from the repository root:
+
+    python -m benchmarks.planner [--obstacles 10 20 40 60] [--scenes 20] [--field 3000]
+"""
+import argparse
+import math
+import random
+import statistics
+import time
+
+import numpy as np
+
+from src.library.planner import CircleObstacle, PolygonObstacle, VisibilityPlanner
+
+
+def random_scene(rng, count, field):
+    obstacles = []
+    for _ in range(count):
+        east, north = rng.uniform(0, field), rng.uniform(0, field)
+        if rng.random() < 0.5:
+            obstacles.append(CircleObstacle(east, north, rng.uniform(20, 120)))
+        else:
+            sides = rng.randint(3, 7)
+            angles = sorted(rng.uniform(0, 2 * math.pi) for _ in range(sides))
+            radius = rng.uniform(30, 150)
+            obstacles.append(PolygonObstacle([
+                (east + radius * math.cos(a), north + radius * math.sin(a)) for a in angles]))
+    return obstacles
+
+
+def min_clearance(planner, path):
+    points = np.array(path)
+    samples = np.concatenate([a + np.linspace(0, 1, 200)[:, None] * (b - a) for a, b in zip(points[:-1], points[1:])])
+    return planner.clearances(samples).min()
+
+
+def percentile(values, fraction):
+    return sorted(values)[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--obstacles", type=int, nargs="+", default=[10, 20, 40, 60])
+    parser.add_argument("--scenes", type=int, default=20)
+    parser.add_argument("--field", type=float, default=3000, help="side of the square field, metres")
+    parser.add_argument("--margin", type=float, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print("%d scenes per size, %.0f m field, %.0f m margin" % (args.scenes, args.field, args.margin))
+    print("%10s  %12s  %12s  %12s  %12s" % ("obstacles", "median", "p95", "warm median", "clearance"))
+    for count in args.obstacles:
+        cold, warm, clearances = [], [], []
+        while len(cold) < args.scenes:
+            obstacles = random_scene(rng, count, args.field)
+            start = time.perf_counter()
+            planner = VisibilityPlanner(obstacles, args.margin)
+            if planner.clearances([(0, 0), (args.field, args.field)]).min() < args.margin:
+                # the start or goal is already closer to an obstacle than the margin
+                continue
+            try:
+                path = planner.plan((0, 0), (args.field, args.field))
+            except Exception:
+                # no way through
+                continue
+            cold.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            planner.plan((0, 0), (args.field, args.field))
+            warm.append(time.perf_counter() - start)
+            clearances.append(min_clearance(planner, path))
+        print("%10d  %9.1f ms  %9.1f ms  %9.1f ms  %10.2f m" % (
+            count, statistics.median(cold) * 1000, percentile(cold, 0.95) * 1000,
+            statistics.median(warm) * 1000, min(clearances)))
+
+
+if __name__ == "__main__":
+    main()
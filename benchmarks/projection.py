@@ -0,0 +1,82 @@
+"""
+Compares the distance and bearing maths of the reroute and winch loops: the haversine
+of util.get_distance_metres, the WGS84 geodesic of util.get_bearing, and LocalProjection,
+where the target is projected once and every call projects only the current position.
+
+Also reports the worst distance and bearing error of the projection against the
+geodesic for random point pairs within a given distance of the origin. Run from the
+repository root:
+
+    python -m benchmarks.projection [--radii 500 2000 5000 15000] [--calls 20000]
+"""
+import argparse
+import math
+import random
+import time
+
+from geographiclib.geodesic import Geodesic
+
+from src.library.location import Location
+from src.library.projection import LocalProjection
+from src.library.util import get_bearing, get_distance_metres
+
+ORIGIN = (38.1446, -76.4280)
+
+
+def random_location(rng, radius):
+    """uniformly distributed within radius metres of the origin"""
+    far = Geodesic.WGS84.Direct(ORIGIN[0], ORIGIN[1], rng.uniform(0, 360), radius * math.sqrt(rng.random()))
+    return Location(far["lat2"], far["lon2"], 0)
+
+
+def calls_per_second(function, pairs):
+    start = time.perf_counter()
+    for a, b in pairs:
+        function(a, b)
+    return len(pairs) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--radii", type=float, nargs="+", default=[500, 2000, 5000, 15000])
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--max-error", type=float, default=0.1, help="projection error bound, metres")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    projection = LocalProjection(*ORIGIN, max_error=args.max_error)
+    target = random_location(rng, 2000)
+    projected_target = projection.location(target)
+    positions = [random_location(rng, 2000) for _ in range(args.calls)]
+    pairs = [(position, target) for position in positions]
+
+    print("calls per second, position against a fixed target")
+    print("  haversine distance        %10.0f" % calls_per_second(get_distance_metres, pairs))
+    print("  geodesic bearing          %10.0f" % calls_per_second(get_bearing, pairs))
+    print("  projection distance       %10.0f" % calls_per_second(
+        lambda a, b: projection.distance(projection.location(a), projected_target), pairs))
+    print("  projection bearing        %10.0f" % calls_per_second(
+        lambda a, b: projection.bearing(projection.location(a), projected_target), pairs))
+
+    print()
+    print("worst error against the geodesic, %.2f m bound (local radius %.0f m)" % (
+        args.max_error, projection.radius))
+    print("%10s  %12s  %12s  %14s" % ("radius", "distance", "haversine", "bearing"))
+    for radius in args.radii:
+        worst_distance = worst_haversine = worst_bearing = 0
+        for _ in range(2000):
+            a = random_location(rng, radius)
+            b = random_location(rng, radius)
+            geodesic = Geodesic.WGS84.Inverse(a.lat, a.lng, b.lat, b.lng)
+            if geodesic["s12"] < 1:
+                continue
+            pa, pb = projection.location(a), projection.location(b)
+            worst_distance = max(worst_distance, abs(projection.distance(pa, pb) - geodesic["s12"]))
+            worst_haversine = max(worst_haversine, abs(get_distance_metres(a, b) - geodesic["s12"]))
+            bearing_error = abs((projection.bearing(pa, pb) - geodesic["azi1"] + 180) % 360 - 180)
+            worst_bearing = max(worst_bearing, bearing_error)
+        print("%8.0f m  %10.4f m  %10.2f m  %10.5f deg" % (radius, worst_distance, worst_haversine, worst_bearing))
+
+
+if __name__ == "__main__":
+    main()
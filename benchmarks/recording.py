@@ -0,0 +1,91 @@
+"""
+Recorded MAVLink traffic for the benchmarks.
+
+A telemetry log (.tlog) can be replayed with load_tlog. When none is available,
+synthetic_stream builds a stream with the message mix and rates an ArduPilot
+autopilot sends over a telemetry link at default stream rates, most of which
+ACOM never reads.
+"""
+import random
+
+from pymavlink import mavutil
+from pymavlink.dialects.v20 import all as mavlink2
+
+# message name -> rate in hz
+STREAM_RATES = {
+    "HEARTBEAT": 1,
+    "SYS_STATUS": 2,
+    "SYSTEM_TIME": 1,
+    "GPS_RAW_INT": 10,
+    "GLOBAL_POSITION_INT": 10,
+    "VFR_HUD": 10,
+    "ATTITUDE": 25,
+    "RAW_IMU": 25,
+    "SCALED_IMU2": 10,
+    "SCALED_PRESSURE": 10,
+    "RC_CHANNELS": 10,
+    "SERVO_OUTPUT_RAW": 10,
+    "NAV_CONTROLLER_OUTPUT": 10,
+    "MISSION_CURRENT": 2,
+    "POWER_STATUS": 2,
+    "MEMINFO": 2,
+    "VIBRATION": 10,
+    "EKF_STATUS_REPORT": 10,
+    "AHRS": 10,
+    "AHRS2": 10,
+    "BATTERY_STATUS": 2,
+    "TERRAIN_REPORT": 2,
+    "TIMESYNC": 1,
+}
+
+
+def build_message(name):
+    """builds a message of the given type with every field zeroed"""
+    cls = mavlink2.mavlink_map[getattr(mavlink2, "MAVLINK_MSG_ID_" + name)]
+    lengths = dict(zip(cls.ordered_fieldnames, cls.array_lengths))
+    args = []
+    for fieldname, fieldtype in zip(cls.fieldnames, cls.fieldtypes):
+        length = lengths[fieldname]
+        if fieldtype == "char":
+            args.append(b"")
+        elif length:
+            args.append([0] * length)
+        else:
+            args.append(0)
+    return cls(*args)
+
+
+def synthetic_stream(seconds=10, seed=0):
+    """
+    returns a list of encoded MAVLink 2 frames covering the given number of seconds of
+    STREAM_RATES traffic, in a shuffled but reproducible order
+    """
+    mav = mavlink2.MAVLink(None, srcSystem=1, srcComponent=1)
+    frames = []
+    for name, rate in STREAM_RATES.items():
+        msg = build_message(name)
+        if name == "HEARTBEAT":
+            msg.type = mavutil.mavlink.MAV_TYPE_QUADROTOR
+        for _ in range(int(rate * seconds)):
+            frames.append(bytes(msg.pack(mav)))
+    random.Random(seed).shuffle(frames)
+    return frames
+
+
+def load_tlog(path):
+    """returns the encoded frames of every message in a telemetry log"""
+    log = mavutil.mavlink_connection(path)
+    frames = []
+    while True:
+        msg = log.recv_msg()
+        if msg is None:
+            break
+        if msg.get_type() != "BAD_DATA":
+            frames.append(bytes(msg.get_msgbuf()))
+    return frames
+
+
+def decode(frames):
+    """decodes frames into message objects"""
+    mav = mavlink2.MAVLink(None)
+    return [mav.decode(bytearray(frame)) for frame in frames]
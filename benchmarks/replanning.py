@@ -0,0 +1,86 @@
+"""
+Measures replanning around moving obstacles: VisibilityPlanner.update, which repairs the
+visibility graph of the previous plan, followed by a plan, against a new planner built
+for every update. Some of the obstacles of a random scene move a few metres per update,
+as GCOM obstacle updates several times a second would. Run from the repository root:
+
+    python -m benchmarks.replanning [--obstacles 10 20 40 60] [--moving 1 5] [--updates 20]
+"""
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.planner import random_scene
+from src.library.planner import CircleObstacle, PolygonObstacle, VisibilityPlanner
+
+
+def moved(obstacle, east, north):
+    if isinstance(obstacle, CircleObstacle):
+        return CircleObstacle(obstacle.center[0] + east, obstacle.center[1] + north, obstacle.radius)
+    return PolygonObstacle(obstacle.vertices + [east, north])
+
+
+def plan(planner, goal):
+    try:
+        return planner.plan((0, 0), goal)
+    except Exception:
+        return None
+
+
+def measure(rng, count, moving, args):
+    goal = (args.field, args.field)
+    incremental, full = [], []
+    for _ in range(args.scenes):
+        obstacles = random_scene(rng, count, args.field)
+        planner = VisibilityPlanner(obstacles, args.margin)
+        if planner.clearances([(0, 0), goal]).min() < args.margin:
+            continue
+        plan(planner, goal)
+        velocities = {i: (rng.uniform(-1, 1) * args.step, rng.uniform(-1, 1) * args.step)
+                      for i in rng.sample(range(count), min(moving, count))}
+
+        for _ in range(args.updates):
+            obstacles = [moved(o, *velocities[i]) if i in velocities else o for i, o in enumerate(obstacles)]
+            # obstacles moving onto the start or goal make the scene unplannable, which both handle alike
+            start = time.perf_counter()
+            planner.update(obstacles)
+            repaired = plan(planner, goal)
+            incremental.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            fresh = plan(VisibilityPlanner(obstacles, args.margin), goal)
+            full.append(time.perf_counter() - start)
+
+            if (repaired is None) != (fresh is None) or repaired is not None and not np.isclose(
+                    np.linalg.norm(np.diff(repaired, axis=0), axis=1).sum(),
+                    np.linalg.norm(np.diff(fresh, axis=0), axis=1).sum()):
+                raise Exception("The repaired graph gave a different path")
+    return statistics.median(incremental) * 1000, statistics.median(full) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--obstacles", type=int, nargs="+", default=[10, 20, 40, 60])
+    parser.add_argument("--moving", type=int, nargs="+", default=[1, 5])
+    parser.add_argument("--updates", type=int, default=20, help="obstacle updates per scene")
+    parser.add_argument("--scenes", type=int, default=5)
+    parser.add_argument("--step", type=float, default=4, help="metres each moving obstacle moves per update")
+    parser.add_argument("--field", type=float, default=3000, help="side of the square field, metres")
+    parser.add_argument("--margin", type=float, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print("%.0f m field, %.0f m margin, up to %.0f m per update, median of %d updates x %d scenes" % (
+        args.field, args.margin, args.step, args.updates, args.scenes))
+    print("%10s  %8s  %12s  %12s" % ("obstacles", "moving", "repaired", "full"))
+    for count in args.obstacles:
+        for moving in args.moving:
+            repaired, full = measure(rng, count, moving, args)
+            print("%10d  %8d  %9.1f ms  %9.1f ms" % (count, moving, repaired, full))
+
+
+if __name__ == "__main__":
+    main()
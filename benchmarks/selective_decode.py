@@ -0,0 +1,100 @@
+"""
+Compares the CPU cost of receiving a recorded MAVLink byte stream with a full decode
+of every frame (recv_msg) against Telemetry's selective decode mode, which only
+decodes the message ids ACOM subscribes to.
+
+Run from the repository root:
+
+    python -m benchmarks.selective_decode [--tlog flight.tlog] [--repeat 5]
+"""
+import argparse
+import os
+import time
+
+from pymavlink import mavutil
+
+from benchmarks.recording import load_tlog, synthetic_stream
+from src.library.dispatch import message_id
+from src.library.framing import FrameSplitter
+
+SUBSCRIBED = (
+    "HEARTBEAT",
+    "GPS_RAW_INT",
+    "GLOBAL_POSITION_INT",
+    "VFR_HUD",
+    "HOME_POSITION",
+    "MISSION_COUNT",
+    "MISSION_ITEM",
+    "MISSION_ITEM_INT",
+    "MISSION_REQUEST",
+    "MISSION_REQUEST_INT",
+    "MISSION_ACK",
+    "MISSION_CURRENT",
+)
+
+CHUNK_SIZE = 4096
+
+
+def chunks(data):
+    return [data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)]
+
+
+def full_decode(data_chunks):
+    """what recv_msg does: feed bytes to the parser until it stops returning messages"""
+    mav = mavutil.mavlink.MAVLink(None)
+    decoded = 0
+    for chunk in data_chunks:
+        msg = mav.parse_char(chunk)
+        while msg is not None:
+            decoded += 1
+            msg = mav.parse_char(b"")
+    return decoded
+
+
+def selective_decode(data_chunks):
+    mav = mavutil.mavlink.MAVLink(None)
+    subscribed = {message_id(msg_type) for msg_type in SUBSCRIBED}
+    splitter = FrameSplitter()
+    decoded = 0
+    for chunk in data_chunks:
+        splitter.feed(chunk)
+        for msgid, frame in splitter.frames():
+            if msgid in subscribed:
+                mav.decode(bytearray(frame))
+                decoded += 1
+    return decoded
+
+
+def measure(receive, data_chunks, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        decoded = receive(data_chunks)
+    return (time.process_time() - start) / repeat, decoded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tlog", help="telemetry log to replay instead of the synthetic stream")
+    parser.add_argument("--seconds", type=int, default=60, help="length of the synthetic stream")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # recorded frames are MAVLink 2, as sent by ArduPilot
+    os.environ["MAVLINK20"] = "1"
+    mavutil.set_dialect("all")
+
+    frames = load_tlog(args.tlog) if args.tlog else synthetic_stream(args.seconds)
+    data_chunks = chunks(b"".join(frames))
+    seconds = args.seconds if not args.tlog else None
+
+    print("%d frames, %d bytes" % (len(frames), sum(len(chunk) for chunk in data_chunks)))
+    for name, receive in (("full", full_decode), ("selective", selective_decode)):
+        cpu, decoded = measure(receive, data_chunks, args.repeat)
+        line = "%-10s %8.1f ms cpu  %6d decoded  %9.0f frames/s" % (name, cpu * 1000, decoded, len(frames) / cpu)
+        if seconds:
+            line += "  %5.2f%% of one core at this stream rate" % (cpu / seconds * 100)
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
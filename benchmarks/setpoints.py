@@ -0,0 +1,105 @@
+"""
+Compares reroute flight time with one guided mission item per point, where the aircraft
+brakes to a stop within the arrival radius of every point, against setpoints streamed
+lookahead metres along the path, where it flies through the points. The aircraft is a
+point mass standing in for the autopilot's position controller: it accelerates at up
+to --accel towards its position target, up to --speed, and brakes to stop on it. The
+absolute times are those of the model rather than of SITL, their ratio is what the
+streaming saves. Run from the repository root:
+
+    python -m benchmarks.setpoints [--routes 50] [--points 6] [--lookahead 20 40 60]
+"""
+import argparse
+import math
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.library.executor import Arrival
+from src.library.setpoints import lookahead_point
+
+STEP = 0.02  # simulation step, seconds
+
+
+def local(point):
+    return SimpleNamespace(east=point[0], north=point[1])
+
+
+def fly(route, speed, accel, rate, lookahead=None, timeout=600):
+    """seconds to fly route from its first point, streaming setpoints when lookahead is given"""
+    position = route[0].copy()
+    velocity = np.zeros(2)
+    arrival = Arrival(radius=1, pass_plane=lookahead is not None)
+    index, start, setpoint = 1, route[0], None
+    period, since = 1 / rate, math.inf
+    elapsed = 0.0
+    while elapsed < timeout:
+        target = route[index]
+        last = index == len(route) - 1
+        distance = np.linalg.norm(target - position)
+        # the last point is only reached within the radius, as the aircraft stops there
+        reached = arrival.reached(local(start), local(position), local(target), distance, 0,
+                                  local(route[index + 1])) if not last else ("radius" if distance <= 1 else None)
+        if reached:
+            if last:
+                return elapsed
+            # the streamer keeps its setpoint until its next tick
+            start, index = target, index + 1
+            continue
+
+        if lookahead is None:
+            setpoint = target
+        elif since >= period:
+            path = np.vstack([start, route[index:]])
+            setpoint = lookahead_point(np.column_stack([path, np.zeros(len(path))]), position, lookahead)[:2]
+            since = 0.0
+
+        # brake to stop on the position target, otherwise head for it at up to speed
+        offset = setpoint - position
+        gap = np.linalg.norm(offset)
+        wanted = offset / gap * min(speed, math.sqrt(2 * accel * gap)) if gap > 1e-9 else np.zeros(2)
+        change = wanted - velocity
+        norm = np.linalg.norm(change)
+        if norm > accel * STEP:
+            change *= accel * STEP / norm
+        velocity += change
+        position += velocity * STEP
+        elapsed += STEP
+        since += STEP
+    return math.inf
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--routes", type=int, default=50)
+    parser.add_argument("--points", type=int, default=6, help="points per reroute, after the start")
+    parser.add_argument("--lookahead", type=float, nargs="+", default=[20, 40, 60], help="metres")
+    parser.add_argument("--speed", type=float, default=15, help="m/s")
+    parser.add_argument("--accel", type=float, default=3, help="m/s^2")
+    parser.add_argument("--rate", type=float, default=10, help="setpoints per second")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    routes = []
+    for _ in range(args.routes):
+        # legs of 80 to 300 m, turning up to 120 degrees at each point
+        heading = rng.uniform(0, 2 * np.pi)
+        points = [np.zeros(2)]
+        for _ in range(args.points):
+            heading += rng.uniform(-2 * np.pi / 3, 2 * np.pi / 3)
+            points.append(points[-1] + rng.uniform(80, 300) * np.array([np.sin(heading), np.cos(heading)]))
+        routes.append(np.array(points))
+
+    items = np.array([fly(route, args.speed, args.accel, args.rate) for route in routes])
+    print("%d routes of %d points, %.0f m/s, %.0f m/s^2, setpoints at %.0f Hz" % (
+        args.routes, args.points, args.speed, args.accel, args.rate))
+    print("%14s  %10s  %8s" % ("mode", "mean time", "vs items"))
+    print("%14s  %8.1f s  %8s" % ("mission items", items.mean(), "-"))
+    for lookahead in args.lookahead:
+        streamed = np.array([fly(route, args.speed, args.accel, args.rate, lookahead) for route in routes])
+        print("%14s  %8.1f s  %7.0f%%" % (
+            "lookahead %.0f m" % lookahead, streamed.mean(), (streamed / items).mean() * 100))
+
+
+if __name__ == "__main__":
+    main()
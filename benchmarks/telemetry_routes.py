@@ -0,0 +1,102 @@
+"""
+Load tests the telemetry routes over HTTP against a FakeAutopilot: requests per second
+and latency of /aircraft/telemetry/gps and /aircraft/telemetry/heartbeat with the
+previous per-request dict building, jsonify and fresh HEARTBEAT wait, against the
+bodies serialised once per message by ResponseCache, with and without conditional GET
+(If-None-Match). Each client polls as fast as it can over a keep-alive connection.
+Run from the repository root:
+
+    python -m benchmarks.telemetry_routes [--clients 4] [--seconds 5]
+"""
+import argparse
+import http.client
+import logging
+import statistics
+import threading
+import time
+from unittest.mock import patch
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from benchmarks.fake_autopilot import FakeAutopilot, connect
+from src import create_app
+from src.library.responses import ResponseCache
+
+APIKEY = "benchmark"
+
+
+class EmptyCache(ResponseCache):
+    """never has a response, so the routes take their previous uncached path"""
+
+    def get(self, name):
+        return None
+
+
+def client(port, path, conditional, deadline, latencies):
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    etag = None
+    while time.perf_counter() < deadline:
+        headers = {"If-None-Match": etag} if conditional and etag else {}
+        start = time.perf_counter()
+        connection.request("GET", path + "?apikey=" + APIKEY, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        etag = response.getheader("ETag")
+    connection.close()
+
+
+def load(port, path, conditional, clients, seconds):
+    deadline = time.perf_counter() + seconds
+    latencies = [[] for _ in range(clients)]
+    threads = [threading.Thread(target=client, args=(port, path, conditional, deadline, latencies[i]))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies = sorted(sum(latencies, []))
+    return (len(latencies) / seconds, statistics.median(latencies), latencies[int(len(latencies) * 0.99)],
+            latencies[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=4, help="concurrent polling clients")
+    parser.add_argument("--seconds", type=float, default=5, help="seconds per measurement")
+    parser.add_argument("--stream-rate", type=float, default=10, help="hz of the position streams")
+    args = parser.parse_args()
+
+    autopilot = FakeAutopilot(baud=0, latency=0, stream_rate=args.stream_rate).start()
+    vehicle = connect(autopilot)
+    vehicle.is_connected = lambda: True
+    time.sleep(1.5)
+
+    # keep-alive connections, as a poller would use
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
+    app = create_app({"APIKEY": APIKEY, "MAVLINK_SETUP_DEBUG": "production"})
+    app.debug = False
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    cache = vehicle.telemetry.responses
+    print("%d clients, %.0f s each, heartbeat at 1 Hz, positions at %.0f Hz" % (
+        args.clients, args.seconds, args.stream_rate))
+    print("%-32s  %10s  %10s  %10s  %10s" % ("", "req/s", "p50", "p99", "max"))
+    with patch("src.routes.aircraft.controllers.vehicle", vehicle):
+        for path in ("/aircraft/telemetry/gps", "/aircraft/telemetry/heartbeat"):
+            for name, responses, conditional in (("uncached", EmptyCache(), False), ("cached", cache, False),
+                                                 ("cached, If-None-Match", cache, True)):
+                vehicle.telemetry.responses = responses
+                rate, p50, p99, worst = load(server.port, path, conditional, args.clients, args.seconds)
+                print("%-32s  %10.0f  %7.2f ms  %7.2f ms  %7.2f ms" % (
+                    path.rsplit("/", 1)[1] + " " + name, rate, p50 * 1000, p99 * 1000, worst * 1000))
+
+    server.shutdown()
+    autopilot.close()
+    vehicle.mavlink_connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Measures how long a thread blocked in Telemetry.wait takes to wake up after the
+awaited message is dispatched by the polling thread.
+
+Compares the previous Observable.once + 50 ms sleep polling wait against the
+MessageWaiters registry. Run from the repository root:
+
+    python -m benchmarks.wait_latency [--waiters 8] [--messages 200]
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+
+from observable import Observable
+
+from src.library.waiters import MessageWaiters
+
+
+class FakeMessage:
+    def __init__(self, msg_type):
+        self.msg_type = msg_type
+        self.sent_at = None
+
+    def get_type(self):
+        return self.msg_type
+
+
+class LegacyWaiters:
+    """the Observable based wait that Telemetry.wait used to implement"""
+
+    def __init__(self):
+        self.notifiers = Observable()
+
+    def wait(self, msg_type, timeout=None):
+        result = None
+
+        def callback(msg):
+            nonlocal result
+            result = msg
+
+        self.notifiers.once(msg_type, callback)
+
+        start_time = time.time()
+        while True:
+            if timeout is not None and start_time + timeout < time.time():
+                return None
+            if result is not None:
+                return result
+            time.sleep(0.05)
+
+    def notify(self, msg_type, msg):
+        self.notifiers.trigger(msg_type, msg)
+
+
+def run(registry, n_waiters, n_messages, period):
+    latencies = []
+    latencies_lock = threading.Lock()
+    stop = threading.Event()
+
+    def waiter():
+        while not stop.is_set():
+            msg = registry.wait("GPS_RAW_INT", timeout=1)
+            woke_at = time.perf_counter()
+            if msg is None:
+                continue
+            with latencies_lock:
+                latencies.append(woke_at - msg.sent_at)
+
+    threads = [threading.Thread(target=waiter, daemon=True) for _ in range(n_waiters)]
+    for thread in threads:
+        thread.start()
+
+    time.sleep(0.2)
+    for _ in range(n_messages):
+        # jitter the period so dispatches do not line up with the legacy sleep ticks
+        time.sleep(period * random.uniform(0.5, 1.5))
+        msg = FakeMessage("GPS_RAW_INT")
+        msg.sent_at = time.perf_counter()
+        registry.notify("GPS_RAW_INT", msg)
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def report(name, latencies):
+    latencies = sorted(latency * 1000 for latency in latencies)
+    quantiles = statistics.quantiles(latencies, n=100)
+    print("%-8s n=%-6d p50=%7.3f ms  p90=%7.3f ms  p99=%7.3f ms  max=%7.3f ms" % (
+        name, len(latencies), quantiles[49], quantiles[89], quantiles[98], latencies[-1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--waiters", type=int, default=8, help="concurrent waiting threads")
+    parser.add_argument("--messages", type=int, default=200, help="messages dispatched per run")
+    parser.add_argument("--rate", type=float, default=10, help="message rate in hz")
+    args = parser.parse_args()
+
+    period = 1 / args.rate
+    report("legacy", run(LegacyWaiters(), args.waiters, args.messages, period))
+    report("waiters", run(MessageWaiters(), args.waiters, args.messages, period))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import math
+import statistics
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from pymavlink import mavutil
+
+# below this ground speed, m/s, the aircraft counts as stopped
+STOPPED_SPEED = 0.5
+
+
+class CommandLatency:
+    def __init__(self, initial=0.5, samples=20):
+        """
+        Measured mode change latency: seconds from sending a mode change to the first
+        HEARTBEAT that reports the new mode. The estimate is the median of the last
+        samples, or initial before any were measured
+
+        Args:
+            initial (number, optional): seconds assumed until a mode change was measured
+            samples (number, optional): measurements kept
+        """
+        self.initial = initial
+        self.lock = threading.Lock()
+        self.pending = {}  # mode -> monotonic time the change was sent
+        self.samples = deque(maxlen=samples)
+
+    def sent(self, mode, now=None):
+        """records that a change to mode, e.g. "LOITER", was sent"""
+        with self.lock:
+            self.pending[mode] = time.monotonic() if now is None else now
+
+    def on_heartbeat(self, msg, now=None):
+        """HEARTBEAT observer, completes the measurement of a pending change to its mode"""
+        if not self.pending:
+            return
+        mode = mavutil.mode_string_v10(msg)
+        with self.lock:
+            sent = self.pending.pop(mode, None)
+            if sent is not None:
+                self.samples.append((time.monotonic() if now is None else now) - sent)
+
+    def estimate(self):
+        with self.lock:
+            return statistics.median(self.samples) if self.samples else self.initial
+
+    def to_dict(self):
+        with self.lock:
+            samples = list(self.samples)
+        return {"estimate": self.estimate(), "samples": samples}
+
+
+class DropPredictor:
+    def __init__(self, projection, target, radius, deceleration=None, window=1.0):
+        """
+        Predicts when to switch to loiter so the aircraft stops over the airdrop target.
+        Position and velocity are fitted to the recent position history, and the change
+        is timed to lead the target by the distance flown during the measured command
+        latency plus the braking distance
+
+        Args:
+            projection (LocalProjection): projection around the target
+            target (Location): airdrop target
+            radius (number): metres from the target within which the drop may start
+            deceleration (number, optional): braking deceleration in loiter, m/s^2. Without
+                it only the command latency is led
+            window (number, optional): seconds of position history fitted
+        """
+        self.projection = projection
+        point = projection.location(target)
+        self.target = np.array([point.east, point.north])
+        self.radius = radius
+        self.deceleration = deceleration
+        self.window = window
+
+    def local(self, lat, lng):
+        point = self.projection.point(lat, lng)
+        return np.array([point.east, point.north])
+
+    def estimate(self, history, telemetry, now=None):
+        """
+        returns the east, north position and velocity extrapolated to now, from a least
+        squares line through the last window seconds of history, or from the latest
+        position and the autopilot's velocity when there are fewer than 3 samples.
+        Returns None without a position
+
+        Args:
+            history (TelemetryHistory): recent positions
+            telemetry (Telemetry): latest position and velocity
+            now (number, optional): time.monotonic() to extrapolate to, defaults to now
+        """
+        now = time.monotonic() if now is None else now
+        samples = history.window(now - self.window)
+        valid = ~np.isnan(samples["lat"]) & ~np.isnan(samples["lng"])
+        times = samples["timestamp"][valid]
+        if len(times) >= 3 and times[-1] > times[0]:
+            points = np.array([self.local(lat, lng) for lat, lng in zip(samples["lat"][valid], samples["lng"][valid])])
+            # position at the newest sample and velocity, fitted to all of them
+            design = np.column_stack([np.ones(len(times)), times - times[-1]])
+            (position, velocity), *_ = np.linalg.lstsq(design, points, rcond=None)
+            return position + velocity * (now - times[-1]), velocity
+
+        if telemetry.lat is None:
+            return None
+        velocity = np.array([telemetry.vy or 0.0, telemetry.vx or 0.0])
+        return self.local(telemetry.lat, telemetry.lng), velocity
+
+    def plan(self, position, velocity, latency):
+        """
+        returns {"fire_in", "distance", "predicted"}: seconds until the mode change should
+        be sent, or None if the aircraft will not pass within the radius on its current
+        track, the current distance to the target, and the distance from the target at
+        which the aircraft is predicted to stop when the change is sent on time
+
+        Args:
+            position (array): east, north metres
+            velocity (array): east, north m/s
+            latency (number): seconds from sending the mode change until it takes effect
+        """
+        offset = self.target - np.asarray(position, dtype=float)
+        distance = float(np.hypot(*offset))
+        speed = float(np.hypot(*velocity))
+        if speed < STOPPED_SPEED:
+            # hovering, as good as stopped where we are
+            return {"fire_in": 0.0 if distance < self.radius else None, "distance": distance, "predicted": distance}
+
+        heading = np.asarray(velocity, dtype=float) / speed
+        along = float(offset @ heading)  # to the closest approach
+        cross = abs(float(offset[0] * heading[1] - offset[1] * heading[0]))
+        braking = speed ** 2 / (2 * self.deceleration) if self.deceleration else 0.0
+        lead = speed * latency + braking
+
+        if along >= lead:
+            # fired on time the aircraft stops at the closest approach
+            fire_in = (along - lead) / speed
+            predicted = cross
+        else:
+            # too late to stop at the closest approach, stop as soon as possible
+            fire_in = 0.0
+            predicted = float(np.hypot(*(offset - heading * lead)))
+        if predicted >= self.radius and distance >= self.radius:
+            fire_in = None
+        return {"fire_in": fire_in, "distance": distance, "predicted": predicted}
+
+    def stop_distance(self, telemetry, timeout=15, poll=0.1, cancelled=None):
+        """
+        waits until the aircraft has stopped, for timeout seconds, or until cancelled()
+        returns True, and returns its distance from the target in metres, or None without
+        a position
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and not (cancelled is not None and cancelled()):
+            if telemetry.vx is not None and math.hypot(telemetry.vx, telemetry.vy) < STOPPED_SPEED:
+                break
+            time.sleep(poll)
+        if telemetry.lat is None:
+            return None
+        return float(np.hypot(*(self.local(telemetry.lat, telemetry.lng) - self.target)))
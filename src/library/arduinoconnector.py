@@ -1,89 +1,175 @@
 import serial
+import serial.tools.list_ports
+import serial.tools.list_ports_common
 import sys
 import glob
+import json
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.library.winchlink import WinchLink
 
 
 class ArduinoConnector:
-    def __init__(self, vehicle, serialPort=""):
+    def __init__(self, vehicle, serialPort="", portCache=None, wakeTime=2, probeTimeout=4, readTimeout=0.1):
+        """
+        Finds the winch Arduino among the serial ports and connects to it
+
+        Args:
+            vehicle (Vehicle): vehicle whose winch_status is updated
+            serialPort (string, optional): port to use instead of searching
+            portCache (string, optional): file remembering the last port the Arduino was
+                found on and its USB VID/PID, which are tried first on the next search
+            wakeTime (number, optional): seconds the Arduino takes to reset once its port opens
+            probeTimeout (number, optional): seconds a port gets to answer, wake time included
+            readTimeout (number, optional): seconds each background read waits for data
+        """
         self.arduino = None
         self.vehicle = vehicle
+        self.portCache = portCache
+        self.wakeTime = wakeTime
+        self.probeTimeout = probeTimeout
         self.findPayload(serialPort)  # We need to establish a serial connection with the Arduino
 
         if self.arduino is None:
             print("[ERROR]    Rover & Winch     Couldn't find payload")
             raise Exception('Payload not found')
 
+        # lines from the winch are read in the background and queued as events
+        self.link = WinchLink(self.arduino, readTimeout)
+        self.link.start()
+
     def findPayload(self, serialPort):
-        ports = []
-        if serialPort == "":  # If no port is forced, get all the ports
-            ports = self.getSerialPorts()
-        else:
-            ports.append(serialPort)
-        print("[ALERT]    Rover & Winch     Serial Ports:", ports)
-
-        for portName in ports:
-            print("[ALERT]    Rover & Winch     Trying port", portName)
-            arduino = serial.Serial(port=portName, baudrate=9600, timeout=1.5, write_timeout=1.5)
-            time.sleep(2)  # Giving time to Arduino to wake up
-
-            try:
-                arduino.write(bytes('uas1', 'utf-8'))  # Sending 'uas1' and expecting to get 'uas' back
-            except serial.SerialTimeoutException:  # If we get an exception, the port is not open
-                continue
-
-            data = arduino.readline()
-            data = data.decode('utf-8')
-            data = data.rstrip()
-
-            if data == "uas":
-                print("[ALERT]    Rover & Winch     Found Payload on port", portName)
-                self.arduino = arduino
+        if serialPort != "":  # A forced port is the only one tried
+            self.arduino = self.probePort(serialPort)
+            return
+
+        ports = self.getSerialPorts()
+        cached = self.loadCachedPort()
+        print("[ALERT]    Rover & Winch     Serial Ports:", [port.device for port in ports])
+
+        # the port the Arduino was last found on, or wherever its VID/PID moved to, gets
+        # a probe of its own first, as it is almost always still there
+        first = [port for port in ports if cached is not None and port.device == cached.get("port")
+                 and (port.vid, port.pid) == (cached.get("vid"), cached.get("pid"))]
+        if not first:
+            first = [port for port in ports if cached is not None and port.vid is not None
+                     and (port.vid, port.pid) == (cached.get("vid"), cached.get("pid"))][:1]
+        for port in first:
+            self.arduino = self.probePort(port.device)
+            if self.arduino is not None:
+                self.saveCachedPort(port)
                 return
 
+        rest = [port for port in ports if port not in first]
+        found = threading.Event()
+        with ThreadPoolExecutor(max_workers=max(len(rest), 1), thread_name_prefix="arduino-probe") as executor:
+            probes = {executor.submit(self.probePort, port.device, found): port for port in rest}
+            for probe in as_completed(probes):
+                arduino = probe.result()
+                if arduino is not None and self.arduino is None:
+                    self.arduino = arduino
+                    self.saveCachedPort(probes[probe])
+                    # the probes still waiting give up instead of running to their timeout
+                    found.set()
+                elif arduino is not None:
+                    arduino.close()
+
+    def probePort(self, portName, cancelled=None):
+        """
+        returns the port opened if the Arduino answers the handshake on it within the
+        probe timeout, otherwise None
+
+        Args:
+            portName (string): port to probe
+            cancelled (Event, optional): set when another probe found the Arduino
+        """
+        print("[ALERT]    Rover & Winch     Trying port", portName)
+        deadline = time.monotonic() + self.probeTimeout
+        try:
+            arduino = serial.Serial(port=portName, baudrate=9600, timeout=0.25, write_timeout=1.5)
+        except (OSError, serial.SerialException):
+            return None
+
+        try:
+            # Giving time to Arduino to wake up
+            if cancelled is None:
+                time.sleep(self.wakeTime)
+            elif cancelled.wait(self.wakeTime):
+                arduino.close()
+                return None
+
+            arduino.write(bytes('uas1', 'utf-8'))  # Sending 'uas1' and expecting to get 'uas' back
+            while time.monotonic() < deadline and not (cancelled is not None and cancelled.is_set()):
+                data = arduino.readline()
+                data = data.decode('utf-8', errors='ignore')
+                data = data.rstrip()
+
+                if data == "uas":
+                    print("[ALERT]    Rover & Winch     Found Payload on port", portName)
+                    arduino.timeout = 1.5
+                    return arduino
+        except (OSError, serial.SerialException):  # If we get an exception, the port is not open
+            pass
+        arduino.close()
+        return None
+
+    def loadCachedPort(self):
+        """returns the port the Arduino was last found on, {"port", "vid", "pid"}, or None"""
+        if self.portCache is None or not os.path.exists(self.portCache):
+            return None
+        try:
+            with open(self.portCache, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def saveCachedPort(self, port):
+        if self.portCache is None:
+            return
+        try:
+            # written aside and renamed, so a crash never leaves a half written cache
+            with open(self.portCache + '.tmp', 'w') as f:
+                json.dump({"port": port.device, "vid": port.vid, "pid": port.pid}, f)
+            os.replace(self.portCache + '.tmp', self.portCache)
+        except OSError as e:
+            print("[ERROR]    Rover & Winch     Could not cache the payload port:", e)
+
     def getSerialPorts(self):
-        """ Lists serial port names
+        """ Lists serial ports, without opening them since that resets an Arduino
 
             :raises EnvironmentError:
                 On unsupported or unknown platforms
             :returns:
-                A list of the serial ports available on the system
+                A list of ListPortInfo, with the USB VID/PID of USB ports, USB ports first
         """
-        if sys.platform.startswith('win'):
-            ports = ['COM%s' % (i + 1) for i in range(256)]
-        elif sys.platform.startswith('linux') or sys.platform.startswith('cygwin'):
-            # this excludes your current terminal "/dev/tty"
-            ports = glob.glob('/dev/tty[A-Za-z]*')
-        elif sys.platform.startswith('darwin'):
-            ports = glob.glob('/dev/tty.*')
-        else:
-            raise EnvironmentError('Unsupported platform')
-
-        result = []
-        for port in ports:
-            try:
-                s = serial.Serial(port)
-                s.close()
-                result.append(port)
-            except (OSError, serial.SerialException):
-                pass
-        return result
-
-    def sendCommandMessage(self, message):
-        self.arduino.write(bytes(message, 'utf-8'))
-
-    def listenSuccessMessage(self):
-        while True:
-            data = self.arduino.readline()
-            data = data.decode("utf-8")
-            data = data.strip('\n')
-            data = data.strip('\r')
-
-            if data == "AIRDROPCOMPLETE":
-                return
-            elif data == "AIRDROPERROR":
-                self.vehicle.winch_status = 2
-                print("[ALERT]    Rover & Winch     Drop failed; retrying")
+        ports = list(serial.tools.list_ports.comports())
+        if not ports:
+            # platforms whose ports are not enumerated, fall back to the device names
+            if sys.platform.startswith('win'):
+                names = ['COM%s' % (i + 1) for i in range(256)]
+            elif sys.platform.startswith('linux') or sys.platform.startswith('cygwin'):
+                # this excludes your current terminal "/dev/tty"
+                names = glob.glob('/dev/tty[A-Za-z]*')
+            elif sys.platform.startswith('darwin'):
+                names = glob.glob('/dev/tty.*')
+            else:
+                raise EnvironmentError('Unsupported platform')
+            ports = [serial.tools.list_ports_common.ListPortInfo(name) for name in names]
+        return sorted(ports, key=lambda port: port.vid is None)
+
+    def sendCommandMessage(self, message, acks=(), timeout=None):
+        """sends a command without waiting for the reply, see WinchLink.send"""
+        return self.link.send(message, acks, timeout)
+
+    def nextEvent(self, timeout=None):
+        """returns the next WinchEvent from the winch, or None if none arrived within timeout seconds"""
+        return self.link.next_event(timeout)
+
+    def close(self):
+        self.link.stop()
 
 
 if __name__ == '__main__':
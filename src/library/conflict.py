@@ -0,0 +1,157 @@
+import threading
+import time
+
+import numpy as np
+
+
+def closest_approach(position, velocity, positions, velocities, horizon=None):
+    """
+    returns the time to closest approach, in seconds, and the miss distance, in metres,
+    between one constant velocity track and each of many others. A closest approach
+    already passed is taken as now, and one beyond horizon as the horizon
+
+    Args:
+        position (array): (3,) our position, east, north, up metres
+        velocity (array): (3,) our velocity, east, north, up m/s
+        positions (array): (n, 3) positions of the other tracks, at the same time as ours
+        velocities (array): (n, 3) velocities of the other tracks
+        horizon (number, optional): seconds ahead to look for the closest approach
+    """
+    offset = np.asarray(positions, dtype=float) - np.asarray(position, dtype=float)
+    closing = np.asarray(velocities, dtype=float) - np.asarray(velocity, dtype=float)
+    speed2 = np.einsum("ij,ij->i", closing, closing)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        times = -np.einsum("ij,ij->i", offset, closing) / speed2
+    # tracks moving together keep their distance, their closest approach is now
+    times = np.where(speed2 > 0, times, 0)
+    times = np.clip(times, 0, np.inf if horizon is None else horizon)
+    miss = offset + closing * times[:, None]
+    return times, np.sqrt(np.einsum("ij,ij->i", miss, miss))
+
+
+def ned_to_enu(vx, vy, vz):
+    """velocity in mavlink's north, east, down order as east, north, up"""
+    return np.stack([np.asarray(vy, dtype=float), np.asarray(vx, dtype=float), -np.asarray(vz, dtype=float)], axis=-1)
+
+
+class ConflictMonitor:
+    def __init__(self, projection, separation=30, horizon=60):
+        """
+        Moving obstacle tracks, predicted at constant velocity against our own track on
+        every position update. A track whose closest approach within the horizon is
+        nearer than the separation is a conflict, and handlers subscribed with
+        on_conflict() are called when a track starts conflicting
+
+        Args:
+            projection (LocalProjection): projection the tracks are held in
+            separation (number, optional): miss distance, metres, below which a track conflicts
+            horizon (number, optional): seconds ahead to predict
+        """
+        self.projection = projection
+        self.separation = separation
+        self.horizon = horizon
+        self.lock = threading.Lock()
+        self.handlers = []
+
+        self.json = []
+        self.ids = []
+        self.positions = np.zeros((0, 3))
+        self.velocities = np.zeros((0, 3))
+        self.times = np.zeros(0)
+        # ids conflicting at the last check, so each conflict is only reported once
+        self.conflicting = set()
+        self.last = []
+
+    def set_tracks(self, tracks, now=None):
+        """
+        replaces the tracks
+
+        Args:
+            tracks (list): {"id", "lat", "lng", "alt", "vx", "vy", "vz"}, velocities in
+                m/s north, east and down as in GLOBAL_POSITION_INT, with an optional
+                "timestamp" in unix seconds the position was measured at
+            now (number, optional): time of tracks without a timestamp, defaults to now
+        """
+        now = time.time() if now is None else now
+        ids, positions, velocities, times = [], [], [], []
+        for index, track in enumerate(tracks):
+            point = self.projection.point(track["lat"], track["lng"], track.get("alt", 0))
+            ids.append(track.get("id", index))
+            positions.append((point.east, point.north, point.up))
+            velocities.append((track.get("vx", 0), track.get("vy", 0), track.get("vz", 0)))
+            times.append(track.get("timestamp", now))
+        velocities = np.array(velocities, dtype=float).reshape(-1, 3)
+        with self.lock:
+            self.json = tracks
+            self.ids = ids
+            self.positions = np.array(positions, dtype=float).reshape(-1, 3)
+            self.velocities = ned_to_enu(*velocities.T)
+            self.times = np.array(times, dtype=float)
+            self.conflicting &= set(ids)
+
+    def on_conflict(self, handler):
+        """subscribes handler, called with the list of conflicts when a track starts conflicting"""
+        self.handlers.append(handler)
+        return handler
+
+    def approaches(self, lat, lng, alt, velocity, now=None):
+        """
+        returns the track ids, and each track's time to closest approach, miss distance
+        and east, north, up position at the closest approach, as arrays
+
+        Args:
+            lat, lng, alt (number): our position
+            velocity (tuple): our vx, vy, vz, m/s north, east and down
+            now (number, optional): unix time of our position, defaults to now
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            ids, positions, velocities, times = self.ids, self.positions, self.velocities, self.times
+        point = self.projection.point(lat, lng, alt)
+        # every track moved on to our time, then the closest approach of all pairs at once
+        positions = positions + velocities * (now - times)[:, None]
+        ttc, miss = closest_approach((point.east, point.north, point.up), ned_to_enu(*velocity),
+                                     positions, velocities, self.horizon)
+        return ids, ttc, miss, positions + velocities * ttc[:, None]
+
+    def predictions(self, ids, ttc, miss, at_approach, indices):
+        """{"id", "time", "distance", "conflict", "lat", "lng", "alt"} for tracks indices, soonest first"""
+        predictions = []
+        for i in sorted(indices, key=lambda i: ttc[i]):
+            location = self.projection.from_enu(*at_approach[i])
+            predictions.append({
+                "id": ids[i],
+                "time": float(ttc[i]),
+                "distance": float(miss[i]),
+                "conflict": bool(miss[i] < self.separation),
+                "lat": location.lat,
+                "lng": location.lng,
+                "alt": location.alt,
+            })
+        return predictions
+
+    def predict(self, lat, lng, alt, velocity, now=None):
+        """
+        returns the closest approach of every track to our own, soonest first, with the
+        track's position at the closest approach, see approaches
+        """
+        approaches = self.approaches(lat, lng, alt, velocity, now)
+        return self.predictions(*approaches, range(len(approaches[0])))
+
+    def check(self, lat, lng, alt, velocity, now=None):
+        """
+        predicts the tracks, see approaches, and calls the conflict handlers with the
+        conflicts when a track starts conflicting. Returns the conflicts, soonest first
+        """
+        approaches = self.approaches(lat, lng, alt, velocity, now)
+        # only the conflicts are converted back to positions, the cost of a check is
+        # otherwise a few array operations however many tracks there are
+        conflicts = self.predictions(*approaches, np.flatnonzero(approaches[2] < self.separation).tolist())
+        ids = set(conflict["id"] for conflict in conflicts)
+        new = ids - self.conflicting
+        self.conflicting = ids
+        self.last = conflicts
+        if new:
+            for handler in self.handlers:
+                handler(conflicts)
+        return conflicts
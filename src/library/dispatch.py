@@ -0,0 +1,105 @@
+import threading
+
+from pymavlink import mavutil
+
+# failures of one handler logged once per this many
+FAILURE_LOG_INTERVAL = 100
+
+
+def message_id(msg_type):
+    """
+    returns the numeric mavlink id of a message name
+
+    Example: message_id('GPS_RAW_INT') -> 24
+    """
+    try:
+        return getattr(mavutil.mavlink, "MAVLINK_MSG_ID_" + msg_type)
+    except AttributeError:
+        raise ValueError("Unknown mavlink message: " + msg_type)
+
+
+class Dispatcher:
+    def __init__(self):
+        """
+        Routes received messages to their handlers by mavlink message id. Each id maps
+        to a prebuilt tuple of handlers, so a message costs one dict lookup and message
+        ids without handlers are skipped without any further work
+        """
+        self.lock = threading.Lock()
+        self.handlers = {}  # msgid -> [handler]
+        self.late_handlers = {}  # msgid -> [handler], run after all other handlers
+        self.table = {}  # msgid -> tuple of handlers, rebuilt on every change
+        self.failures = {}  # handler -> number of messages it raised on
+
+    def on(self, msg_type, handler=None, last=False):
+        """
+        subscribes handler to msg_type. can be used as a decorator:
+
+        @dispatcher.on('GPS_RAW_INT')
+        def listener(msg):
+            print(msg)
+
+        Args:
+            msg_type (string): mavlink message
+            handler (function, optional): called with every msg_type message
+            last (bool, optional): run after every handler subscribed without last
+        """
+        if handler is None:
+            def decorator(function):
+                self.on(msg_type, function, last)
+                return function
+
+            return decorator
+
+        msgid = message_id(msg_type)
+        with self.lock:
+            handlers = self.late_handlers if last else self.handlers
+            handlers.setdefault(msgid, []).append(handler)
+            self._rebuild(msgid)
+        return handler
+
+    def off(self, msg_type, handler):
+        """unsubscribes handler from msg_type"""
+        msgid = message_id(msg_type)
+        with self.lock:
+            for handlers in (self.handlers, self.late_handlers):
+                if handler in handlers.get(msgid, ()):
+                    handlers[msgid].remove(handler)
+                    if not handlers[msgid]:
+                        del handlers[msgid]
+            self._rebuild(msgid)
+
+    def subscribed(self, msgid):
+        """returns True if any handler is subscribed to msgid"""
+        return msgid in self.table
+
+    def dispatch(self, msg):
+        """
+        calls every handler subscribed to the message's id. a handler that raises is
+        logged and skipped, so one faulty observer never stops the others or the link
+        """
+        handlers = self.table.get(msg.get_msgId())
+        if handlers is None:
+            return
+        for handler in handlers:
+            try:
+                handler(msg)
+            except Exception as e:
+                self._failed(handler, msg, e)
+
+    def _failed(self, handler, msg, error):
+        # the first failure of a handler and every FAILURE_LOG_INTERVAL-th after it are
+        # logged, so a handler failing on every message does not flood the log
+        count = self.failures.get(handler, 0) + 1
+        self.failures[handler] = count
+        if count % FAILURE_LOG_INTERVAL == 1:
+            print("[ERROR]    Telemetry         %s handler %s failed (%d times): %r" % (
+                msg.get_type(), getattr(handler, "__qualname__", handler), count, error))
+
+    def _rebuild(self, msgid):
+        handlers = tuple(self.handlers.get(msgid, ())) + tuple(self.late_handlers.get(msgid, ()))
+        # swap the entry in one assignment so the polling thread never sees a partial table
+        if handlers:
+            self.table[msgid] = handlers
+        else:
+            self.table.pop(msgid, None)
@@ -0,0 +1,312 @@
+import math
+import threading
+import time
+from types import SimpleNamespace
+
+# below this ground speed, m/s, there is no meaningful ETA
+MIN_SPEED = 0.5
+
+
+class Arrival:
+    def __init__(self, radius=1, pass_plane=False, time_budget=None):
+        """
+        When a reroute point counts as reached. Any one predicate is enough
+
+        Args:
+            radius (number, optional): metres from the point within which it is reached
+            pass_plane (bool, optional): reached once past the plane through the point square
+                to the leg flown to it, so a point missed by more than the radius is not circled
+            time_budget (number, optional): seconds after becoming the target at which a point
+                is given up on and the next one flown to
+        """
+        self.radius = radius
+        self.pass_plane = pass_plane
+        self.time_budget = time_budget
+
+    @classmethod
+    def from_json(cls, arrival):
+        """Arrival from {"radius", "passPlane", "timeBudget"}, all optional"""
+        return cls(arrival.get("radius", 1), arrival.get("passPlane", False), arrival.get("timeBudget"))
+
+    def reached(self, start, current, target, distance, elapsed, next_point=None):
+        """
+        returns which predicate the current position meets, "radius", "pass plane" or
+        "time budget", or None
+
+        Args:
+            start (LocalPoint): where the leg to the target started
+            current (LocalPoint): current position
+            target (LocalPoint): point flown to
+            distance (number): metres from current to target
+            elapsed (number): seconds since target became the target
+            next_point (LocalPoint, optional): point after the target. The plane then
+                bisects the turn at the target, as an aircraft cutting the corner may
+                turn away before the plane square to its leg
+        """
+        if distance <= self.radius:
+            return "radius"
+        if self.pass_plane:
+            normal = unit(target.east - start.east, target.north - start.north)
+            if next_point is not None:
+                after = unit(next_point.east - target.east, next_point.north - target.north)
+                bisector = (normal[0] + after[0], normal[1] + after[1])
+                if math.hypot(*bisector) > 1e-6:
+                    normal = bisector
+            past = (current.east - target.east) * normal[0] + (current.north - target.north) * normal[1]
+            if normal != (0, 0) and past >= 0:
+                return "pass plane"
+        if self.time_budget is not None and elapsed >= self.time_budget:
+            return "time budget"
+        return None
+
+
+def unit(east, north):
+    length = math.hypot(east, north)
+    return (east / length, north / length) if length > 0 else (0, 0)
+
+
+class RerouteExecutor:
+    def __init__(self, vehicle, route, arrival, streamer=None, clock=time.monotonic):
+        """
+        Flies a Route in guided mode, driven by position updates from the telemetry thread
+        instead of a thread of its own. Each GPS_RAW_INT moves on to the next point when
+        the current one is reached, see Arrival, and follows routes replaced by replanning.
+        cancel() and replacements take effect by the next position update at the latest.
+        Each point is sent as a guided mission item, or with a streamer the remaining path
+        is handed to it, which streams setpoints along it
+
+        Args:
+            vehicle (Vehicle): vehicle to fly, its telemetry must be polling
+            route (Route): points to fly to
+            arrival (Arrival): when a point counts as reached
+            streamer (SetpointStreamer, optional): streams setpoints instead of fly_to
+            clock (function, optional): seconds, for the time budget
+        """
+        self.vehicle = vehicle
+        self.telemetry = vehicle.telemetry
+        self.route = route
+        self.arrival = arrival
+        self.streamer = streamer
+        if streamer is not None:
+            streamer.on_failure = self.stream_failed
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.state = "pending"  # then "flying", and "finished", "cancelled" or "failed"
+        self.guided = False  # whether guided mode was requested, see fail()
+
+        # the point flown to, in the projection picked for it
+        self.point = None
+        self.projection = None
+        self.target = None
+        self.start_point = None
+        self.started = None
+        self.distance = None
+        self.reason = None  # predicate that ended the last leg
+        self.passed = None  # point just reached, where the next leg starts
+        self.start_alt = None
+
+        # length of the route after the current point, for the status
+        self.revision = None
+        self.beyond = 0.0
+        # route revision the point after the target and the streamer's path were read at
+        self.next_point = None
+        self.path_revision = None
+
+    def start(self):
+        """
+        switches to guided mode, flies to the first point and follows position updates.
+        The first target is worked out before anything is sent to the vehicle; if starting
+        fails anyway the executor is rolled back, see fail(), and the exception raised
+        """
+        with self.lock:
+            if self.state != "pending":
+                return
+            try:
+                point = self.route.target()
+                if point is not None:
+                    self.retarget(point, self.position())
+                self.vehicle.set_guided()
+                self.guided = True
+                self.state = "flying"
+                self.telemetry.dispatcher.on("GPS_RAW_INT", self.on_position)
+                if point is not None:
+                    self.fly()
+                self.step(self.position())
+                if self.streamer is not None and self.state == "flying":
+                    self.streamer.start()
+            except Exception:
+                self.fail()
+                raise
+
+    def cancel(self):
+        """stops following the route, leaving the mode as it is. Returns False if it had already ended"""
+        with self.lock:
+            if self.state in ("finished", "cancelled", "failed"):
+                return False
+            self.state = "cancelled"
+            self.telemetry.dispatcher.off("GPS_RAW_INT", self.on_position)
+            if self.streamer is not None:
+                self.streamer.stop()
+            return True
+
+    def refresh(self):
+        """picks up a replaced route now rather than on the next position update"""
+        with self.lock:
+            if self.state == "flying":
+                self.step(self.position())
+
+    def position(self):
+        telemetry = self.telemetry
+        if telemetry.lat is None or telemetry.alt is None:
+            return None
+        return telemetry.lat, telemetry.lng, telemetry.alt
+
+    def on_position(self, msg):
+        with self.lock:
+            if self.state != "flying":
+                return
+            try:
+                self.step(self.position())
+            except Exception as e:
+                print("[ERROR]    Reroute           Failed, resuming the mission:", e)
+                self.fail()
+
+    def step(self, position):
+        """flies to the route's target and checks arrival, with the lock held"""
+        while True:
+            point = self.route.target()
+            if point is None:
+                self.finish()
+                return
+            # a new target, either the next point or the first of a replanned route
+            if point is not self.point:
+                self.retarget(point, position)
+                self.fly()
+            if position is None:
+                return
+
+            current = self.projection.point(*position)
+            if self.start_point is None:
+                self.start_point = current
+                self.path_revision = None
+            if self.path_revision != self.route.revision:
+                self.follow()
+            self.distance = self.projection.distance(current, self.target)
+            reason = self.arrival.reached(self.start_point, current, self.target, self.distance,
+                                          self.clock() - self.started, self.next_point)
+            if reason is None:
+                return
+            # the next point is checked against the same position, it may be passed too
+            self.reason = reason
+            self.passed = point
+            self.route.reached(point)
+
+    def retarget(self, point, position):
+        self.point = point
+        # the target is projected once, each position update is then planar maths
+        self.projection = self.vehicle.local_projection(point["lat"], point["lng"])
+        self.target = self.projection.point(point["lat"], point["lng"], point["alt"])
+        # legs run from point to point, a route's first leg or a replanned one from where we are
+        start = self.passed
+        self.passed = None
+        if start is not None:
+            self.start_point = self.projection.point(start["lat"], start["lng"], start["alt"])
+        else:
+            self.start_point = None if position is None else self.projection.point(*position)
+        # altitude the streamed path starts at, in the frame of the points
+        self.start_alt = point["alt"] if start is None else start["alt"]
+        self.started = self.clock()
+        self.distance = None
+        self.path_revision = None
+
+    def stream_failed(self):
+        """falls back to guided mission items once the streamer gave up"""
+        with self.lock:
+            if self.streamer is None or self.state != "flying":
+                return
+            self.streamer = None
+            if self.point is not None:
+                self.fly()
+
+    def fly(self):
+        """sends the target as a guided mission item, unless a streamer flies the path"""
+        if self.streamer is None:
+            self.vehicle.fly_to(self.point["lat"], self.point["lng"], self.point["alt"])
+
+    def follow(self):
+        """
+        reads the point after the target, and hands the streamer the path from the start
+        of the current leg through the remaining points
+        """
+        points, revision = self.route.points()
+        self.path_revision = revision
+        if self.streamer is None:
+            self.next_point = self.projection.point(points[1]["lat"], points[1]["lng"]) if len(points) > 1 else None
+            return
+        path = [(self.start_point.east, self.start_point.north, self.start_alt)]
+        for point in points:
+            local = self.projection.point(point["lat"], point["lng"])
+            path.append((local.east, local.north, point["alt"]))
+        self.next_point = SimpleNamespace(east=path[2][0], north=path[2][1]) if len(path) > 2 else None
+        self.streamer.follow(self.projection, path)
+
+    def finish(self):
+        self.state = "finished"
+        self.point = None
+        self.distance = None
+        self.telemetry.dispatcher.off("GPS_RAW_INT", self.on_position)
+        if self.streamer is not None:
+            self.streamer.stop()
+        self.vehicle.set_auto()
+
+    def fail(self):
+        """ends the reroute after an error, with the lock held, and resumes the mission in auto if it was left"""
+        self.state = "failed"
+        self.point = None
+        self.distance = None
+        self.telemetry.dispatcher.off("GPS_RAW_INT", self.on_position)
+        if self.streamer is not None:
+            self.streamer.stop()
+        if not self.guided:
+            return
+        try:
+            self.vehicle.set_auto()
+        except Exception as e:
+            print("[ERROR]    Reroute           Could not resume the mission:", e)
+
+    def status(self):
+        """
+        returns {"state", "leg", "legs", "target", "distance", "remaining", "eta", "arrival"}:
+        the goal being flown to out of all of them, the point flown to, metres to it and to
+        the end of the route, seconds to the end at the current ground speed, and the
+        predicate that ended the last leg
+        """
+        with self.lock:
+            state, point, distance, projection = self.state, self.point, self.distance, self.projection
+            reason = self.reason
+            beyond, beyond_revision = self.beyond, self.revision
+
+        remaining = eta = None
+        if distance is not None:
+            points, revision = self.route.points()
+            if revision != beyond_revision:
+                local = [projection.point(p["lat"], p["lng"]) for p in points]
+                beyond = sum(projection.distance(a, b) for a, b in zip(local, local[1:]))
+                # published together, so a slower request cannot pair its sum with a newer revision
+                with self.lock:
+                    self.beyond, self.revision = beyond, revision
+            remaining = distance + beyond
+            telemetry = self.telemetry
+            speed = math.hypot(telemetry.vx, telemetry.vy) if telemetry.vx is not None else 0
+            eta = remaining / speed if speed >= MIN_SPEED else None
+
+        return {
+            "state": state,
+            "leg": self.route.leg(),
+            "legs": self.route.count,
+            "target": point,
+            "distance": distance,
+            "remaining": remaining,
+            "eta": eta,
+            "arrival": reason,
+        }
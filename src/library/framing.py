@@ -0,0 +1,86 @@
+from pymavlink import mavutil
+
+MAGIC_V1 = 0xFE
+MAGIC_V2 = 0xFD
+HEADER_LEN_V1 = 6
+HEADER_LEN_V2 = 10
+CHECKSUM_LEN = 2
+SIGNATURE_LEN = 13
+INCOMPAT_FLAG_SIGNED = 0x01
+
+
+class FrameSplitter:
+    def __init__(self):
+        """
+        Splits a raw MAVLink 1/2 byte stream into frames by reading only the frame
+        headers, so frames can be routed by message id before paying for a full decode.
+
+        Frames are not checksummed here; that happens when a frame is decoded. A magic
+        byte found in line noise is rejected if its header is malformed or names an
+        unknown message, and parsing resumes at the next byte.
+        """
+        self.buf = bytearray()
+        self.bad_bytes = 0
+        self.rejected = False
+
+    def feed(self, data):
+        self.buf.extend(data)
+
+    def frames(self):
+        """
+        yields (msgid, frame) for every complete frame buffered so far. incomplete
+        trailing bytes are kept for the next feed
+        """
+        buf = self.buf
+        known_ids = mavutil.mavlink.mavlink_map
+        pos = 0
+        end = len(buf)
+        try:
+            while pos < end:
+                magic = buf[pos]
+                if magic == MAGIC_V2:
+                    if end - pos < HEADER_LEN_V2:
+                        break
+                    incompat_flags = buf[pos + 2]
+                    msgid = buf[pos + 7] | buf[pos + 8] << 8 | buf[pos + 9] << 16
+                    length = HEADER_LEN_V2 + buf[pos + 1] + CHECKSUM_LEN
+                    if incompat_flags & INCOMPAT_FLAG_SIGNED:
+                        length += SIGNATURE_LEN
+                    valid = incompat_flags & ~INCOMPAT_FLAG_SIGNED == 0 and msgid in known_ids
+                elif magic == MAGIC_V1:
+                    if end - pos < HEADER_LEN_V1:
+                        break
+                    msgid = buf[pos + 5]
+                    length = HEADER_LEN_V1 + buf[pos + 1] + CHECKSUM_LEN
+                    valid = msgid in known_ids
+                else:
+                    pos += 1
+                    self.bad_bytes += 1
+                    continue
+
+                if not valid:
+                    pos += 1
+                    self.bad_bytes += 1
+                    continue
+                if end - pos < length:
+                    break
+
+                # consumed before it is yielded, so a consumer that stops or raises on
+                # this frame does not get it again
+                start = pos
+                pos += length
+                yield msgid, bytes(buf[start:pos])
+                if self.rejected:
+                    self.rejected = False
+                    pos = start + 1
+        finally:
+            # drop consumed bytes even if the consumer stops early
+            del buf[:pos]
+
+    def reject(self):
+        """
+        called when the frame just yielded fails to decode. it was most likely a false
+        sync, so parsing resumes at the byte after its magic byte
+        """
+        self.bad_bytes += 1
+        self.rejected = True
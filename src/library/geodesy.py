@@ -0,0 +1,181 @@
+"""
+Vectorised geodesy on the WGS84 ellipsoid.
+
+Every function takes scalars or NumPy arrays of latitudes and longitudes in degrees,
+broadcasts them against each other and returns arrays, so a whole route or obstacle
+set is handled in one call instead of a Python loop over util.py's scalar helpers.
+Distances are in metres and bearings in degrees clockwise from north, in [0, 360).
+
+inverse and destination use Vincenty's formulae, which agree with geographiclib to
+well under a millimetre. The few nearly antipodal pairs where Vincenty's inverse does
+not converge are solved with geographiclib instead.
+"""
+import numpy as np
+from geographiclib.geodesic import Geodesic
+
+# WGS84
+A = 6378137.0
+F = 1 / 298.257223563
+B = A * (1 - F)
+# first and second eccentricity squared
+E2 = F * (2 - F)
+EP2 = (A ** 2 - B ** 2) / B ** 2
+# radius of the sphere with the ellipsoid's mean radius, for along and cross track
+MEAN_RADIUS = (2 * A + B) / 3
+
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-12
+
+
+def inverse(lat1, lng1, lat2, lng2):
+    """
+    solves the inverse geodesic problem between point 1 and point 2
+
+    Args:
+        lat1, lng1 (number or array): first points, degrees
+        lat2, lng2 (number or array): second points, degrees
+
+    Returns:
+        distances in metres, bearings at point 1 and bearings at point 2 in degrees
+    """
+    lat1, lng1, lat2, lng2 = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (lat1, lng1, lat2, lng2)))
+    shape = lat1.shape
+    lat1, lng1, lat2, lng2 = (v.ravel() for v in (lat1, lng1, lat2, lng2))
+
+    L = np.radians(lng2 - lng1)
+    U1 = np.arctan((1 - F) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - F) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1 = np.sin(U1), np.cos(U1)
+    sin_u2, cos_u2 = np.sin(U2), np.cos(U2)
+
+    lam = L
+    converged = np.zeros(L.shape, dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(MAX_ITERATIONS):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            # coincident points have sin_sigma == 0
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # equatorial lines have cos2_alpha == 0
+            cos_2sm = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha)
+            C = F / 16 * cos2_alpha * (4 + F * (4 - 3 * cos2_alpha))
+            previous = lam
+            lam = L + (1 - C) * F * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sm + C * cos_sigma * (-1 + 2 * cos_2sm ** 2)))
+            converged = np.abs(lam - previous) < TOLERANCE
+            if converged.all():
+                break
+
+    u2 = cos2_alpha * EP2
+    big_a = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    big_b = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+    delta_sigma = big_b * sin_sigma * (cos_2sm + big_b / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sm ** 2)
+        - big_b / 6 * cos_2sm * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sm ** 2)))
+
+    sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+    distance = B * big_a * (sigma - delta_sigma)
+    azi1 = np.degrees(np.arctan2(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)) % 360
+    azi2 = np.degrees(np.arctan2(cos_u1 * sin_lam, -sin_u1 * cos_u2 + cos_u1 * sin_u2 * cos_lam)) % 360
+
+    # nearly antipodal points, rare enough to solve one at a time
+    for index in np.flatnonzero(~converged):
+        result = Geodesic.WGS84.Inverse(lat1[index], lng1[index], lat2[index], lng2[index])
+        distance[index] = result["s12"]
+        azi1[index] = result["azi1"] % 360
+        azi2[index] = result["azi2"] % 360
+
+    return distance.reshape(shape), azi1.reshape(shape), azi2.reshape(shape)
+
+
+def distance(lat1, lng1, lat2, lng2):
+    """returns the geodesic distances in metres from point 1 to point 2"""
+    return inverse(lat1, lng1, lat2, lng2)[0]
+
+
+def bearing(lat1, lng1, lat2, lng2):
+    """returns the initial bearings in degrees from point 1 to point 2"""
+    return inverse(lat1, lng1, lat2, lng2)[1]
+
+
+def destination(lat, lng, bearing, distance):
+    """
+    solves the direct geodesic problem: the points reached by travelling distance
+    metres from lat, lng along the given initial bearing
+
+    Args:
+        lat, lng (number or array): start points, degrees
+        bearing (number or array): initial bearings, degrees
+        distance (number or array): distances, metres
+
+    Returns:
+        latitudes and longitudes of the end points in degrees
+    """
+    lat, lng, bearing, distance = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (lat, lng, bearing, distance)))
+
+    alpha1 = np.radians(bearing)
+    sin_a1, cos_a1 = np.sin(alpha1), np.cos(alpha1)
+    tan_u1 = (1 - F) * np.tan(np.radians(lat))
+    cos_u1 = 1 / np.sqrt(1 + tan_u1 ** 2)
+    sin_u1 = tan_u1 * cos_u1
+    sigma1 = np.arctan2(tan_u1, cos_a1)
+    sin_alpha = cos_u1 * sin_a1
+    cos2_alpha = 1 - sin_alpha ** 2
+    u2 = cos2_alpha * EP2
+    big_a = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    big_b = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+
+    sigma = distance / (B * big_a)
+    for _ in range(MAX_ITERATIONS):
+        cos_2sm = np.cos(2 * sigma1 + sigma)
+        sin_sigma, cos_sigma = np.sin(sigma), np.cos(sigma)
+        delta_sigma = big_b * sin_sigma * (cos_2sm + big_b / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sm ** 2)
+            - big_b / 6 * cos_2sm * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sm ** 2)))
+        previous = sigma
+        sigma = distance / (B * big_a) + delta_sigma
+        if (np.abs(sigma - previous) < TOLERANCE).all():
+            break
+
+    cos_2sm = np.cos(2 * sigma1 + sigma)
+    sin_sigma, cos_sigma = np.sin(sigma), np.cos(sigma)
+    tmp = sin_u1 * sin_sigma - cos_u1 * cos_sigma * cos_a1
+    lat2 = np.arctan2(sin_u1 * cos_sigma + cos_u1 * sin_sigma * cos_a1,
+                      (1 - F) * np.hypot(sin_alpha, tmp))
+    lam = np.arctan2(sin_sigma * sin_a1, cos_u1 * cos_sigma - sin_u1 * sin_sigma * cos_a1)
+    C = F / 16 * cos2_alpha * (4 + F * (4 - 3 * cos2_alpha))
+    L = lam - (1 - C) * F * sin_alpha * (
+        sigma + C * sin_sigma * (cos_2sm + C * cos_sigma * (-1 + 2 * cos_2sm ** 2)))
+    lng2 = (lng + np.degrees(L) + 180) % 360 - 180
+    return np.degrees(lat2), lng2
+
+
+def cross_track(lat, lng, start_lat, start_lng, end_lat, end_lng):
+    """
+    returns the signed distances in metres of points from the paths start -> end,
+    positive to the right of the direction of travel
+
+    the paths are treated as great circles on a sphere of the ellipsoid's mean radius,
+    which is within a fraction of a percent of the geodesic over mission distances
+    """
+    d13, azi13, _ = inverse(start_lat, start_lng, lat, lng)
+    azi12 = bearing(start_lat, start_lng, end_lat, end_lng)
+    angle = d13 / MEAN_RADIUS
+    return np.arcsin(np.sin(angle) * np.sin(np.radians(azi13 - azi12))) * MEAN_RADIUS
+
+
+def along_track(lat, lng, start_lat, start_lng, end_lat, end_lng):
+    """
+    returns the signed distances in metres from start to the closest point of the paths
+    start -> end to the points, negative behind start
+    """
+    d13, azi13, _ = inverse(start_lat, start_lng, lat, lng)
+    azi12 = bearing(start_lat, start_lng, end_lat, end_lng)
+    angle = d13 / MEAN_RADIUS
+    xt = np.arcsin(np.sin(angle) * np.sin(np.radians(azi13 - azi12)))
+    along = np.arccos(np.clip(np.cos(angle) / np.cos(xt), -1, 1)) * MEAN_RADIUS
+    return np.where(np.cos(np.radians(azi13 - azi12)) < 0, -along, along)
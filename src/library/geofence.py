@@ -0,0 +1,87 @@
+import numpy as np
+
+from src.library.planner import PolygonObstacle, obstacles_from_json
+from src.library.spatial_index import SpatialIndex
+
+
+class GeofenceViolation(Exception):
+    def __init__(self, violations):
+        """raised when a route leaves the geofence or enters an obstacle, with one message per problem"""
+        super().__init__("; ".join(violations))
+        self.violations = violations
+
+
+class Geofence:
+    def __init__(self, projection, geofence, cell_size=50):
+        """
+        Fence polygons the aircraft has to stay inside and obstacles it has to stay out of,
+        indexed in the projection's metres so routes can be checked in one batch query
+
+        Args:
+            projection (LocalProjection): projection the shapes are indexed in
+            geofence (dict): {"fence": [{"lat", "lng"}, ...], "obstacles": [...]}, both
+                optional, obstacles as in planner.obstacles_from_json
+            cell_size (number, optional): side of the spatial index's grid cells, metres
+        """
+        self.projection = projection
+        self.json = geofence
+        fence = geofence.get("fence") or []
+        if fence and len(fence) < 3:
+            raise Exception("The fence needs at least 3 points")
+        fences = [PolygonObstacle(self.local(fence))] if fence else []
+        obstacles = obstacles_from_json(projection, geofence.get("obstacles") or [])
+        self.fence_count = len(fences)
+        self.index = SpatialIndex(fences + obstacles, cell_size)
+
+    def local(self, points):
+        """(n, 2) east, north metres of {"lat", "lng"} points"""
+        projected = [self.projection.point(point["lat"], point["lng"]) for point in points]
+        return np.array([(point.east, point.north) for point in projected]).reshape(-1, 2)
+
+    def shape_name(self, shape):
+        return "the geofence" if shape < self.fence_count else "obstacle %d" % (shape - self.fence_count)
+
+    def violations(self, points, names, start=None):
+        """
+        returns a message for each point outside the fence or inside an obstacle, and for
+        each leg between consecutive points that crosses the fence or an obstacle
+
+        Args:
+            points (list): route points in order, {"lat", "lng"}
+            names (list): name of each point for the messages, e.g. "waypoint 2"
+            start (dict, optional): where the route starts, {"lat", "lng", "name"}. only
+                the leg from it is checked, so a route back into the fence is allowed
+        """
+        if not points:
+            return []
+        local = self.local(points)
+        messages = []
+
+        point_ids, shapes = self.index.containing(local)
+        inside = np.zeros((len(points), self.index.count), dtype=bool)
+        inside[point_ids, shapes] = True
+        for i in np.flatnonzero(~inside[:, :self.fence_count].all(axis=1)):
+            messages.append("%s is outside the geofence" % names[i].capitalize())
+        for i, shape in zip(point_ids.tolist(), shapes.tolist()):
+            if shape >= self.fence_count:
+                messages.append("%s is inside %s" % (names[i].capitalize(), self.shape_name(shape)))
+
+        returning = False
+        if start is not None:
+            start_local = self.local([start])
+            returning = self.fence_count and not np.isin(
+                np.arange(self.fence_count), self.index.containing(start_local)[1]).all()
+            local = np.vstack([start_local, local])
+            names = [start["name"]] + list(names)
+        legs, shapes = self.index.crossings(local[:-1], local[1:])
+        for i, shape in zip(legs.tolist(), shapes.tolist()):
+            if returning and i == 0 and shape < self.fence_count:
+                continue
+            messages.append("The path from %s to %s crosses %s" % (names[i], names[i + 1], self.shape_name(shape)))
+        return messages
+
+    def check(self, points, names, start=None):
+        """raises a GeofenceViolation if the route leaves the fence or enters an obstacle, see violations"""
+        messages = self.violations(points, names, start)
+        if messages:
+            raise GeofenceViolation(messages)
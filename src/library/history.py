@@ -0,0 +1,124 @@
+import math
+import time
+from threading import Lock
+
+import numpy as np
+
+CHANNELS = ("timestamp", "lat", "lng", "alt", "heading", "groundspeed", "armed")
+
+
+class TelemetryHistory:
+    def __init__(self, capacity):
+        """
+        Recent telemetry kept in fixed size ring buffers, one preallocated NumPy array
+        per channel. New samples overwrite the oldest ones in place, so recording from
+        the telemetry observers never allocates.
+
+        Samples are timestamped with time.monotonic(), so windows stay ordered when the
+        system clock is stepped; summary() converts them to unix time.
+
+        Args:
+            capacity (number): samples kept per channel
+        """
+        self.capacity = capacity
+        self.channels = {name: np.full(capacity, np.nan) for name in CHANNELS}
+        self.count = 0  # samples recorded since start, the next write is at count % capacity
+        self.lock = Lock()
+
+    def record(self, timestamp, lat, lng, alt, heading, groundspeed, armed):
+        """
+        appends a sample. values that are not known yet may be None
+
+        Args:
+            timestamp (number): time.monotonic() of the sample in seconds
+        """
+        with self.lock:
+            index = self.count % self.capacity
+            channels = self.channels
+            channels["timestamp"][index] = timestamp
+            channels["lat"][index] = np.nan if lat is None else lat
+            channels["lng"][index] = np.nan if lng is None else lng
+            channels["alt"][index] = np.nan if alt is None else alt
+            channels["heading"][index] = np.nan if heading is None else heading
+            channels["groundspeed"][index] = np.nan if groundspeed is None else groundspeed
+            channels["armed"][index] = armed
+            self.count += 1
+
+    def window(self, since, until=None, max_points=None):
+        """
+        returns copies of every channel for the samples taken between since and until,
+        oldest first. if max_points is given, the window is decimated to at most that
+        many samples by keeping every n-th one
+
+        Args:
+            since (number): time.monotonic() of the oldest sample
+            until (number, optional): time.monotonic() of the newest sample. Defaults to now.
+            max_points (number, optional): maximum number of samples returned
+        """
+        with self.lock:
+            size = min(self.count, self.capacity)
+            # ring positions in chronological order
+            order = np.arange(self.count - size, self.count) % self.capacity
+            timestamps = self.channels["timestamp"][order]
+            start = np.searchsorted(timestamps, since, side="left")
+            end = size if until is None else np.searchsorted(timestamps, until, side="right")
+            selected = order[start:end]
+            if max_points and len(selected) > max_points:
+                selected = selected[::math.ceil(len(selected) / max_points)]
+            return {name: values[selected] for name, values in self.channels.items()}
+
+    def summary(self, since, until=None, max_points=None):
+        """
+        returns a JSON serializable window of samples (decimated like window) together
+        with per channel min/max/mean and rate of change (per second), computed over
+        the full, undecimated window. since and until are time.monotonic() values like
+        for window, the returned timestamps are unix time and armed is a bool
+        """
+        window = self.window(since, until)
+        timestamps = window["timestamp"]
+
+        aggregates = {}
+        for name in CHANNELS[1:]:
+            aggregates[name] = aggregate(timestamps, window[name])
+
+        duration = timestamps[-1] - timestamps[0] if len(timestamps) > 1 else 0
+        sample_rate = (len(timestamps) - 1) / duration if duration > 0 else None
+
+        if max_points and len(timestamps) > max_points:
+            step = math.ceil(len(timestamps) / max_points)
+            window = {name: values[::step] for name, values in window.items()}
+
+        samples = {name: to_list(values) for name, values in window.items()}
+        # the clocks are read together, so all samples move by the same offset
+        offset = time.time() - time.monotonic()
+        samples["timestamp"] = [timestamp + offset for timestamp in samples["timestamp"]]
+        samples["armed"] = [None if armed is None else bool(armed) for armed in samples["armed"]]
+
+        return {
+            "samples": samples,
+            "aggregates": aggregates,
+            "count": len(timestamps),
+            "sample_rate": sample_rate,
+        }
+
+
+def aggregate(timestamps, values):
+    """min/max/mean and average rate of change per second of a channel, ignoring gaps"""
+    known = ~np.isnan(values)
+    if not known.any():
+        return {"min": None, "max": None, "mean": None, "rate": None}
+
+    times = timestamps[known]
+    values = values[known]
+    duration = times[-1] - times[0]
+    return {
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "mean": float(values.mean()),
+        "rate": float((values[-1] - values[0]) / duration) if duration > 0 else None,
+    }
+
+
+def to_list(values):
+    """converts an array to a list with NaN (unknown) as None, so it can be sent as JSON"""
+    return [None if math.isnan(value) else value for value in values.tolist()]
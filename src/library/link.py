@@ -0,0 +1,103 @@
+import asyncio
+from threading import Thread
+
+from pymavlink import mavutil
+
+
+class AsyncLink:
+    def __init__(self, telemetry, heartbeat_interval=1):
+        """
+        Runs the MAVLink link on an asyncio event loop in a background thread. Incoming
+        bytes are read as soon as the connection's file descriptor becomes readable
+        (TCP socket or serial port alike), and heartbeats are sent from their own timer
+        instead of between reads.
+
+        Synchronous code keeps using Telemetry.wait/latest, which are woken from the same
+        dispatch. Coroutines can be scheduled from other threads with run_threadsafe.
+
+        Args:
+            telemetry (Telemetry): telemetry instance that decodes and dispatches messages
+            heartbeat_interval (number, optional): seconds between heartbeats. Defaults to 1.
+        """
+        self.telemetry = telemetry
+        self.mavlink_connection = telemetry.mavlink_connection
+        self.heartbeat_interval = heartbeat_interval
+        self.next_heartbeat = None
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.add_reader(self.mavlink_connection.fd, self.on_readable)
+        self.next_heartbeat = self.loop.time()
+        self.loop.call_soon(self.send_heartbeat)
+        self.loop.run_forever()
+
+    def on_readable(self):
+        try:
+            self.telemetry.receive_messages()
+        except (OSError, EOFError) as e:
+            # the connection is gone, stop watching its file descriptor
+            print("Exception in MAVLink input loop")
+            print(e)
+            self.loop.remove_reader(self.mavlink_connection.fd)
+        except Exception as e:
+            # anything else only loses the messages read so far, keep reading
+            print("Exception while receiving message: ")
+            print(e)
+
+    def send_heartbeat(self):
+        """
+        sends a heartbeat to the autopilot and schedules the next one. deadlines advance
+        by a fixed interval, so the period does not drift with the read load
+        """
+        try:
+            self.mavlink_connection.mav.heartbeat_send(
+                mavutil.mavlink.MAV_TYPE_GCS,
+                mavutil.mavlink.MAV_AUTOPILOT_INVALID,
+                0,
+                0,
+                0,
+            )
+        except Exception as e:
+            print("Exception while sending heartbeat: ")
+            print(e)
+
+        self.next_heartbeat += self.heartbeat_interval
+        now = self.loop.time()
+        if self.next_heartbeat < now:
+            # the loop was blocked for more than a period, do not send a burst
+            self.next_heartbeat = now + self.heartbeat_interval
+        self.loop.call_at(self.next_heartbeat, self.send_heartbeat)
+
+    async def wait_for(self, msg_type, timeout=None):
+        """
+        waits until a specific msg_type is received, and returns it. if timeout is
+        specified and is reached, returns None
+
+        Args:
+            msg_type (string): mavlink message
+            timeout (number, optional): timeout in seconds. Defaults to None.
+        """
+        self.telemetry.track(msg_type)
+        future = self.telemetry.waiters.register(msg_type)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self.telemetry.waiters.unregister(msg_type, future)
+            return None
+
+    def run_threadsafe(self, coroutine, timeout=None):
+        """
+        runs a coroutine on the link's event loop from any other thread (for example a
+        Flask request) and blocks until it returns
+
+        Args:
+            coroutine (coroutine): coroutine to run, e.g. link.wait_for('HEARTBEAT')
+            timeout (number, optional): timeout in seconds. Defaults to None.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
@@ -0,0 +1,129 @@
+import time
+from threading import Lock
+
+from pymavlink import mavutil
+
+
+class MissionCache:
+    def __init__(self, mavlink_connection):
+        """
+        ACOM's copy of the mission on the vehicle, as MISSION_ITEM_INT messages. It is
+        stored after every upload and download and stays valid until the vehicle shows
+        that its mission changed: another groundstation transferring a mission
+        (MISSION_REQUEST or MISSION_ACK addressed to it) or MISSION_CURRENT reporting a
+        different total outside of our own transfers.
+        Every change of the copy gets a new version, so clients can cache it by ETag
+
+        Args:
+            mavlink_connection (mavlink_connection): connection to the vehicle
+        """
+        self.mavlink_connection = mavlink_connection
+        self.lock = Lock()
+        self.items = None  # None while the vehicle's mission is unknown
+        self.version = 0
+        self.epoch = "%x" % int(time.time())  # keeps ETags unique across restarts
+        self.invalidations = 0
+        self.transferring = False
+        self.total = None  # MISSION_CURRENT total seen since the last store
+
+    def attach(self, dispatcher):
+        dispatcher.on("MISSION_ACK", self.on_transfer)
+        dispatcher.on("MISSION_REQUEST", self.on_transfer)
+        dispatcher.on("MISSION_REQUEST_INT", self.on_transfer)
+        dispatcher.on("MISSION_CURRENT", self.on_current)
+        dispatcher.on("HOME_POSITION", self.on_home)
+
+    def etag(self):
+        return "%s-%d" % (self.epoch, self.version)
+
+    def snapshot(self):
+        """returns the ETag and items of the cached mission, or (None, None) if it is not known"""
+        with self.lock:
+            if self.items is None:
+                return None, None
+            return self.etag(), self.items
+
+    def begin_transfer(self):
+        """call before a transfer with the vehicle, returns the generation to pass to store"""
+        with self.lock:
+            self.transferring = True
+            return self.invalidations
+
+    def end_transfer(self):
+        with self.lock:
+            self.transferring = False
+            self.total = None
+
+    def store(self, items, generation=None):
+        """
+        stores the vehicle's mission after a transfer. if the mission was invalidated
+        since generation was taken the transfer may be stale, so it is not cached.
+        returns the ETag of the stored mission or None
+        """
+        with self.lock:
+            if generation is not None and generation != self.invalidations:
+                return None
+            self.items = list(items)
+            self.version += 1
+            self.total = None
+            return self.etag()
+
+    def invalidate(self, reason):
+        with self.lock:
+            self.invalidations += 1
+            self.total = None
+            if self.items is not None:
+                print("[OK]       Mission cache     invalidated, " + reason)
+            self.items = None
+
+    def home(self):
+        """returns the cached home item (seq 0), or None"""
+        with self.lock:
+            return self.items[0] if self.items else None
+
+    def on_transfer(self, msg):
+        if (msg.get_srcSystem() != self.mavlink_connection.target_system
+                or getattr(msg, "mission_type", 0) != mavutil.mavlink.MAV_MISSION_TYPE_MISSION):
+            return
+        # transfers with us are stored when they finish
+        if msg.target_system not in (0, self.mavlink_connection.source_system):
+            self.invalidate("system %d is transferring a mission" % msg.target_system)
+
+    def on_current(self, msg):
+        # total is a MAVLink2 extension, missing with the v1 dialect
+        reported = getattr(msg, "total", 0)
+        if msg.get_srcSystem() != self.mavlink_connection.target_system or reported == 0:
+            # 0 means the autopilot does not report the total
+            return
+        with self.lock:
+            if self.transferring or self.items is None:
+                return
+            total = self.total
+            if total is None:
+                # ardupilot leaves home out of the total. a total that does not match the
+                # copy can be from before our last transfer, so it is not used as the baseline
+                if reported in (len(self.items) - 1, len(self.items)):
+                    self.total = reported
+                return
+        if total != reported:
+            self.invalidate("mission total changed from %d to %d" % (total, reported))
+
+    def on_home(self, msg):
+        # the autopilot keeps its home position in item 0
+        if msg.get_srcSystem() != self.mavlink_connection.target_system:
+            return
+        with self.lock:
+            if not self.items:
+                return
+            home = self.items[0]
+            x, y, z = msg.latitude, msg.longitude, msg.altitude / 1000
+            if (home.x, home.y, home.z) == (x, y, z):
+                return
+            # snapshots already handed out keep their list
+            items = list(self.items)
+            items[0] = mavutil.mavlink.MAVLink_mission_item_int_message(
+                home.target_system, home.target_component, 0, home.frame, home.command,
+                home.current, home.autocontinue, home.param1, home.param2, home.param3,
+                home.param4, x, y, z)
+            self.items = items
+            self.version += 1
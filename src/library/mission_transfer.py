@@ -0,0 +1,341 @@
+import time
+from threading import Event, Lock
+
+from pymavlink import mavutil
+
+# seconds without progress before the last message is retransmitted
+TRANSFER_TIMEOUT = 1
+# retransmissions without progress before a transfer is abandoned
+TRANSFER_RETRIES = 5
+# item requests a download keeps outstanding at once
+DOWNLOAD_WINDOW = 8
+# seconds a whole download may take
+DOWNLOAD_DEADLINE = 30
+
+
+def to_mission_item(item):
+    """converts a MISSION_ITEM_INT into the equivalent float MISSION_ITEM"""
+    return mavutil.mavlink.MAVLink_mission_item_message(
+        item.target_system,
+        item.target_component,
+        item.seq,
+        item.frame,
+        item.command,
+        item.current,
+        item.autocontinue,
+        item.param1,
+        item.param2,
+        item.param3,
+        item.param4,
+        item.x * 1.0e-7,
+        item.y * 1.0e-7,
+        item.z,
+    )
+
+
+def to_mission_item_int(item):
+    """converts a float MISSION_ITEM into the equivalent MISSION_ITEM_INT"""
+    return mavutil.mavlink.MAVLink_mission_item_int_message(
+        item.target_system,
+        item.target_component,
+        item.seq,
+        item.frame,
+        item.command,
+        item.current,
+        item.autocontinue,
+        item.param1,
+        item.param2,
+        item.param3,
+        item.param4,
+        int(round(item.x * 1.0e7)),
+        int(round(item.y * 1.0e7)),
+        item.z,
+    )
+
+
+def is_from_vehicle(mavlink_connection, msg):
+    """whether msg is a mission message of the vehicle addressed to us (or broadcast)"""
+    # fence and rally point transfers of other groundstations share these messages
+    return (msg.get_srcSystem() == mavlink_connection.target_system
+            and msg.target_system in (0, mavlink_connection.source_system)
+            and getattr(msg, "mission_type", 0) == mavutil.mavlink.MAV_MISSION_TYPE_MISSION)
+
+
+class MissionUpload:
+    def __init__(self, telemetry, items, timeout=TRANSFER_TIMEOUT, retries=TRANSFER_RETRIES):
+        """
+        Uploads mission items to the autopilot. Item requests are answered straight
+        from the link's dispatch out of a prebuilt table (MISSION_ITEM_INT for
+        MISSION_REQUEST_INT, MISSION_ITEM for the legacy MISSION_REQUEST), so the upload
+        runs at the speed of the link instead of one blocking wait per item. If nothing
+        arrives for timeout seconds the last message is sent again, up to retries times
+        in a row. The upload ends with the autopilot's MISSION_ACK
+
+        Args:
+            telemetry (Telemetry): telemetry instance whose link carries the transfer
+            items (list): MISSION_ITEM_INT messages, numbered from 0
+            timeout (number, optional): seconds without progress before a retransmit
+            retries (number, optional): retransmits without progress before giving up
+        """
+        self.telemetry = telemetry
+        self.mavlink_connection = telemetry.mavlink_connection
+        self.items = {item.seq: item for item in items}
+        self.legacy_items = {}  # seq -> MISSION_ITEM, built on first legacy request
+        self.timeout = timeout
+        self.retries = retries
+
+        self.lock = Lock()
+        self.progress = Event()  # set on every request or ack from the autopilot
+        self.done = Event()
+        self.result = None  # MISSION_ACK type
+        self.last_sent = None  # retransmitted when the autopilot goes quiet
+        self.retransmits = 0
+
+    def start(self):
+        """sends the message that starts the transfer"""
+        self.mavlink_connection.waypoint_count_send(len(self.items))
+
+    def run(self):
+        """
+        uploads the items and blocks until the autopilot acknowledges them. raises an
+        Exception if the autopilot rejects the mission or stops responding
+        """
+        dispatcher = self.telemetry.dispatcher
+        dispatcher.on("MISSION_REQUEST_INT", self.on_request)
+        dispatcher.on("MISSION_REQUEST", self.on_request)
+        dispatcher.on("MISSION_ACK", self.on_ack)
+        try:
+            self.start()
+            failures = 0
+            while not self.done.is_set():
+                if self.progress.wait(self.timeout):
+                    self.progress.clear()
+                    failures = 0
+                    continue
+                if self.done.is_set():
+                    break
+
+                failures += 1
+                if failures > self.retries:
+                    raise Exception("Waypoints failed to upload: no response from autopilot")
+                self.retransmits += 1
+                with self.lock:
+                    last_sent = self.last_sent
+                if last_sent is None:
+                    self.start()
+                else:
+                    self.mavlink_connection.mav.send(last_sent)
+        finally:
+            dispatcher.off("MISSION_REQUEST_INT", self.on_request)
+            dispatcher.off("MISSION_REQUEST", self.on_request)
+            dispatcher.off("MISSION_ACK", self.on_ack)
+
+        if self.result != mavutil.mavlink.MAV_MISSION_ACCEPTED:
+            raise Exception("Waypoints failed to upload: MISSION_ACK type %s" % self.result)
+        return len(self.items)
+
+    def on_request(self, msg):
+        if not is_from_vehicle(self.mavlink_connection, msg) or msg.seq not in self.items:
+            return
+        if msg.get_type() == "MISSION_REQUEST_INT":
+            item = self.items[msg.seq]
+        else:
+            item = self.legacy_items.get(msg.seq)
+            if item is None:
+                item = self.legacy_items[msg.seq] = to_mission_item(self.items[msg.seq])
+        self.mavlink_connection.mav.send(item)
+        with self.lock:
+            self.last_sent = item
+        self.progress.set()
+
+    def on_ack(self, msg):
+        if not is_from_vehicle(self.mavlink_connection, msg):
+            return
+        self.result = msg.type
+        self.done.set()
+        self.progress.set()
+
+
+class MissionPartialUpload(MissionUpload):
+    def __init__(self, telemetry, items, **kwargs):
+        """
+        Replaces a contiguous range of the autopilot's mission with
+        MISSION_WRITE_PARTIAL_LIST. The rest of the mission stays untouched and in use
+        during the transfer
+
+        Args:
+            telemetry (Telemetry): telemetry instance whose link carries the transfer
+            items (list): MISSION_ITEM_INT messages with consecutive seqs
+        """
+        super().__init__(telemetry, items, **kwargs)
+        self.start_index = items[0].seq
+        self.end_index = items[-1].seq
+
+    def start(self):
+        self.mavlink_connection.mav.mission_write_partial_list_send(
+            self.mavlink_connection.target_system,
+            self.mavlink_connection.target_component,
+            self.start_index,
+            self.end_index,
+        )
+
+
+def same_item(a, b):
+    """whether two MISSION_ITEM_INTs describe the same mission item"""
+    # the autopilot stores altitudes in cm and some params in lower precision, and
+    # does not keep autocontinue
+    return (a.frame == b.frame
+            and a.command == b.command
+            and a.x == b.x
+            and a.y == b.y
+            and abs(a.z - b.z) < 0.01
+            and all(abs(p - q) < 0.01 for p, q in zip(
+                (a.param1, a.param2, a.param3, a.param4), (b.param1, b.param2, b.param3, b.param4))))
+
+
+def changed_ranges(current, wanted, first=1):
+    """
+    returns the (start, end) seq ranges, inclusive, where wanted differs from current.
+    both missions must have the same length. items before first are not compared, by
+    default the home item
+    """
+    ranges = []
+    start = None
+    for seq in range(first, len(wanted)):
+        if not same_item(current[seq], wanted[seq]):
+            if start is None:
+                start = seq
+        elif start is not None:
+            ranges.append((start, seq - 1))
+            start = None
+    if start is not None:
+        ranges.append((start, len(wanted) - 1))
+    return ranges
+
+
+class MissionDownload:
+    def __init__(self, telemetry, window=DOWNLOAD_WINDOW, timeout=TRANSFER_TIMEOUT,
+                 retries=TRANSFER_RETRIES, deadline=DOWNLOAD_DEADLINE):
+        """
+        Downloads the mission from the autopilot. Once MISSION_COUNT is known, up to
+        window MISSION_REQUEST_INTs are kept outstanding, so items stream back without
+        a round trip each. A request unanswered for timeout seconds is sent again, up to
+        retries times per item, and the whole download fails after deadline seconds
+
+        Args:
+            telemetry (Telemetry): telemetry instance whose link carries the transfer
+            window (number, optional): maximum outstanding item requests
+            timeout (number, optional): seconds before a request is sent again
+            retries (number, optional): resends per request before giving up
+            deadline (number, optional): seconds the whole download may take
+        """
+        self.telemetry = telemetry
+        self.mavlink_connection = telemetry.mavlink_connection
+        self.window = window
+        self.timeout = timeout
+        self.retries = retries
+        self.deadline = deadline
+
+        self.lock = Lock()
+        self.progress = Event()  # set on MISSION_COUNT and on every item
+        self.count = None
+        self.items = {}  # seq -> MISSION_ITEM_INT
+        self.requests = {}  # outstanding seq -> (sent at, attempts)
+        self.next_seq = 0  # lowest seq not requested yet
+        self.retransmits = 0
+
+    def run(self):
+        """
+        returns the mission as a list of MISSION_ITEM_INT messages. raises an Exception
+        if the autopilot stops responding or the deadline passes
+        """
+        dispatcher = self.telemetry.dispatcher
+        dispatcher.on("MISSION_COUNT", self.on_count)
+        dispatcher.on("MISSION_ITEM_INT", self.on_item)
+        dispatcher.on("MISSION_ITEM", self.on_item)
+        try:
+            self.transfer()
+        finally:
+            dispatcher.off("MISSION_COUNT", self.on_count)
+            dispatcher.off("MISSION_ITEM_INT", self.on_item)
+            dispatcher.off("MISSION_ITEM", self.on_item)
+
+        # ends the transaction on the autopilot
+        self.mavlink_connection.mav.mission_ack_send(
+            self.mavlink_connection.target_system,
+            self.mavlink_connection.target_component,
+            mavutil.mavlink.MAV_MISSION_ACCEPTED,
+        )
+        return [self.items[seq] for seq in range(self.count)]
+
+    def transfer(self):
+        start = time.monotonic()
+        list_attempts = 0
+        list_sent = None
+        while True:
+            now = time.monotonic()
+            if now - start > self.deadline:
+                raise Exception("Waypoints failed to download: deadline of %ss passed" % self.deadline)
+
+            with self.lock:
+                count = self.count
+                if count is not None and len(self.items) == count:
+                    return
+                if count is None:
+                    if list_sent is None or now - list_sent > self.timeout:
+                        if list_attempts > self.retries:
+                            raise Exception("Waypoints failed to download: no MISSION_COUNT from autopilot")
+                        list_attempts += 1
+                        list_sent = now
+                        self.mavlink_connection.waypoint_request_list_send()
+                else:
+                    self.request_items(now)
+
+            self.progress.wait(self.timeout / 4)
+            self.progress.clear()
+
+    def request_items(self, now):
+        """sends due retries and tops up the window. called with the lock held"""
+        for seq, (sent, attempts) in list(self.requests.items()):
+            if now - sent > self.timeout:
+                if attempts > self.retries:
+                    raise Exception("Waypoints failed to download: no response for item %d" % seq)
+                self.retransmits += 1
+                self.request(seq, attempts + 1, now)
+        self.fill_window(now)
+
+    def fill_window(self, now):
+        while len(self.requests) < self.window and self.next_seq < self.count:
+            if self.next_seq not in self.items:
+                self.request(self.next_seq, 1, now)
+            self.next_seq += 1
+
+    def request(self, seq, attempts, now):
+        self.requests[seq] = (now, attempts)
+        self.mavlink_connection.mav.mission_request_int_send(
+            self.mavlink_connection.target_system,
+            self.mavlink_connection.target_component,
+            seq,
+        )
+
+    def on_count(self, msg):
+        if not is_from_vehicle(self.mavlink_connection, msg):
+            return
+        with self.lock:
+            if self.count is None:
+                self.count = msg.count
+        self.progress.set()
+
+    def on_item(self, msg):
+        if not is_from_vehicle(self.mavlink_connection, msg):
+            return
+        if msg.get_type() == "MISSION_ITEM":
+            msg = to_mission_item_int(msg)
+        with self.lock:
+            if self.count is None or not 0 <= msg.seq < self.count:
+                return
+            self.items[msg.seq] = msg
+            self.requests.pop(msg.seq, None)
+            # refill the window right away instead of waiting for the transfer loop
+            self.fill_window(time.monotonic())
+        self.progress.set()
@@ -0,0 +1,570 @@
+import heapq
+import math
+
+import numpy as np
+
+# distances are compared with this much slack, in metres, so paths along the edge of
+# the clearance zone are not rejected by rounding
+TOLERANCE = 1e-6
+
+# blockers entries for node pairs, otherwise the key of an obstacle in the way
+UNKNOWN = -2
+VISIBLE = -1
+
+# goals whose visibility from the nodes is kept for replanning
+GOAL_CACHE = 16
+
+
+class CircleObstacle:
+    def __init__(self, east, north, radius):
+        """no-fly circle in local metres, see LocalProjection"""
+        self.center = np.array([east, north], dtype=float)
+        self.radius = float(radius)
+
+
+class PolygonObstacle:
+    def __init__(self, vertices):
+        """no-fly polygon in local metres, vertices as (east, north) pairs in either winding"""
+        vertices = np.asarray(vertices, dtype=float)
+        if len(vertices) < 3:
+            raise Exception("A polygon obstacle needs at least 3 vertices")
+        # counter clockwise, so the outward normal of edge a -> b is (dy, -dx)
+        x, y = vertices[:, 0], vertices[:, 1]
+        if np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y) < 0:
+            vertices = vertices[::-1]
+        self.vertices = vertices
+
+
+def point_segment_distance(p, a, b):
+    """distances from points p to segments a -> b, all (..., 2) arrays broadcast together"""
+    ab = b - a
+    length2 = np.sum(ab * ab, axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(length2 > 0, np.sum((p - a) * ab, axis=-1) / length2, 0.0)
+    t = np.clip(t, 0, 1)
+    closest = a + t[..., None] * ab
+    return np.linalg.norm(p - closest, axis=-1)
+
+
+def cross(u, v):
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+
+def segment_distance(p0, p1, q0, q1):
+    """distances between segments p0 -> p1 and q0 -> q1, all (..., 2) arrays broadcast together"""
+    distance = np.minimum(
+        np.minimum(point_segment_distance(p0, q0, q1), point_segment_distance(p1, q0, q1)),
+        np.minimum(point_segment_distance(q0, p0, p1), point_segment_distance(q1, p0, p1)))
+    d1 = cross(p1 - p0, q0 - p0)
+    d2 = cross(p1 - p0, q1 - p0)
+    d3 = cross(q1 - q0, p0 - q0)
+    d4 = cross(q1 - q0, p1 - q0)
+    crossing = (d1 * d2 < 0) & (d3 * d4 < 0)
+    return np.where(crossing, 0.0, distance)
+
+
+def inside_polygons(points, starts, ends, polygon_ids, count):
+    """(points, polygons) mask of which points are inside which polygon, by ray casting"""
+    p = points[:, None, :]
+    a, b = starts[None, :, :], ends[None, :, :]
+    straddles = (a[..., 1] > p[..., 1]) != (b[..., 1] > p[..., 1])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x = a[..., 0] + (p[..., 1] - a[..., 1]) * (b[..., 0] - a[..., 0]) / (b[..., 1] - a[..., 1])
+    crossings = straddles & (p[..., 0] < x)
+    inside = np.zeros((len(points), count), dtype=bool)
+    for polygon in range(count):
+        inside[:, polygon] = np.count_nonzero(crossings[:, polygon_ids == polygon], axis=1) % 2 == 1
+    return inside
+
+
+def inside_pairs(points, starts, ends, firsts):
+    """
+    whether each point is inside its polygon, by ray casting. points, starts and ends
+    hold one row per polygon edge, and firsts where each point's edges start
+    """
+    straddles = (starts[:, 1] > points[:, 1]) != (ends[:, 1] > points[:, 1])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x = starts[:, 0] + (points[:, 1] - starts[:, 1]) * (ends[:, 0] - starts[:, 0]) / (ends[:, 1] - starts[:, 1])
+    crossings = straddles & (points[:, 0] < x)
+    return np.add.reduceat(crossings.astype(int), firsts) % 2 == 1
+
+
+def remap(values, mapping, fill):
+    """
+    re-indexes per node values, or a matrix of them, for a new list of nodes. mapping has
+    each new node's old index, or -1 for a new node which gets fill
+    """
+    kept = np.flatnonzero(mapping >= 0)
+    fresh = mapping < 0
+    if len(mapping) == len(values) and np.array_equal(mapping[kept], kept):
+        # nodes kept their place, only the new ones change
+        values[fresh] = fill
+        if values.ndim == 2:
+            values[:, fresh] = fill
+        return values
+    result = np.full((len(mapping),) * values.ndim, fill, dtype=values.dtype)
+    result[np.ix_(*[kept] * values.ndim)] = values[np.ix_(*[mapping[kept]] * values.ndim)]
+    return result
+
+
+def first_key(blocked, keys):
+    """for each row of a (n, len(keys)) mask, the key of its first True column, or VISIBLE"""
+    if not len(keys):
+        return np.full(len(blocked), VISIBLE)
+    return np.where(blocked.any(axis=1), keys[blocked.argmax(axis=1)], VISIBLE)
+
+
+def signature(obstacle):
+    """identifies an obstacle by its geometry, so an update can tell which ones moved"""
+    if isinstance(obstacle, CircleObstacle):
+        return ("circle", obstacle.center.tobytes(), obstacle.radius)
+    return ("polygon", obstacle.vertices.tobytes())
+
+
+class VisibilityPlanner:
+    def __init__(self, obstacles, margin, circle_sides=12):
+        """
+        Shortest paths around no-fly obstacles in local metres, with A* over a visibility
+        graph. Paths keep margin metres from every obstacle: circles are replaced by
+        circumscribed polygons and polygons are offset by the margin, and the corners of
+        those are the graph's nodes. Which nodes see each other is worked out lazily, as
+        A* expands them, and kept for later plans around the same obstacles. update
+        repairs that graph when obstacles move instead of starting over
+
+        Args:
+            obstacles (list): CircleObstacle and PolygonObstacle instances
+            margin (number): clearance in metres kept from the obstacles
+            circle_sides (number, optional): sides of the polygons replacing circles
+        """
+        self.margin = float(margin)
+        self.circle_sides = circle_sides
+        self.next_key = 0
+        self.rings = {}  # obstacle key -> (nodes, previous corners, following corners)
+        self.obstacle_keys = {}  # signature -> keys of the obstacles with that geometry
+        self.keys = np.zeros(0, dtype=int)
+        self.node_keys = np.zeros(0, dtype=int)
+        self.nodes = self.previous = self.following = np.zeros((0, 2))
+        self.tangents = np.zeros((0, 0), dtype=bool)
+        self.tangents_known = np.zeros(0, dtype=bool)
+        self.blockers = np.zeros((0, 0), dtype=int)
+        self.node_blockers = np.zeros(0, dtype=int)
+        self.goal_blockers = {}  # goal -> per node blockers of the segments to it
+        self.usable = None
+        self.update(obstacles)
+
+    def update(self, obstacles):
+        """
+        replaces the obstacles, keeping what is known about the graph. an obstacle whose
+        geometry changed counts as removed and a new one added: edges it blocked are
+        tested again when A* next needs them, and edges found clear before are tested
+        against the added obstacles only
+
+        Args:
+            obstacles (list): CircleObstacle and PolygonObstacle instances
+        """
+        circles = [o for o in obstacles if isinstance(o, CircleObstacle)]
+        polygons = [o for o in obstacles if isinstance(o, PolygonObstacle)]
+        ordered = circles + polygons
+
+        unused = {s: list(keys) for s, keys in self.obstacle_keys.items()}
+        obstacle_keys, keys, added = {}, [], []
+        for obstacle in ordered:
+            s = signature(obstacle)
+            if unused.get(s):
+                key = unused[s].pop()
+            else:
+                key = self.next_key
+                self.next_key += 1
+                self.rings[key] = self.ring(obstacle)
+                added.append(key)
+            obstacle_keys.setdefault(s, []).append(key)
+            keys.append(key)
+        removed = [key for s in unused for key in unused[s]]
+        if not added and not removed and keys == self.keys.tolist() and self.usable is not None:
+            return
+        for key in removed:
+            del self.rings[key]
+        self.obstacle_keys = obstacle_keys
+        self.keys = np.array(keys, dtype=int)
+
+        self.centers = np.array([c.center for c in circles]).reshape(-1, 2)
+        self.radii = np.array([c.radius for c in circles])
+        self.polygon_count = len(polygons)
+        self.starts = np.concatenate([p.vertices for p in polygons]).reshape(-1, 2) if polygons else np.zeros((0, 2))
+        self.ends = np.concatenate([np.roll(p.vertices, -1, axis=0) for p in polygons]).reshape(-1, 2) \
+            if polygons else np.zeros((0, 2))
+        self.polygon_ids = np.concatenate([np.full(len(p.vertices), i) for i, p in enumerate(polygons)]) \
+            if polygons else np.zeros(0, dtype=int)
+        # first edge of each polygon, to reduce edge distances to polygon distances
+        self.polygon_starts = np.flatnonzero(np.diff(self.polygon_ids, prepend=-1))
+        self.edge_counts = np.diff(np.append(self.polygon_starts, len(self.starts)))
+        # boxes around the clearance zones, only obstacles whose box a segment or point
+        # overlaps get the exact test
+        lows = [self.centers - self.radii[:, None]] + [p.vertices.min(axis=0)[None, :] for p in polygons]
+        highs = [self.centers + self.radii[:, None]] + [p.vertices.max(axis=0)[None, :] for p in polygons]
+        self.lows = np.concatenate(lows) - self.margin
+        self.highs = np.concatenate(highs) + self.margin
+
+        # nodes of obstacles that did not change keep what is known about them
+        old_index = {key: np.flatnonzero(self.node_keys == key) for key in keys if key not in added}
+        nodes = [self.rings[key][0] for key in keys]
+        self.node_keys = np.concatenate([np.full(len(n), key) for n, key in zip(nodes, keys)]).astype(int) \
+            if keys else np.zeros(0, dtype=int)
+        mapping = np.concatenate([old_index.get(key, np.full(len(n), -1)) for n, key in zip(nodes, keys)]).astype(int) \
+            if keys else np.zeros(0, dtype=int)
+        self.nodes = np.concatenate(nodes) if keys else np.zeros((0, 2))
+        self.previous = np.concatenate([self.rings[key][1] for key in keys]) if keys else np.zeros((0, 2))
+        self.following = np.concatenate([self.rings[key][2] for key in keys]) if keys else np.zeros((0, 2))
+
+        self.blockers = remap(self.blockers, mapping, UNKNOWN)
+        self.node_blockers = remap(self.node_blockers, mapping, UNKNOWN)
+        self.goal_blockers = {goal: remap(row, mapping, UNKNOWN) for goal, row in self.goal_blockers.items()}
+        # rows of the tangent mask are filled in as A* expands nodes
+        self.tangents = remap(self.tangents, mapping, False)
+        self.tangents_known = remap(self.tangents_known, mapping, False)
+        known, fresh = np.flatnonzero(self.tangents_known), np.flatnonzero(mapping < 0)
+        self.tangents[np.ix_(known, fresh)] = self.tangent_block(known, fresh)
+
+        # what the removed obstacles blocked is worked out again when needed, and what was
+        # clear before is only tested against the added ones
+        for key in removed:
+            self.blockers[self.blockers == key] = UNKNOWN
+            self.node_blockers[self.node_blockers == key] = UNKNOWN
+            for row in self.goal_blockers.values():
+                row[row == key] = UNKNOWN
+        columns = np.zeros(0, dtype=int)
+        if added:
+            rows, others = np.nonzero(np.triu(self.blockers == VISIBLE))
+            seen = {goal: np.flatnonzero(row == VISIBLE) for goal, row in self.goal_blockers.items()}
+            free = np.flatnonzero(self.node_blockers == VISIBLE)
+            # nothing is known clear on the first update, so there is nothing to retest
+            if len(rows) or len(free) or any(len(nodes) for nodes in seen.values()):
+                columns = np.flatnonzero(np.isin(self.keys, added))
+        for column in columns:
+            low, high = self.bounds(column)
+            near = self.overlapping(self.nodes[rows], self.nodes[others], low, high)
+            self.block(self.blockers, rows[near], self.first_blockers(
+                self.nodes[rows[near]], self.nodes[others[near]], np.array([column])), others[near])
+            for goal, row in self.goal_blockers.items():
+                near = seen[goal][self.overlapping(np.array(goal), self.nodes[seen[goal]], low, high)]
+                self.block(row, near, self.first_blockers(np.array(goal), self.nodes[near], np.array([column])))
+            near = free[np.all((self.nodes[free] >= low) & (self.nodes[free] <= high), axis=1)]
+            self.block(self.node_blockers, near, self.point_blockers(self.nodes[near], np.array([column])))
+
+        # corners inside the clearance zone of another obstacle are unreachable
+        unknown = np.flatnonzero(self.node_blockers == UNKNOWN)
+        self.node_blockers[unknown] = self.point_blockers(self.nodes[unknown], np.arange(len(self.keys)))
+        self.usable = self.node_blockers == VISIBLE
+
+    @staticmethod
+    def block(blockers, indices, found, others=None):
+        """records the obstacles found in the way, leaving entries found clear as they were"""
+        blocked = found != VISIBLE
+        if others is None:
+            blockers[indices[blocked]] = found[blocked]
+        else:
+            blockers[indices[blocked], others[blocked]] = found[blocked]
+            blockers[others[blocked], indices[blocked]] = found[blocked]
+
+    def bounds(self, column):
+        """corners of the box around an obstacle's clearance zone"""
+        return self.lows[column], self.highs[column]
+
+    @staticmethod
+    def overlapping(origins, targets, low, high):
+        """mask of which segments origins -> targets have a bounding box overlapping low, high"""
+        return np.all((np.maximum(origins, targets) >= low) & (np.minimum(origins, targets) <= high), axis=-1)
+
+    def ring(self, obstacle):
+        """the obstacle's usable corners, each with its neighbouring corners on the ring"""
+        # nodes sit a little outside the clearance zone so edges along it stay valid
+        offset = self.margin * 1.01 + 0.01
+        if isinstance(obstacle, CircleObstacle):
+            ring, corner = self.circle_ring(obstacle, offset, self.circle_sides)
+        else:
+            ring, corner = self.polygon_ring(obstacle, offset)
+        return ring[corner], np.roll(ring, 1, axis=0)[corner], np.roll(ring, -1, axis=0)[corner]
+
+    @staticmethod
+    def circle_ring(circle, offset, sides):
+        """corners of the polygon circumscribing the circle's clearance zone, all usable as nodes"""
+        angles = np.arange(sides) * 2 * math.pi / sides
+        radius = (circle.radius + offset) / math.cos(math.pi / sides)
+        ring = circle.center + radius * np.column_stack([np.cos(angles), np.sin(angles)])
+        return ring, np.ones(sides, dtype=bool)
+
+    @staticmethod
+    def polygon_ring(polygon, offset):
+        """the polygon offset by the clearance, and which of its corners are usable as nodes"""
+        vertices = polygon.vertices
+        previous = vertices - np.roll(vertices, 1, axis=0)  # edge into each vertex
+        following = np.roll(vertices, -1, axis=0) - vertices  # edge out of each vertex
+        n1 = np.column_stack([previous[:, 1], -previous[:, 0]]) / np.linalg.norm(previous, axis=1)[:, None]
+        n2 = np.column_stack([following[:, 1], -following[:, 0]]) / np.linalg.norm(following, axis=1)[:, None]
+        # the path never turns around a reflex corner, so only convex corners are nodes
+        convex = cross(previous, following) > 0
+        miter = (n1 + n2) * (offset / (1 + np.sum(n1 * n2, axis=1)))[:, None]
+        return vertices + miter, convex
+
+    def tangent(self, indices, directions):
+        """
+        mask of which lines leaving nodes in directions touch the node's obstacle without
+        entering it. a shortest path only follows such lines, so the others are skipped
+        before the more expensive collision test
+        """
+        side_previous = cross(directions, self.previous[indices] - self.nodes[indices])
+        side_following = cross(directions, self.following[indices] - self.nodes[indices])
+        return side_previous * side_following >= -TOLERANCE
+
+    def tangent_block(self, rows, columns):
+        """(rows, columns) mask of which pairs of nodes are joined by a line tangent at both ends"""
+        directions = self.nodes[columns][None, :, :] - self.nodes[rows][:, None, :]
+        return self.tangent(rows[:, None], directions) & self.tangent(columns[None, :], directions) \
+            & (rows[:, None] != columns[None, :])
+
+    def pair_edges(self, rows, polygons):
+        """
+        expands (row, polygon) pairs into one entry per edge of the polygon. returns the
+        row and edge of each entry, and where each pair's entries start
+        """
+        counts = self.edge_counts[polygons]
+        firsts = np.cumsum(counts) - counts
+        edges = np.repeat(self.polygon_starts[polygons] - firsts, counts) + np.arange(firsts[-1] + counts[-1])
+        return np.repeat(rows, counts), edges, firsts
+
+    def polygon_edges(self, polygons):
+        """edges of the polygons, which polygon of those each is, and where each polygon starts"""
+        if len(polygons) == self.polygon_count:
+            return self.starts, self.ends, self.polygon_ids, self.polygon_starts
+        edges = np.isin(self.polygon_ids, polygons)
+        first_edges = np.flatnonzero(np.diff(self.polygon_ids[edges], prepend=-1))
+        ids = np.cumsum(np.diff(self.polygon_ids[edges], prepend=-1) != 0) - 1
+        return self.starts[edges], self.ends[edges], ids, first_edges
+
+    def clearances(self, points, columns=None):
+        """
+        (points, obstacles) distances from points to each obstacle, negative inside
+
+        Args:
+            points (array): (n, 2) points
+            columns (array, optional): ascending obstacle columns, circles before polygons, defaults to all
+        """
+        if columns is None:
+            columns = np.arange(len(self.keys))
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        circles = columns[columns < len(self.radii)]
+        polygons = columns[columns >= len(self.radii)] - len(self.radii)
+
+        circle = np.linalg.norm(points[:, None, :] - self.centers[circles][None, :, :], axis=-1) - self.radii[circles]
+        polygon = np.full((len(points), len(polygons)), np.inf)
+        if len(polygons) and len(points):
+            starts, ends, ids, first_edges = self.polygon_edges(polygons)
+            edges = point_segment_distance(points[:, None, :], starts[None, :, :], ends[None, :, :])
+            polygon = np.minimum.reduceat(edges, first_edges, axis=1)
+            inside = inside_polygons(points, starts, ends, ids, len(polygons))
+            polygon[inside] = -polygon[inside]
+        return np.concatenate([circle, polygon], axis=1)
+
+    def point_blockers(self, points, columns):
+        """key of the first of the obstacles in columns each point is closer to than the margin, or VISIBLE"""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        circles = columns[columns < len(self.radii)]
+        polygons = columns[columns >= len(self.radii)] - len(self.radii)
+        near = np.all((points[:, None, :] >= self.lows[columns][None, :, :])
+                      & (points[:, None, :] <= self.highs[columns][None, :, :]), axis=-1)
+
+        distance = np.full((len(points), len(columns)), np.inf)
+        rows, pairs = np.nonzero(near[:, :len(circles)])
+        distance[rows, pairs] = np.linalg.norm(points[rows] - self.centers[circles[pairs]], axis=1) \
+            - self.radii[circles[pairs]]
+        rows, pairs = np.nonzero(near[:, len(circles):])
+        if len(rows):
+            entries, edges, firsts = self.pair_edges(rows, polygons[pairs])
+            edge_distance = point_segment_distance(points[entries], self.starts[edges], self.ends[edges])
+            polygon = np.minimum.reduceat(edge_distance, firsts)
+            inside = inside_pairs(points[entries], self.starts[edges], self.ends[edges], firsts)
+            distance[rows, len(circles) + pairs] = np.where(inside, -polygon, polygon)
+
+        return first_key(distance < self.margin, self.keys[columns])
+
+    def first_blockers(self, origins, targets, columns, clearance=None):
+        """
+        key of the first of the obstacles in columns that each segment origins -> targets
+        comes closer to than the clearance, or VISIBLE
+
+        Args:
+            origins (array): (2,) or (n, 2) segment starts
+            targets (array): (n, 2) segment ends
+            columns (array): ascending obstacle columns to test, circles before polygons
+            clearance (array, optional): per obstacle clearance, defaults to the margin
+        """
+        if clearance is None:
+            clearance = np.full(len(self.keys), self.margin)
+        targets = np.asarray(targets, dtype=float).reshape(-1, 2)
+        origins = np.broadcast_to(np.asarray(origins, dtype=float).reshape(-1, 2), targets.shape)
+        circles = columns[columns < len(self.radii)]
+        polygons = columns[columns >= len(self.radii)] - len(self.radii)
+        # the clearance is never above the margin, so obstacles whose box the segment's
+        # box misses are clear of it
+        near = self.overlapping(origins[:, None, :], targets[:, None, :],
+                                self.lows[columns][None, :, :], self.highs[columns][None, :, :])
+
+        distance = np.full((len(targets), len(columns)), np.inf)
+        rows, pairs = np.nonzero(near[:, :len(circles)])
+        distance[rows, pairs] = point_segment_distance(
+            self.centers[circles[pairs]], origins[rows], targets[rows]) - self.radii[circles[pairs]]
+        rows, pairs = np.nonzero(near[:, len(circles):])
+        if len(rows):
+            entries, edges, firsts = self.pair_edges(rows, polygons[pairs])
+            starts, ends = self.starts[edges], self.ends[edges]
+            # and of those, only edges whose own box is near the segment
+            close = self.overlapping(origins[entries], targets[entries],
+                                     np.minimum(starts, ends) - self.margin, np.maximum(starts, ends) + self.margin)
+            edge_distance = np.full(len(entries), np.inf)
+            entries = entries[close]
+            edge_distance[close] = segment_distance(origins[entries], targets[entries], starts[close], ends[close])
+            distance[rows, len(circles) + pairs] = np.minimum.reduceat(edge_distance, firsts)
+
+        blocked = distance < clearance[columns] - TOLERANCE
+        return first_key(blocked, self.keys[columns])
+
+    def visible(self, origin, targets, clearance=None):
+        """
+        mask of which segments origin -> targets keep the clearance from every obstacle
+
+        Args:
+            origin (array): (2,) segment start
+            targets (array): (n, 2) segment ends
+            clearance (array, optional): per obstacle clearance, defaults to the margin
+        """
+        return self.first_blockers(origin, targets, np.arange(len(self.keys)), clearance) == VISIBLE
+
+    def endpoint_clearance(self, point, name):
+        """
+        clearance for segments from a start or goal. a point closer than the margin to an
+        obstacle may leave it, but segments from it may not get any closer
+        """
+        distance = self.clearances(point)[0]
+        if np.any(distance < 0):
+            raise Exception("The %s is inside an obstacle" % name)
+        return np.minimum(distance, self.margin)
+
+    def node_visibility(self, index):
+        """mask of the usable nodes node index sees, testing only edges not known yet"""
+        if not self.tangents_known[index]:
+            self.tangents[index] = self.tangent_block(np.array([index]), np.arange(len(self.nodes)))[0]
+            self.tangents_known[index] = True
+        candidates = self.tangents[index] & self.usable
+        unknown = np.flatnonzero(candidates & (self.blockers[index] == UNKNOWN))
+        if len(unknown):
+            found = self.first_blockers(self.nodes[index], self.nodes[unknown], np.arange(len(self.keys)))
+            self.blockers[index, unknown] = found
+            self.blockers[unknown, index] = found
+        return candidates & (self.blockers[index] == VISIBLE)
+
+    def goal_row(self, goal):
+        """blockers of the segments from each node to goal, kept for later plans to the same goal"""
+        key = tuple(goal.tolist())
+        row = self.goal_blockers.pop(key, None)
+        if row is None:
+            row = np.full(len(self.nodes), UNKNOWN, dtype=int)
+        # most recently used last, so the oldest goals are dropped first
+        self.goal_blockers[key] = row
+        while len(self.goal_blockers) > GOAL_CACHE:
+            del self.goal_blockers[next(iter(self.goal_blockers))]
+        return row
+
+    def plan(self, start, goal):
+        """
+        returns the shortest path from start to goal as a list of (east, north) points,
+        start and goal included. raises an Exception if there is none
+        """
+        start = np.asarray(start, dtype=float)
+        goal = np.asarray(goal, dtype=float)
+        start_clearance = self.endpoint_clearance(start, "start")
+        goal_clearance = self.endpoint_clearance(goal, "goal")
+        clearance = np.minimum(start_clearance, goal_clearance)
+        if self.visible(start, goal[None, :], clearance)[0]:
+            return [tuple(start), tuple(goal)]
+        # which nodes see the goal is kept for replanning, unless the goal is close to an obstacle
+        goal_blockers = self.goal_row(goal) if np.all(goal_clearance == self.margin) else None
+
+        count = len(self.nodes)
+        # nodes 0..count-1 are obstacle corners, count is the start and count + 1 the goal
+        points = np.vstack([self.nodes, start, goal])
+        start_index, goal_index = count, count + 1
+        heuristic = np.linalg.norm(points - goal, axis=1)
+        cost = {start_index: 0.0}
+        parent = {start_index: None}
+        closed = set()
+        heap = [(heuristic[start_index], start_index)]
+
+        while heap:
+            _, current = heapq.heappop(heap)
+            if current in closed:
+                continue
+            if current == goal_index:
+                path = []
+                while current is not None:
+                    path.append(tuple(points[current]))
+                    current = parent[current]
+                return path[::-1]
+            closed.add(current)
+
+            if current == start_index:
+                directions = self.nodes - start
+                candidates = np.flatnonzero(self.tangent(np.arange(count), directions) & self.usable)
+                neighbours = candidates[self.visible(start, self.nodes[candidates], start_clearance)]
+            else:
+                neighbours = np.flatnonzero(self.node_visibility(current))
+                if goal_blockers is None:
+                    sees_goal = self.visible(points[current], goal[None, :], goal_clearance)[0]
+                else:
+                    if goal_blockers[current] == UNKNOWN:
+                        goal_blockers[current] = self.first_blockers(goal, points[current], np.arange(len(self.keys)))[0]
+                    sees_goal = goal_blockers[current] == VISIBLE
+                if sees_goal:
+                    neighbours = np.append(neighbours, goal_index)
+
+            distances = np.linalg.norm(points[neighbours] - points[current], axis=1)
+            for neighbour, distance in zip(neighbours.tolist(), distances.tolist()):
+                if neighbour in closed:
+                    continue
+                new_cost = cost[current] + distance
+                if new_cost < cost.get(neighbour, math.inf):
+                    cost[neighbour] = new_cost
+                    parent[neighbour] = current
+                    heapq.heappush(heap, (new_cost + heuristic[neighbour], neighbour))
+
+        raise Exception("No path around the obstacles")
+
+    def plan_route(self, start, goals):
+        """
+        plans through each of goals in turn. returns one path per goal, each without the
+        point it starts from
+        """
+        legs = []
+        for goal in goals:
+            legs.append(self.plan(start, goal)[1:])
+            start = goal
+        return legs
+
+
+def obstacles_from_json(projection, obstacles):
+    """
+    converts obstacles of the api into planner obstacles in the projection's metres, e.g.
+    {"type": "circle", "lat": 49.2578, "lng": -123.2470, "radius": 30} or
+    {"type": "polygon", "points": [{"lat": 49.2578, "lng": -123.2470}, ...]}
+    """
+    result = []
+    for obstacle in obstacles:
+        obstacle_type = obstacle.get("type", "circle")
+        if obstacle_type == "circle":
+            center = projection.point(obstacle["lat"], obstacle["lng"])
+            result.append(CircleObstacle(center.east, center.north, obstacle["radius"]))
+        elif obstacle_type == "polygon":
+            points = [projection.point(p["lat"], p["lng"]) for p in obstacle["points"]]
+            result.append(PolygonObstacle([(p.east, p.north) for p in points]))
+        else:
+            raise Exception("Invalid obstacle type: " + str(obstacle_type))
+    return result
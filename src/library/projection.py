@@ -0,0 +1,97 @@
+import math
+from collections import namedtuple
+
+from geographiclib.geodesic import Geodesic
+
+from src.library.geodesy import A, B, E2, EP2, MEAN_RADIUS
+from src.library.location import Location
+
+# a point in the projection: its geodetic position and its east, north and up metres from the origin
+LocalPoint = namedtuple("LocalPoint", ["lat", "lng", "alt", "east", "north", "up", "local"])
+
+
+class LocalProjection:
+    def __init__(self, lat, lng, alt=0, max_error=0.1):
+        """
+        East-north-up tangent plane anchored at lat, lng, alt. Points are projected once,
+        after which distances and bearings between them are planar maths. Only points
+        within radius of the origin are treated as local; the horizontal distance
+        between two of them is then within max_error metres of the geodesic distance.
+        Any pair involving a point outside falls back to the WGS84 geodesic
+
+        Args:
+            lat, lng (number): origin, degrees
+            alt (number, optional): origin altitude, metres
+            max_error (number, optional): metres of distance error allowed between local points
+        """
+        self.lat = lat
+        self.lng = lng
+        self.alt = alt
+        self.max_error = max_error
+        # the plane drops below the ellipsoid by about d^2 / 2R, which shortens distances
+        # between points r from the origin by up to about r^3 / R^2
+        self.radius = (max_error * MEAN_RADIUS ** 2) ** (1 / 3)
+
+        phi = math.radians(lat)
+        lam = math.radians(lng)
+        self.sin_phi, self.cos_phi = math.sin(phi), math.cos(phi)
+        self.sin_lam, self.cos_lam = math.sin(lam), math.cos(lam)
+        self.x0, self.y0, self.z0 = self.to_ecef(lat, lng, alt)
+
+    def to_ecef(self, lat, lng, alt):
+        phi = math.radians(lat)
+        lam = math.radians(lng)
+        sin_phi, cos_phi = math.sin(phi), math.cos(phi)
+        n = A / math.sqrt(1 - E2 * sin_phi ** 2)
+        return ((n + alt) * cos_phi * math.cos(lam),
+                (n + alt) * cos_phi * math.sin(lam),
+                (n * (1 - E2) + alt) * sin_phi)
+
+    def point(self, lat, lng, alt=0):
+        """projects a position, returns a LocalPoint"""
+        x, y, z = self.to_ecef(lat, lng, alt)
+        dx, dy, dz = x - self.x0, y - self.y0, z - self.z0
+        east = -self.sin_lam * dx + self.cos_lam * dy
+        north = -self.sin_phi * self.cos_lam * dx - self.sin_phi * self.sin_lam * dy + self.cos_phi * dz
+        up = self.cos_phi * self.cos_lam * dx + self.cos_phi * self.sin_lam * dy + self.sin_phi * dz
+        local = east * east + north * north <= self.radius * self.radius
+        return LocalPoint(lat, lng, alt, east, north, up, local)
+
+    def location(self, location):
+        """projects a Location"""
+        return self.point(location.lat, location.lng, location.alt)
+
+    def from_enu(self, east, north, up=0):
+        """returns the Location of a point given in metres from the origin"""
+        dx = -self.sin_lam * east - self.sin_phi * self.cos_lam * north + self.cos_phi * self.cos_lam * up
+        dy = self.cos_lam * east - self.sin_phi * self.sin_lam * north + self.cos_phi * self.sin_lam * up
+        dz = self.cos_phi * north + self.sin_phi * up
+        x, y, z = self.x0 + dx, self.y0 + dy, self.z0 + dz
+
+        # Bowring's method, sub-millimetre near the surface
+        p = math.hypot(x, y)
+        theta = math.atan2(z * A, p * B)
+        phi = math.atan2(z + EP2 * B * math.sin(theta) ** 3, p - E2 * A * math.cos(theta) ** 3)
+        lam = math.atan2(y, x)
+        n = A / math.sqrt(1 - E2 * math.sin(phi) ** 2)
+        alt = p / math.cos(phi) - n
+        return Location(math.degrees(phi), math.degrees(lam), alt)
+
+    def contains(self, lat, lng):
+        """whether a position is within the radius where the projection is accurate"""
+        return self.point(lat, lng).local
+
+    def distance(self, a, b):
+        """horizontal distance in metres between two LocalPoints"""
+        if a.local and b.local:
+            return math.hypot(b.east - a.east, b.north - a.north)
+        return Geodesic.WGS84.Inverse(a.lat, a.lng, b.lat, b.lng, Geodesic.DISTANCE)["s12"]
+
+    def bearing(self, a, b):
+        """bearing in degrees from LocalPoint a to b, clockwise from north, in [0, 360)"""
+        if a.local and b.local:
+            grid = math.degrees(math.atan2(b.east - a.east, b.north - a.north))
+            # grid north only matches true north along the origin's meridian
+            convergence = (a.lng - self.lng) * self.sin_phi
+            return (grid + convergence) % 360
+        return Geodesic.WGS84.Inverse(a.lat, a.lng, b.lat, b.lng, Geodesic.AZIMUTH)["azi1"] % 360
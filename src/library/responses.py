@@ -0,0 +1,52 @@
+import json
+import time
+import zlib
+
+
+class CachedResponse:
+    def __init__(self, body, etag, timestamp, received):
+        """
+        A telemetry route's response body, serialised when its message arrived
+
+        Args:
+            body (bytes): JSON body
+            etag (string): unquoted entity tag, the same for the same body
+            timestamp (number): unix time at which the message arrived
+            received (number): time.monotonic() at which the message arrived
+        """
+        self.body = body
+        self.etag = etag
+        self.timestamp = timestamp
+        self.received = received
+
+    def age(self):
+        return time.monotonic() - self.received
+
+
+class ResponseCache:
+    def __init__(self):
+        """
+        Telemetry responses serialised to JSON once per message, so the telemetry routes
+        return bytes instead of building and encoding a dict on every request, and never
+        wait on the link
+        """
+        self.responses = {}
+
+    def update(self, name, value, timestamp=None):
+        """
+        serialises value as the response of name
+
+        Args:
+            name (string): response name, e.g. "gps"
+            value (dict): JSON serializable response
+            timestamp (number, optional): unix time at which its message arrived, defaults to now
+        """
+        body = json.dumps(value, separators=(",", ":")).encode()
+        etag = "%08x" % zlib.crc32(body)
+        # a single dict assignment, so readers never see a half written response
+        self.responses[name] = CachedResponse(body, etag, time.time() if timestamp is None else timestamp,
+                                              time.monotonic())
+
+    def get(self, name):
+        """returns the latest CachedResponse of name, or None before its first message"""
+        return self.responses.get(name)
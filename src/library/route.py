@@ -0,0 +1,92 @@
+import numbers
+import threading
+
+
+def check_points(points):
+    """
+    raises an Exception unless points is a non-empty list of {"lat", "lng", "alt"} with
+    numeric values, lat and lng in range
+
+    Args:
+        points (list): reroute points
+    """
+    if not isinstance(points, list) or not points:
+        raise Exception("Reroute points must be a non-empty list")
+    for i, point in enumerate(points):
+        if not isinstance(point, dict):
+            raise Exception("Reroute point %d is not an object" % i)
+        for key in ("lat", "lng", "alt"):
+            value = point.get(key)
+            if isinstance(value, bool) or not isinstance(value, numbers.Real) or value != value:
+                raise Exception("Reroute point %d needs a numeric %s" % (i, key))
+        if not -90 <= point["lat"] <= 90 or not -180 <= point["lng"] <= 180:
+            raise Exception("Reroute point %d is out of range" % i)
+
+
+class Route:
+    def __init__(self, goals, legs):
+        """
+        Remaining points of an active reroute. The reroute thread flies to target() and
+        calls reached() on arrival, while replanning swaps in new detours with replace(),
+        so the thread follows the new path without being restarted
+
+        Args:
+            goals (list): reroute points, {"lat", "lng", "alt"}
+            legs (list): one list of points per goal, its detour points then the goal
+        """
+        self.lock = threading.Lock()
+        self.goals = list(goals)
+        self.legs = [list(leg) for leg in legs]
+        self.count = len(self.goals)
+        self.version = 0
+        # bumped on every change, so followers know when to re-read the remaining points
+        self.revision = 0
+
+    def target(self):
+        """returns the point to fly to next, or None when the route is finished"""
+        with self.lock:
+            return self.legs[0][0] if self.legs else None
+
+    def points(self):
+        """returns the points still to fly to in order, detours included, and the revision they were read at"""
+        with self.lock:
+            return [point for leg in self.legs for point in leg], self.revision
+
+    def leg(self):
+        """returns the index of the goal being flown to, counting the goals already reached"""
+        with self.lock:
+            return self.count - len(self.goals)
+
+    def remaining_goals(self):
+        """returns the goals not reached yet and the route version they were read at"""
+        with self.lock:
+            return list(self.goals), self.version
+
+    def reached(self, point):
+        """marks point as reached, unless the route was replaced and it is no longer next"""
+        with self.lock:
+            if not self.legs or self.legs[0][0] is not point:
+                return
+            self.legs[0].pop(0)
+            self.revision += 1
+            if not self.legs[0]:
+                self.legs.pop(0)
+                self.goals.pop(0)
+                self.version += 1
+
+    def replace(self, legs, version):
+        """
+        replaces the detours to the remaining goals
+
+        Args:
+            legs (list): one list of points per goal returned by remaining_goals
+            version (number): route version remaining_goals returned
+        """
+        with self.lock:
+            # goals reached while the new legs were planned are dropped from the front
+            self.legs = [list(leg) for leg in legs[self.version - version:]]
+            self.revision += 1
+
+    def finished(self):
+        with self.lock:
+            return not self.legs
@@ -0,0 +1,139 @@
+import threading
+import time
+
+import numpy as np
+from pymavlink import mavutil
+
+# SET_POSITION_TARGET_GLOBAL_INT fields to ignore: everything but the position
+POSITION_ONLY = (
+    mavutil.mavlink.POSITION_TARGET_TYPEMASK_VX_IGNORE
+    | mavutil.mavlink.POSITION_TARGET_TYPEMASK_VY_IGNORE
+    | mavutil.mavlink.POSITION_TARGET_TYPEMASK_VZ_IGNORE
+    | mavutil.mavlink.POSITION_TARGET_TYPEMASK_AX_IGNORE
+    | mavutil.mavlink.POSITION_TARGET_TYPEMASK_AY_IGNORE
+    | mavutil.mavlink.POSITION_TARGET_TYPEMASK_AZ_IGNORE
+    | mavutil.mavlink.POSITION_TARGET_TYPEMASK_YAW_IGNORE
+    | mavutil.mavlink.POSITION_TARGET_TYPEMASK_YAW_RATE_IGNORE
+)
+
+
+def lookahead_point(path, position, lookahead):
+    """
+    returns the (east, north, alt) point lookahead metres along path ahead of position,
+    or the path's end. position is placed on the nearest of the path's first two
+    segments, the leg being flown and the one after it, so the setpoint pulls back onto
+    the path and cuts the corner between them
+
+    Args:
+        path (array): (k, 3) east, north metres and altitude of the path's vertices, from
+            the start of the current leg through its target and the points after it
+        position (tuple): east, north metres of the aircraft
+        lookahead (number): metres
+    """
+    path = np.asarray(path, dtype=float)
+    lengths = np.hypot(*np.diff(path[:, :2], axis=0).T)
+    if not len(lengths):
+        return path[-1]
+    cumulative = np.concatenate([[0], np.cumsum(lengths)])
+
+    starts, segments = path[:2, :2][:len(lengths)], np.diff(path[:3, :2], axis=0)
+    offsets = np.asarray(position, dtype=float) - starts
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.clip(np.einsum("ij,ij->i", offsets, segments) / lengths[:2] ** 2, 0, 1)
+    t = np.where(lengths[:2] > 0, t, 1)
+    gaps = np.hypot(*(offsets - segments * t[:, None]).T)
+    nearest = int(np.argmin(gaps))
+    distance = cumulative[nearest] + t[nearest] * lengths[nearest] + lookahead
+
+    if distance >= cumulative[-1]:
+        return path[-1]
+    i = np.searchsorted(cumulative, distance, side="right") - 1
+    fraction = (distance - cumulative[i]) / lengths[i]
+    return path[i] + fraction * (path[i + 1] - path[i])
+
+
+class SetpointStreamer:
+    def __init__(self, vehicle, rate=10, lookahead=40, on_failure=None):
+        """
+        Streams SET_POSITION_TARGET_GLOBAL_INT setpoints in guided mode from a thread of its
+        own, at a fixed rate: each one lookahead metres along the path ahead of the latest
+        position, so the aircraft flies through the points of a reroute instead of
+        stopping at each of them. The path is set with follow()
+
+        Args:
+            vehicle (Vehicle): vehicle to send the setpoints to
+            rate (number, optional): setpoints per second
+            lookahead (number, optional): metres ahead of the aircraft along the path. The
+                autopilot brakes towards a position target, so this should be at least the
+                stopping distance, speed^2 / (2 * acceleration), to keep cruise speed
+            on_failure (function, optional): called from the streaming thread when setpoints
+                failed for a second straight and streaming stopped
+        """
+        self.vehicle = vehicle
+        self.period = 1 / rate
+        self.lookahead = lookahead
+        self.lock = threading.Lock()
+        self.projection = None
+        self.path = None
+        self.on_failure = on_failure
+        self.sent = 0
+        self.failures = 0  # consecutive ticks that raised
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def follow(self, projection, path):
+        """
+        replaces the path
+
+        Args:
+            projection (LocalProjection): projection of the path
+            path (array): (k, 3) east, north, altitude vertices, see lookahead_point
+        """
+        with self.lock:
+            self.projection = projection
+            self.path = np.asarray(path, dtype=float).reshape(-1, 3)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        """stops streaming, waiting for a setpoint being sent so none follows the return"""
+        self.stopped.set()
+        if self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(self.period)
+
+    def run(self):
+        next_tick = time.monotonic()
+        while not self.stopped.is_set():
+            try:
+                self.tick()
+                self.failures = 0
+            except Exception as e:
+                self.failures += 1
+                if self.failures == 1:
+                    print("[ERROR]    Reroute           Setpoint failed:", e)
+                if self.failures * self.period >= 1:
+                    print("[ERROR]    Reroute           Setpoints failing, streaming stopped")
+                    self.stopped.set()
+                    if self.on_failure is not None:
+                        self.on_failure()
+                    return
+            # deadlines advance by a fixed period so the setpoint rate does not drift
+            now = time.monotonic()
+            next_tick += self.period
+            if next_tick < now:
+                next_tick = now
+            self.stopped.wait(next_tick - now)
+
+    def tick(self):
+        """sends the setpoint for the latest position, if there is a path and a position"""
+        with self.lock:
+            projection, path = self.projection, self.path
+        telemetry = self.vehicle.telemetry
+        if path is None or telemetry.lat is None:
+            return
+        current = projection.point(telemetry.lat, telemetry.lng)
+        east, north, alt = lookahead_point(path, (current.east, current.north), self.lookahead)
+        location = projection.from_enu(east, north)
+        self.vehicle.send_setpoint(location.lat, location.lng, alt)
+        self.sent += 1
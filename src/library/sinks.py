@@ -0,0 +1,167 @@
+import abc
+import json
+import queue
+import socket
+import time
+from threading import Thread
+
+import requests
+
+# fields of a telemetry sample, see Telemetry.sample
+FIELDS = ("timestamp", "lat", "lng", "alt", "heading", "groundspeed", "armed")
+
+
+class TelemetrySink(abc.ABC):
+    def __init__(self, rate=None, fields=None, queue_size=10):
+        """
+        Base class of a consumer of telemetry samples. Samples are offered from the
+        telemetry thread and handed to send() on the sink's own thread through a small
+        queue, so a slow sink never stalls the MAVLink link or the other sinks. When the
+        queue is full the oldest sample is dropped
+
+        Args:
+            rate (number, optional): maximum samples per second. Defaults to every sample.
+            fields (list, optional): sample fields sent. Defaults to all of FIELDS.
+            queue_size (number, optional): samples buffered while send() is busy
+        """
+        for field in fields or ():
+            if field not in FIELDS:
+                raise Exception("Invalid sink field: " + str(field))
+        self.min_interval = 1 / rate if rate else 0
+        self.fields = tuple(fields) if fields else FIELDS
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.last_offered = None
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+        self.thread = Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def offer(self, sample):
+        """queues a sample unless the rate limit holds it back. never blocks"""
+        now = time.monotonic()
+        if self.last_offered is not None and now - self.last_offered < self.min_interval:
+            return
+        self.last_offered = now
+
+        record = {field: sample[field] for field in self.fields}
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self.dropped += 1
+
+    def run(self):
+        while True:
+            record = self.queue.get()
+            try:
+                self.send(record)
+                self.sent += 1
+            except Exception as e:
+                self.errors += 1
+                print("[ERROR]    Telemetry sink    %s: %s" % (type(self).__name__, e))
+
+    @abc.abstractmethod
+    def send(self, record):
+        """delivers one record, a dict of the sink's fields. called on the sink's thread"""
+
+    def stats(self):
+        return {
+            "type": type(self).__name__,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+
+class HttpPostSink(TelemetrySink):
+    def __init__(self, url, timeout=3, **kwargs):
+        """posts every sample as JSON to url over one keep-alive session"""
+        super().__init__(**kwargs)
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def send(self, record):
+        response = self.session.post(self.url, json=record, timeout=self.timeout)
+        response.raise_for_status()
+
+
+class UdpSink(TelemetrySink):
+    def __init__(self, host, port, **kwargs):
+        """sends every sample as one JSON datagram to host:port"""
+        super().__init__(**kwargs)
+        self.address = (host, port)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, record):
+        self.socket.sendto(json.dumps(record).encode("utf-8"), self.address)
+
+
+class FileSink(TelemetrySink):
+    def __init__(self, path, **kwargs):
+        """appends every sample to path as one line of JSON"""
+        super().__init__(**kwargs)
+        self.file = open(path, "a")
+
+    def send(self, record):
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+
+class CallbackSink(TelemetrySink):
+    def __init__(self, callback, **kwargs):
+        """calls callback(sample) on the sink's thread, for in-process consumers"""
+        super().__init__(**kwargs)
+        self.callback = callback
+
+    def send(self, record):
+        self.callback(record)
+
+
+SINK_TYPES = {
+    "http": HttpPostSink,
+    "udp": UdpSink,
+    "file": FileSink,
+}
+
+
+def create_sink(sink_config):
+    """
+    creates a sink from its config.json entry, e.g.
+    {"type": "udp", "host": "192.168.1.10", "port": 14600, "rate": 5, "fields": ["lat", "lng"]}
+    """
+    options = dict(sink_config)
+    sink_type = options.pop("type")
+    if sink_type not in SINK_TYPES:
+        raise Exception("Invalid sink type: " + sink_type)
+    return SINK_TYPES[sink_type](**options)
+
+
+class SinkFanout:
+    def __init__(self):
+        """
+        Hands telemetry samples to every registered sink
+        """
+        self.sinks = ()
+
+    def add(self, sink):
+        sink.start()
+        self.sinks = self.sinks + (sink,)
+        return sink
+
+    def remove(self, sink):
+        self.sinks = tuple(s for s in self.sinks if s is not sink)
+
+    def publish(self, sample):
+        for sink in self.sinks:
+            sink.offer(sample)
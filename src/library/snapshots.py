@@ -0,0 +1,65 @@
+import time
+
+
+class Snapshot:
+    def __init__(self, msg, received, seq):
+        """
+        The last decoded message of one type
+
+        Args:
+            msg (MAVLink_message): decoded message
+            received (number): time.monotonic() at which it was received
+            seq (number): number of messages of this type received so far
+        """
+        self.msg = msg
+        self.received = received
+        self.seq = seq
+
+    def age(self):
+        return time.monotonic() - self.received
+
+
+class SnapshotStore:
+    def __init__(self, waiters):
+        """
+        Keeps the latest message of every type received from the autopilot so readers
+        can get a recent value without blocking on the link
+
+        Args:
+            waiters (MessageWaiters): used to block when the cached value is too old
+        """
+        self.waiters = waiters
+        self.snapshots = {}
+
+    def update(self, msg_type, msg):
+        """
+        stores msg as the latest of its type. must be called before waiters of the
+        same message are notified
+        """
+        previous = self.snapshots.get(msg_type)
+        seq = 1 if previous is None else previous.seq + 1
+        # a single dict assignment, so readers never see a half written snapshot
+        self.snapshots[msg_type] = Snapshot(msg, time.monotonic(), seq)
+
+    def get(self, msg_type):
+        """returns the latest snapshot of msg_type without blocking, or None"""
+        return self.snapshots.get(msg_type)
+
+    def latest(self, msg_type, max_age, timeout=None, predicate=None):
+        """
+        returns the latest snapshot of msg_type if it is no older than max_age, otherwise
+        blocks until the next one is received. if timeout is reached, returns None
+
+        Args:
+            msg_type (string): mavlink message
+            max_age (number): maximum age of the cached value in seconds
+            timeout (number, optional): timeout in seconds. Defaults to None.
+            predicate (function, optional): messages it returns False for are skipped
+        """
+        snapshot = self.snapshots.get(msg_type)
+        if snapshot is not None and snapshot.age() <= max_age:
+            return snapshot
+
+        if self.waiters.wait(msg_type, timeout=timeout, predicate=predicate) is None:
+            return None
+        return self.snapshots.get(msg_type)
@@ -0,0 +1,159 @@
+import numpy as np
+
+from src.library.planner import CircleObstacle, segment_distance
+
+# segments closer than this, in metres, to a polygon edge count as crossing it
+TOLERANCE = 1e-6
+
+
+def expand(counts):
+    """for ranges of the given lengths, the range each position belongs to and its offset in it"""
+    owners = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owners, offsets
+
+
+class SpatialIndex:
+    def __init__(self, shapes, cell_size=50):
+        """
+        Uniform grid over local metres holding polygons and circles, for batch queries of
+        which shapes route segments cross and which shapes contain points. Each polygon
+        edge is registered in the grid cells it passes through and each circle in the
+        cells around it, so a segment is only tested against what shares a cell with it
+
+        Args:
+            shapes (list): CircleObstacle and PolygonObstacle instances, numbered in order
+            cell_size (number, optional): side of the grid cells, metres
+        """
+        self.cell_size = float(cell_size)
+        self.count = len(shapes)
+
+        # items are polygon edges, or circles as a zero length edge with a radius
+        starts, ends, radii, owners = [], [], [], []
+        for index, shape in enumerate(shapes):
+            if isinstance(shape, CircleObstacle):
+                starts.append(shape.center[None, :])
+                ends.append(shape.center[None, :])
+                radii.append([shape.radius])
+            else:
+                starts.append(shape.vertices)
+                ends.append(np.roll(shape.vertices, -1, axis=0))
+                radii.append(np.zeros(len(shape.vertices)))
+            owners.append(np.full(len(starts[-1]), index))
+        self.starts = np.concatenate(starts) if shapes else np.zeros((0, 2))
+        self.ends = np.concatenate(ends) if shapes else np.zeros((0, 2))
+        self.radii = np.concatenate(radii) if shapes else np.zeros(0)
+        self.owners = np.concatenate(owners).astype(int) if shapes else np.zeros(0, dtype=int)
+
+        self.circle = np.array([isinstance(shape, CircleObstacle) for shape in shapes], dtype=bool)
+        # bounding boxes of the shapes, whose items are contiguous
+        first = np.searchsorted(self.owners, np.arange(self.count))
+        self.low = np.minimum.reduceat(np.minimum(self.starts, self.ends) - self.radii[:, None], first) \
+            if shapes else np.zeros((0, 2))
+        self.high = np.maximum.reduceat(np.maximum(self.starts, self.ends) + self.radii[:, None], first) \
+            if shapes else np.zeros((0, 2))
+
+        items, keys = self.cells(self.starts, self.ends, self.radii)
+        order = np.argsort(keys, kind="stable")
+        self.items = items[order]
+        self.keys, self.first, self.length = np.unique(keys[order], return_index=True, return_counts=True)
+
+    def cells(self, starts, ends, radii=None):
+        """
+        grid cells each segment passes through, or for a radius the cells around it, as
+        (segment, cell key) pairs
+        """
+        size = self.cell_size
+        pad = size * 1e-9  # so a point on a cell border is in the cells on both sides
+        if radii is None:
+            radii = np.zeros(len(starts))
+        low = np.minimum(starts, ends) - radii[:, None] - pad
+        high = np.maximum(starts, ends) + radii[:, None] + pad
+        first_column = np.floor(low[:, 0] / size).astype(np.int64)
+        last_column = np.floor(high[:, 0] / size).astype(np.int64)
+
+        # each segment is cut into the columns it spans, and each piece into its rows
+        segments, offsets = expand(last_column - first_column + 1)
+        column = first_column[segments] + offsets
+        dx = ends[segments, 0] - starts[segments, 0]
+        dy = ends[segments, 1] - starts[segments, 1]
+        x0 = np.maximum(column * size, low[segments, 0])
+        x1 = np.minimum((column + 1) * size, high[segments, 0])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            y0 = starts[segments, 1] + (x0 - starts[segments, 0]) * dy / dx
+            y1 = starts[segments, 1] + (x1 - starts[segments, 0]) * dy / dx
+        # circles and segments along a column take their whole height
+        whole = (dx == 0) | (radii[segments] > 0)
+        y_low = np.where(whole, low[segments, 1],
+                         np.clip(np.minimum(y0, y1) - pad, low[segments, 1], high[segments, 1]))
+        y_high = np.where(whole, high[segments, 1],
+                          np.clip(np.maximum(y0, y1) + pad, low[segments, 1], high[segments, 1]))
+        first_row = np.floor(y_low / size).astype(np.int64)
+        last_row = np.floor(y_high / size).astype(np.int64)
+
+        pieces, offsets = expand(last_row - first_row + 1)
+        row = first_row[pieces] + offsets
+        return segments[pieces], (column[pieces] << 32) + row
+
+    def candidates(self, starts, ends):
+        """(segment, item) pairs sharing a grid cell, each pair once"""
+        segments, keys = self.cells(starts, ends)
+        position = np.searchsorted(self.keys, keys)
+        position[position == len(self.keys)] = 0
+        hit = (self.keys[position] == keys) if len(self.keys) else np.zeros(len(keys), dtype=bool)
+        segments, position = segments[hit], position[hit]
+
+        pairs, offsets = expand(self.length[position])
+        items = self.items[self.first[position][pairs] + offsets]
+        pairs = np.unique(segments[pairs] * len(self.radii) + items)
+        return pairs // max(len(self.radii), 1), pairs % max(len(self.radii), 1)
+
+    def crossings(self, starts, ends):
+        """
+        returns the (segment, shape) pairs where segments starts -> ends cross a polygon's
+        edge or enter a circle, each pair once
+
+        Args:
+            starts (array): (n, 2) segment starts, local metres
+            ends (array): (n, 2) segment ends, local metres
+        """
+        starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+        segments, items = self.candidates(starts, ends)
+        distance = segment_distance(starts[segments], ends[segments], self.starts[items], self.ends[items])
+        hit = distance < self.radii[items] + TOLERANCE
+        pairs = np.unique(segments[hit] * max(self.count, 1) + self.owners[items[hit]])
+        return pairs // max(self.count, 1), pairs % max(self.count, 1)
+
+    def containing(self, points):
+        """
+        returns the (point, shape) pairs where a point is inside a polygon or circle
+
+        Args:
+            points (array): (n, 2) points, local metres
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        in_box = np.all((points[:, None, :] >= self.low[None, :, :]) & (points[:, None, :] <= self.high[None, :, :]),
+                        axis=2)
+        point_ids, shapes = np.nonzero(in_box)
+
+        circles = self.circle[shapes]
+        # a circle is a single item, the first of its shape
+        centers = np.searchsorted(self.owners, shapes[circles])
+        inside_circle = np.linalg.norm(points[point_ids[circles]] - self.starts[centers], axis=1) < self.radii[centers]
+
+        # ray casting along +east over the edges of each candidate polygon
+        polygon_points, polygon_shapes = point_ids[~circles], shapes[~circles]
+        first = np.searchsorted(self.owners, polygon_shapes)
+        length = np.searchsorted(self.owners, polygon_shapes, side="right") - first
+        pairs, offsets = expand(length)
+        edges = first[pairs] + offsets
+        p, a, b = points[polygon_points[pairs]], self.starts[edges], self.ends[edges]
+        straddles = (a[:, 1] > p[:, 1]) != (b[:, 1] > p[:, 1])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            x = a[:, 0] + (p[:, 1] - a[:, 1]) * (b[:, 0] - a[:, 0]) / (b[:, 1] - a[:, 1])
+        crossings = np.bincount(pairs[straddles & (p[:, 0] < x)], minlength=len(polygon_points))
+        inside_polygon = crossings % 2 == 1
+
+        return (np.concatenate([point_ids[circles][inside_circle], polygon_points[inside_polygon]]),
+                np.concatenate([shapes[circles][inside_circle], polygon_shapes[inside_polygon]]))
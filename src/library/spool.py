@@ -0,0 +1,211 @@
+import math
+import os
+import struct
+from threading import Lock
+
+SEGMENT_MAGIC = b"ACSP\x01"  # acom spool, format version 1
+SEGMENT_SUFFIX = ".seg"
+CORRUPT_SUFFIX = ".corrupt"
+CURSOR_NAME = "cursor"
+
+# oldest segment number and the offset of its next unsent record
+CURSOR = struct.Struct("<QQ")
+
+# timestamp, lat and lng (deg e7), alt (m), heading (deg), groundspeed (m/s), winch status
+RECORD = struct.Struct("<diifffB")
+
+
+def encode_record(timestamp, payload):
+    """packs a GCOM telemetry payload into a fixed size record. unknown values are stored as NaN"""
+    return RECORD.pack(
+        timestamp,
+        int(payload["latitude_dege7"]),
+        int(payload["longitude_dege7"]),
+        _float(payload["altitude_msl_m"]),
+        _float(payload["heading_deg"]),
+        _float(payload["groundspeed_m_s"]),
+        payload["winch_status"],
+    )
+
+
+def decode_record(data, offset=0):
+    """unpacks a record into a GCOM telemetry payload with its timestamp"""
+    timestamp, lat, lng, alt, heading, groundspeed, winch_status = RECORD.unpack_from(data, offset)
+    return {
+        "timestamp": timestamp,
+        "latitude_dege7": lat,
+        "longitude_dege7": lng,
+        "altitude_msl_m": _optional(alt),
+        "heading_deg": _optional(heading),
+        "groundspeed_m_s": _optional(groundspeed),
+        "winch_status": winch_status,
+    }
+
+
+def _float(value):
+    return math.nan if value is None else value
+
+
+def _optional(value):
+    return None if math.isnan(value) else value
+
+
+class TelemetrySpool:
+    def __init__(self, directory, segment_bytes, max_bytes):
+        """
+        Append-only on-disk queue of telemetry samples that could not be sent to GCOM.
+        Samples are written to numbered segment files of fixed size records and read
+        back oldest first. When the spool grows past max_bytes the oldest segments are
+        deleted. Segments left by a previous run are picked up again on start, from the
+        delivery cursor kept in a small file next to them, so delivered samples are not
+        sent twice. Segments with a bad header are renamed to *.corrupt and skipped
+
+        Args:
+            directory (string): directory holding the segment files
+            segment_bytes (number): size after which a new segment is started
+            max_bytes (number): maximum total size of all segments
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.lock = Lock()
+        self.evicted = 0  # records dropped by the size bound
+
+        os.makedirs(directory, exist_ok=True)
+        self.segments = sorted(
+            int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(directory)
+            if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit()
+        )
+        self.segments = [number for number in self.segments if self.check_segment(number)]
+        self.sizes = {number: os.path.getsize(self.path(number)) for number in self.segments}
+        self.writer = None  # file object of the newest segment, opened on first append
+        self.read_offset = len(SEGMENT_MAGIC)  # position of the next unsent record in the oldest segment
+        self.load_cursor()
+
+    def path(self, number):
+        return os.path.join(self.directory, "%010d%s" % (number, SEGMENT_SUFFIX))
+
+    def cursor_path(self):
+        return os.path.join(self.directory, CURSOR_NAME)
+
+    def check_segment(self, number):
+        """renames a segment that does not start with the magic out of the way"""
+        path = self.path(number)
+        with open(path, "rb") as f:
+            if f.read(len(SEGMENT_MAGIC)) == SEGMENT_MAGIC:
+                return True
+        print("[ERROR]    GCOM-X Telemetry  Spool segment %s is corrupt, skipping it" % path)
+        os.replace(path, path + CORRUPT_SUFFIX)
+        return False
+
+    def load_cursor(self):
+        """resumes from the cursor saved by a previous run, if it still points into the spool"""
+        try:
+            with open(self.cursor_path(), "rb") as f:
+                number, offset = CURSOR.unpack(f.read(CURSOR.size))
+        except (OSError, struct.error):
+            return
+        # segments before the cursor were delivered, the process stopped before deleting them
+        while self.segments and self.segments[0] < number:
+            self.remove_oldest()
+        if self.segments and self.segments[0] == number:
+            if (offset - len(SEGMENT_MAGIC)) % RECORD.size == 0 and \
+                    len(SEGMENT_MAGIC) <= offset <= self.sizes[number]:
+                self.read_offset = offset
+        self.save_cursor()
+
+    def save_cursor(self):
+        """atomically replaces the cursor file, removing it once the spool is empty"""
+        path = self.cursor_path()
+        if not self.segments:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        with open(path + ".tmp", "wb") as f:
+            f.write(CURSOR.pack(self.segments[0], self.read_offset))
+        os.replace(path + ".tmp", path)
+
+    def append(self, timestamp, payload):
+        """stores one sample"""
+        record = encode_record(timestamp, payload)
+        with self.lock:
+            if self.writer is None or self.sizes[self.segments[-1]] >= self.segment_bytes:
+                self.start_segment()
+            self.writer.write(record)
+            self.writer.flush()
+            self.sizes[self.segments[-1]] += len(record)
+            self.evict()
+
+    def start_segment(self):
+        if self.writer is not None:
+            self.writer.close()
+        number = self.segments[-1] + 1 if self.segments else 0
+        self.writer = open(self.path(number), "wb")
+        self.writer.write(SEGMENT_MAGIC)
+        self.segments.append(number)
+        self.sizes[number] = len(SEGMENT_MAGIC)
+
+    def evict(self):
+        """deletes the oldest segments while the spool is larger than max_bytes"""
+        while len(self.segments) > 1 and sum(self.sizes.values()) > self.max_bytes:
+            oldest = self.segments[0]
+            unread = self.sizes[oldest] - self.read_offset
+            self.evicted += unread // RECORD.size
+            self.remove_oldest()
+
+    def remove_oldest(self):
+        oldest = self.segments.pop(0)
+        del self.sizes[oldest]
+        self.read_offset = len(SEGMENT_MAGIC)
+        # the cursor moves first, a crash in between leaves a segment that is dropped on start
+        self.save_cursor()
+        os.remove(self.path(oldest))
+
+    def read_batch(self, size):
+        """
+        returns up to size of the oldest unsent samples, and a cursor to pass to commit
+        once they have been delivered. samples stay in the spool until then
+        """
+        with self.lock:
+            # skip segments without a complete record, e.g. left empty by a previous run
+            while self.segments and self.sizes[self.segments[0]] - self.read_offset < RECORD.size:
+                if self.writer is not None and self.segments[0] == self.segments[-1]:
+                    break
+                self.remove_oldest()
+            if not self.segments:
+                return [], None
+            oldest = self.segments[0]
+            with open(self.path(oldest), "rb") as f:
+                f.seek(self.read_offset)
+                data = f.read(size * RECORD.size)
+            count = len(data) // RECORD.size
+            batch = [decode_record(data, i * RECORD.size) for i in range(count)]
+            return batch, (oldest, self.read_offset)
+
+    def commit(self, cursor, count):
+        """
+        marks count samples read at cursor as delivered. ignored if they were evicted
+        in the meantime
+        """
+        with self.lock:
+            if not self.segments or cursor != (self.segments[0], self.read_offset):
+                return
+            self.read_offset += count * RECORD.size
+            oldest = self.segments[0]
+            # a partial record can only be left at the end of a segment by a crash
+            if self.sizes[oldest] - self.read_offset < RECORD.size:
+                if oldest == self.segments[-1] and self.writer is not None:
+                    # everything has been sent, the next append starts a new segment
+                    self.writer.close()
+                    self.writer = None
+                self.remove_oldest()
+            else:
+                self.save_cursor()
+
+    def pending(self):
+        """number of samples waiting to be sent"""
+        with self.lock:
+            if not self.segments:
+                return 0
+            total = sum(self.sizes[number] - len(SEGMENT_MAGIC) for number in self.segments)
+            return (total - (self.read_offset - len(SEGMENT_MAGIC))) // RECORD.size
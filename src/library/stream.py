@@ -0,0 +1,84 @@
+import time
+from threading import Condition, Lock
+
+# channels published by Telemetry
+CHANNELS = ("gps", "heartbeat", "speed")
+
+
+class Subscriber:
+    def __init__(self, channels, max_rate):
+        """
+        One client of the telemetry stream. Only the newest value of each channel is
+        kept, so a client that reads slower than telemetry arrives skips intermediate
+        values instead of building up a backlog
+
+        Args:
+            channels (set): channel names the client receives
+            max_rate (number): maximum number of updates per second sent to the client
+        """
+        self.channels = channels
+        self.min_interval = 1 / max_rate
+        self.pending = {}  # channel -> newest value not yet sent
+        self.condition = Condition()
+        self.last_sent = 0
+
+    def offer(self, channel, value):
+        with self.condition:
+            self.pending[channel] = value
+            self.condition.notify()
+
+    def next(self, timeout):
+        """
+        blocks until there are new values and the rate limit allows sending them, and
+        returns them as a dict of channel -> value. returns an empty dict if nothing
+        arrived within timeout seconds
+        """
+        # values that arrive while the rate limit holds us back replace older ones
+        delay = self.last_sent + self.min_interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        with self.condition:
+            if not self.pending:
+                self.condition.wait(timeout)
+            updates = self.pending
+            self.pending = {}
+
+        if updates:
+            self.last_sent = time.monotonic()
+        return updates
+
+
+class TelemetryStream:
+    def __init__(self):
+        """
+        Pushes telemetry updates from the telemetry observers to streaming clients
+        """
+        self.lock = Lock()
+        self.subscribers = ()
+
+    def subscribe(self, channels, max_rate):
+        subscriber = Subscriber(set(channels), max_rate)
+        with self.lock:
+            self.subscribers = self.subscribers + (subscriber,)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers = tuple(s for s in self.subscribers if s is not subscriber)
+
+    def publish(self, channel, get_value):
+        """
+        offers a new channel value to every subscriber of the channel. get_value is only
+        called when somebody is subscribed, so publishing costs nothing without clients
+
+        Args:
+            channel (string): channel name
+            get_value (function): returns the JSON serializable channel value
+        """
+        value = None
+        for subscriber in self.subscribers:
+            if channel in subscriber.channels:
+                if value is None:
+                    value = get_value()
+                subscriber.offer(channel, value)
@@ -1,14 +1,27 @@
 import json
 import socket
 import time
-from threading import Thread
+from functools import partial
+from threading import Lock, Thread
 
-from observable import Observable
 from pymavlink import mavutil
 
+from src.library.dispatch import Dispatcher
+from src.library.framing import FrameSplitter
+from src.library.history import TelemetryHistory
+from src.library.link import AsyncLink
+from src.library.responses import ResponseCache
+from src.library.sinks import SinkFanout, create_sink
+from src.library.snapshots import SnapshotStore
+from src.library.stream import TelemetryStream
+from src.library.waiters import MessageWaiters
+
 with open('config.json', 'r') as f:
     config = json.load(f)
 
+# bytes read from the link at a time in selective decode mode
+RECV_CHUNK_SIZE = 4096
+
 
 class Telemetry:
     def __init__(self, vehicle):
@@ -30,6 +43,10 @@ class Telemetry:
         self.lng = None
         self.alt = None
         self.heading = None
+        # velocity north, east and down, m/s
+        self.vx = None
+        self.vy = None
+        self.vz = None
         self.groundspeed = None
         self.chan3_raw = None
 
@@ -40,8 +57,30 @@ class Telemetry:
         self.armed = False
 
         self.thread = None
-        self.notifiers = None
-        self.event = None
+        self.link = None
+        self.waiters = MessageWaiters()
+        self.snapshots = SnapshotStore(self.waiters)
+        # default freshness bound, in seconds, for values read through latest()
+        self.max_age = config["telemetry"]["maxAge"]
+        self.dispatcher = None
+        self.tracked = set()
+        self.tracked_lock = Lock()
+
+        # only decode messages that have handlers, see receive_selected_messages
+        self.selective_decode = config["telemetry"]["selectiveDecode"]
+        self.splitter = FrameSplitter()
+        self.raw_listeners = []
+
+        # recent telemetry, recorded on every GLOBAL_POSITION_INT
+        self.history = TelemetryHistory(config["telemetry"]["historySize"])
+        # live updates for streaming clients
+        self.stream = TelemetryStream()
+        # telemetry route bodies, serialised once per message
+        self.responses = ResponseCache()
+        # samples for the sinks configured in config.json, see SinkFanout
+        self.sinks = SinkFanout()
+        for sink_config in config["telemetry"]["sinks"]:
+            self.sinks.add(create_sink(sink_config))
         self.heartbeat_lastsent = None
 
         self.is_polling = False
@@ -55,32 +94,54 @@ class Telemetry:
             "heading": self.heading,
         }
 
+    def get_velocity(self):
+        return {
+            "vx": self.vx,
+            "vy": self.vy,
+            "vz": self.vz,
+        }
+
+    def sample(self):
+        """returns the current telemetry values as a sample for the sinks"""
+        return {
+            "timestamp": time.time(),
+            "lat": self.lat,
+            "lng": self.lng,
+            "alt": self.alt,
+            "heading": self.heading,
+            "groundspeed": self.groundspeed,
+            "armed": self.armed,
+        }
+
     def is_armed(self):
         return self.armed
 
     def wait_armed(self, expected, timeout=None):
-        start_time = time.time()
-        while True:
-            if timeout is not None:
-                now = time.time()
-                if now < start_time:
-                    # If an external process rolls back system time, we should not spin forever.
-                    start_time = now
-                if start_time + timeout < time.time():
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.armed != expected:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
                     return
-            if self.armed == expected:
-                return
-
-            time.sleep(0.05)
+            # the armed flag is refreshed by the heartbeat observer before waiters wake
+            self.wait("HEARTBEAT", timeout=remaining)
 
     def start_polling(self):
         print("Starting polling...")
         self.heartbeat_lastsent = time.monotonic()
-        self.event = Observable()
-        self.notifiers = Observable()
+        self.dispatcher = Dispatcher()
+        self.tracked = set()
         self.init_observers()
-        self.thread = Thread(target=self.poll_for_data, daemon=True)
-        self.thread.start()
+        if self.mavlink_connection.fd is not None:
+            # read as soon as data arrives, see AsyncLink
+            self.link = AsyncLink(self)
+            self.link.start()
+        else:
+            # connections without a pollable file descriptor (e.g. serial ports on
+            # windows) fall back to polling on a thread
+            self.thread = Thread(target=self.poll_for_data, daemon=True)
+            self.thread.start()
         self.is_polling = True
 
     def init_data_streams(self):
@@ -104,33 +165,8 @@ class Telemetry:
             timeout (number, optional): timeout in seconds. Defaults to None.
         """
         if self.is_polling:
-            result = None
-
-            def callback(msg):
-                nonlocal result
-                # ignore groundstations for heartbeat
-                if (
-                        msg.get_type() == "HEARTBEAT"
-                        and msg.type == mavutil.mavlink.MAV_TYPE_GCS
-                ):
-                    self.notifiers.once(msg_type, callback)
-                    return
-                result = msg
-
-            self.notifiers.once(msg_type, callback)
-
-            start_time = time.time()
-            while True:
-                if timeout is not None:
-                    now = time.time()
-                    if now < start_time:
-                        # If an external process rolls back system time, we should not spin forever.
-                        start_time = now
-                    if start_time + timeout < time.time():
-                        return None
-                if result is not None:
-                    return result
-                time.sleep(0.05)
+            self.track(msg_type)
+            return self.waiters.wait(msg_type, timeout=timeout)
 
         else:
             # not polling
@@ -138,17 +174,61 @@ class Telemetry:
                 type=[msg_type], timeout=timeout, blocking=True
             )
 
+    def latest(self, msg_type, max_age=None, timeout=None):
+        """
+        returns the latest msg_type message if it was received within max_age seconds,
+        otherwise blocks until the next one arrives. if timeout is specified and is
+        reached, returns None
+
+        Args:
+            msg_type (string): mavlink message
+            max_age (number, optional): freshness bound in seconds. Defaults to the
+                telemetry maxAge in config.json.
+            timeout (number, optional): timeout in seconds. Defaults to None.
+        """
+        if not self.is_polling:
+            return self.wait(msg_type, timeout=timeout)
+
+        if max_age is None:
+            max_age = self.max_age
+        self.track(msg_type)
+        snapshot = self.snapshots.latest(msg_type, max_age, timeout=timeout)
+        return None if snapshot is None else snapshot.msg
+
+    def track(self, msg_type):
+        """
+        starts caching msg_type messages and waking their waiters. messages that are
+        neither tracked nor observed are dropped without being dispatched
+
+        Args:
+            msg_type (string): mavlink message
+        """
+        if msg_type in self.tracked:
+            return
+        with self.tracked_lock:
+            if msg_type not in self.tracked:
+                # runs after the observers, so waiters see the values they derive
+                self.dispatcher.on(msg_type, partial(self.record, msg_type), last=True)
+                self.tracked.add(msg_type)
+
+    def record(self, msg_type, msg):
+        # ignore groundstations for heartbeat
+        if msg_type == "HEARTBEAT" and msg.type == mavutil.mavlink.MAV_TYPE_GCS:
+            return
+        self.snapshots.update(msg_type, msg)
+        self.waiters.notify(msg_type, msg)
+
     def init_observers(self):
         """
         Initializes observers. These functions are called when a message has been recieved.
 
         example:
-        @self.event.on('GPS_RAW_INT')
+        @self.dispatcher.on('GPS_RAW_INT')
         def listener(msg):
             print(msg)
         """
 
-        @self.event.on("HEARTBEAT")
+        @self.dispatcher.on("HEARTBEAT")
         def hb_listener(msg):
             # ignore groundstations
             if msg.type == mavutil.mavlink.MAV_TYPE_GCS:
@@ -162,29 +242,91 @@ class Telemetry:
                 msg.base_mode & mavutil.mavlink.MAV_MODE_FLAG_SAFETY_ARMED
             ) != 0
 
-        @self.event.on("GLOBAL_POSITION_INT")
+        # mode change latency, see CommandLatency
+        @self.dispatcher.on("HEARTBEAT")
+        def mode_listener(msg):
+            if msg.type != mavutil.mavlink.MAV_TYPE_GCS:
+                self.vehicle.mode_latency.on_heartbeat(msg)
+
+        @self.dispatcher.on("GLOBAL_POSITION_INT")
         def gpi_listener(msg):
             # Use relative alt + MSL at base alt
             self.alt = msg.relative_alt / 1000 + config["latitudeOffset"]
             self.heading = msg.hdg / 100
+            self.vx = msg.vx / 100
+            self.vy = msg.vy / 100
+            self.vz = msg.vz / 100
 
-        @self.event.on("VFR_HUD")
+        @self.dispatcher.on("VFR_HUD")
         def vfr_listener(msg):
             self.groundspeed = msg.groundspeed
 
-        @self.event.on("GPS_RAW_INT")
+        @self.dispatcher.on("GPS_RAW_INT")
         def gps_listener(msg):
             self.lat = msg.lat * 1.0e-7
             self.lng = msg.lon * 1.0e-7
 
-        # @self.event.on("RC_CHANNELS_RAW")
+        # one history sample per position update, after gpi_listener has run
+        @self.dispatcher.on("GLOBAL_POSITION_INT")
+        def history_listener(msg):
+            self.history.record(time.monotonic(), self.lat, self.lng, self.alt,
+                                self.heading, self.groundspeed, self.armed)
+
+        # one sample per position update for the sinks, built only if there are any
+        @self.dispatcher.on("GLOBAL_POSITION_INT")
+        def sink_listener(msg):
+            if self.sinks.sinks:
+                self.sinks.publish(self.sample())
+
+        # predict moving obstacle tracks against ours, see Vehicle.check_conflicts
+        @self.dispatcher.on("GLOBAL_POSITION_INT")
+        def conflict_listener(msg):
+            if self.vehicle.conflicts is not None:
+                self.vehicle.check_conflicts()
+
+        # push updates to streaming clients, see TelemetryStream
+        @self.dispatcher.on("GPS_RAW_INT")
+        @self.dispatcher.on("GLOBAL_POSITION_INT")
+        def gps_stream_listener(msg):
+            self.stream.publish("gps", self.get_location)
+
+        @self.dispatcher.on("HEARTBEAT")
+        def hb_stream_listener(msg):
+            if msg.type != mavutil.mavlink.MAV_TYPE_GCS:
+                self.stream.publish("heartbeat", msg.to_dict)
+
+        @self.dispatcher.on("VFR_HUD")
+        def vfr_stream_listener(msg):
+            self.stream.publish("speed", lambda: {"groundspeed": self.groundspeed})
+
+        # serialise the bodies of the telemetry routes, see ResponseCache
+        @self.dispatcher.on("GPS_RAW_INT")
+        @self.dispatcher.on("GLOBAL_POSITION_INT")
+        def gps_response_listener(msg):
+            now = time.time()
+            location = self.get_location()
+            self.responses.update("gps", location, now)
+            # the timestamp is specifically for SkyPasta, which requires one with the telemetry data
+            location["timestamp"] = int(now)
+            self.responses.update("gps_with_timestamp", location, now)
+
+        @self.dispatcher.on("HEARTBEAT")
+        def hb_response_listener(msg):
+            if msg.type != mavutil.mavlink.MAV_TYPE_GCS:
+                self.responses.update("heartbeat", msg.to_dict())
+
+        # @self.dispatcher.on("RC_CHANNELS_RAW")
         # def rc_listener(msg):
         #     self.chan3_raw = msg.chan3_raw
 
-        # @self.event.on("SCALED_PRESSURE")
+        # @self.dispatcher.on("SCALED_PRESSURE")
         # def alt_listener(msg):
         #     self.alt = msg.press_abs
 
+        # keep the observed messages cached from the start
+        for msg_type in ("HEARTBEAT", "GLOBAL_POSITION_INT", "VFR_HUD", "GPS_RAW_INT"):
+            self.track(msg_type)
+
     # set a message interval for a specific mavlink message
     def set_message_interval(self, messageid, interval):
         """
@@ -217,13 +359,11 @@ class Telemetry:
     def poll_for_data(self):
         """
         polls for any data from the autopilot. when recieved, triggers an event that
-        notifies all observers listening to that specific msg type
-
-        Raises:
-            Exception: various exceptions
+        notifies all observers listening to that specific msg type. runs until the
+        connection fails
         """
-        try:
-            while True:
+        while True:
+            try:
                 # send heartbeat to autopilot
                 if time.monotonic() - self.heartbeat_lastsent > 1:
                     self.mavlink_connection.mav.heartbeat_send(
@@ -238,33 +378,98 @@ class Telemetry:
                 # Sleep
                 self.mavlink_connection.select(0.05)
 
-                while True:
+                self.receive_messages()
+
+            except (OSError, EOFError) as e:
+                print("Exception in MAVLink input loop")
+                print(e)
+                return
+            except Exception as e:
+                # like the link, only an I/O error ends polling
+                print("Exception while receiving message: ")
+                print(e)
+
+    def receive_messages(self):
+        """
+        dispatches every message waiting on the link
+        """
+        if self.selective_decode:
+            self.receive_selected_messages()
+            return
+
+        while True:
+            try:
+                # try to get message
+                msg = self.mavlink_connection.recv_msg()
+            except socket.error as error:
+                raise
+            except mavutil.mavlink.MAVError as e:
+                # Avoid
+                #   invalid MAVLink prefix '73'
+                #   invalid MAVLink prefix '13'
+                print("mav recv error: %s" % str(e))
+                msg = None
+            except Exception as e:
+                # Log any other unexpected exception
+                print("Exception while receiving message: ")
+                print(e)
+                msg = None
+            if not msg:
+                # no message, restart polling loop
+                break
+
+            if self.verbose:
+                print(msg.get_type() + " recieved")
+            self.dispatcher.dispatch(msg)
+
+    def receive_selected_messages(self):
+        """
+        selective decode mode: splits the incoming bytes into frames by their headers and
+        only decodes frames whose message id has a handler. every frame, decoded or not,
+        is passed to the raw listeners
+        """
+        connection = self.mavlink_connection
+        while True:
+            data = connection.recv(RECV_CHUNK_SIZE)
+            if not data:
+                return
+
+            if connection.logfile_raw:
+                connection.logfile_raw.write(data)
+            if connection.first_byte:
+                connection.auto_mavlink_version(data)
+
+            self.splitter.feed(data)
+            for msgid, frame in self.splitter.frames():
+                if self.dispatcher.subscribed(msgid):
                     try:
-                        # try to get message
-                        msg = self.mavlink_connection.recv_msg()
-                    except socket.error as error:
-                        raise
+                        msg = connection.mav.decode(bytearray(frame))
                     except mavutil.mavlink.MAVError as e:
-                        # Avoid
-                        #   invalid MAVLink prefix '73'
-                        #   invalid MAVLink prefix '13'
-                        print("mav recv error: %s" % str(e))
-                        msg = None
+                        # bad checksum or a false sync in line noise
+                        if self.verbose:
+                            print("mav recv error: %s" % str(e))
+                        self.splitter.reject()
+                        continue
+                else:
+                    msg = None
+
+                for listener in self.raw_listeners:
+                    try:
+                        listener(msgid, frame)
                     except Exception as e:
-                        # Log any other unexpected exception
-                        print("Exception while receiving message: ")
+                        print("Exception in raw listener: ")
                         print(e)
-                        msg = None
-                    if not msg:
-                        # no message, restart polling loop
-                        break
 
+                if msg is not None:
+                    # keeps the connection's flightmode and message state current
+                    connection.post_message(msg)
                     if self.verbose:
                         print(msg.get_type() + " recieved")
-                    self.event.trigger(msg.get_type(), msg)
-                    self.notifiers.trigger(msg.get_type(), msg)
+                    self.dispatcher.dispatch(msg)
 
-        except Exception as e:
-            print("Exception in MAVLink input loop")
-            print(e)
-            return
+    def add_raw_listener(self, listener):
+        """
+        registers a function called with (msgid, frame bytes) for every frame received
+        in selective decode mode, including frames that are never decoded
+        """
+        self.raw_listeners.append(listener)
@@ -0,0 +1,249 @@
+import json
+import statistics
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Semaphore, Thread
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+HEADERS = {
+    'content-type': 'application/json',
+    'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X x.y; rv:42.0) Gecko/20100101 Firefox/42.0',
+}
+
+# seconds between "[OK]" summaries of the uplink statistics
+REPORT_INTERVAL = 10
+
+
+class UplinkStats:
+    def __init__(self, window=100, spool=None):
+        """
+        Counters and timing of the GCOM uplink. rate and jitter are computed over the
+        last window posts
+        """
+        self.lock = Lock()
+        self.spool = spool
+        self.sent = 0
+        self.ok = 0
+        self.failed = 0  # non 200 responses
+        self.errors = 0  # exceptions, e.g. timeouts or refused connections
+        self.skipped = 0  # samples dropped because max in flight posts were pending
+        self.spooled = 0  # samples written to the spool during outages
+        self.backfilled = 0  # spooled samples delivered after an outage
+        self.last_error = None
+        self.send_times = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+
+    def on_send(self, now):
+        with self.lock:
+            self.sent += 1
+            self.send_times.append(now)
+
+    def on_response(self, ok, latency):
+        with self.lock:
+            if ok:
+                self.ok += 1
+            else:
+                self.failed += 1
+            self.latencies.append(latency)
+
+    def on_error(self, error):
+        with self.lock:
+            self.errors += 1
+            self.last_error = str(error)
+
+    def on_skip(self):
+        with self.lock:
+            self.skipped += 1
+
+    def on_spool(self):
+        with self.lock:
+            self.spooled += 1
+
+    def on_backfill(self, count):
+        with self.lock:
+            self.backfilled += count
+
+    def to_dict(self):
+        with self.lock:
+            send_times = list(self.send_times)
+            latencies = list(self.latencies)
+            result = {
+                "sent": self.sent,
+                "ok": self.ok,
+                "failed": self.failed,
+                "errors": self.errors,
+                "skipped": self.skipped,
+                "spooled": self.spooled,
+                "backfilled": self.backfilled,
+                "last_error": self.last_error,
+            }
+
+        if self.spool is not None:
+            result["spool_pending"] = self.spool.pending()
+            result["spool_evicted"] = self.spool.evicted
+
+        intervals = [b - a for a, b in zip(send_times, send_times[1:])]
+        result["rate_hz"] = len(intervals) / sum(intervals) if intervals and sum(intervals) > 0 else None
+        result["jitter_ms"] = statistics.pstdev(intervals) * 1000 if len(intervals) > 1 else None
+        result["latency_ms"] = statistics.median(latencies) * 1000 if latencies else None
+        return result
+
+
+class GcomUplink:
+    def __init__(self, vehicle, endpoint, rate, max_in_flight, spool=None, batch_size=50):
+        """
+        Posts the latest telemetry to GCOM-X at a fixed rate over one pooled keep-alive
+        session. Posts are sent from a small worker pool, so a slow round trip does not
+        delay the schedule; when max_in_flight posts are still pending, the sample is
+        skipped rather than queued, since GCOM only needs the newest position
+
+        With a spool, samples that fail to post, or that cannot be posted while GCOM is
+        unreachable, are stored on disk. Once posts succeed again they are sent in
+        batches (as a JSON array) from whichever post slot live samples leave free, so
+        at least max_in_flight - 1 slots always remain for live samples
+
+        Args:
+            vehicle (Vehicle): vehicle whose telemetry is posted
+            endpoint (string): GCOM-X telemetry url
+            rate (number): posts per second
+            max_in_flight (number): maximum number of concurrent posts
+            spool (TelemetrySpool, optional): stores samples during outages
+            batch_size (number, optional): spooled samples sent per backfill post
+        """
+        self.vehicle = vehicle
+        self.endpoint = endpoint
+        self.period = 1 / rate
+        self.spool = spool
+        self.batch_size = batch_size
+        self.stats = UplinkStats(spool=spool)
+
+        self.link_up = True  # whether the last post reached GCOM
+        self.backfilling = False
+
+        self.session = requests.Session()
+        # only retry failed connections, a retried sample would be stale by the time it is sent
+        retry = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.05)
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=max_in_flight)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.in_flight = Semaphore(max_in_flight)
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="gcom-uplink")
+        self.thread = Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def sample(self):
+        """returns the GCOM telemetry payload from the latest telemetry, or None without a position"""
+        telemetry = self.vehicle.telemetry
+        if telemetry.lat is None or telemetry.alt is None:
+            return None
+
+        with self.vehicle.lock:
+            winch_status = self.vehicle.winch_status
+
+        return {
+            "latitude_dege7": telemetry.lat * 10 ** 7,
+            "longitude_dege7": telemetry.lng * 10 ** 7,
+            "altitude_msl_m": telemetry.alt,
+            "heading_deg": telemetry.heading,
+            "groundspeed_m_s": telemetry.groundspeed,
+            "winch_status": winch_status,
+        }
+
+    def run(self):
+        next_tick = time.monotonic()
+        next_report = next_tick + REPORT_INTERVAL
+        while True:
+            payload = self.sample()
+            if payload is not None:
+                timestamp = time.time()
+                if self.in_flight.acquire(blocking=False):
+                    self.executor.submit(self.post, payload, timestamp)
+                elif self.spool is not None and not self.link_up:
+                    # posts are stuck on the outage, keep the track complete
+                    self.store(timestamp, payload)
+                else:
+                    self.stats.on_skip()
+
+            # live samples go first, backfill only takes a slot that is still free
+            if self.spool is not None and self.link_up and not self.backfilling and self.spool.pending():
+                if self.in_flight.acquire(blocking=False):
+                    batch, cursor = self.spool.read_batch(self.batch_size)
+                    if batch:
+                        self.backfilling = True
+                        self.executor.submit(self.backfill, batch, cursor)
+                    else:
+                        self.in_flight.release()
+
+            now = time.monotonic()
+            if now >= next_report:
+                self.report()
+                next_report = now + REPORT_INTERVAL
+
+            # deadlines advance by a fixed period so the post rate does not drift
+            next_tick += self.period
+            if next_tick < now:
+                next_tick = now
+            time.sleep(next_tick - now)
+
+    def post(self, payload, timestamp):
+        try:
+            start = time.monotonic()
+            self.stats.on_send(start)
+            response = self.session.post(
+                self.endpoint,
+                headers=HEADERS,
+                data=json.dumps(payload),
+                timeout=3
+            )
+            self.stats.on_response(response.status_code == 200, time.monotonic() - start)
+            self.link_up = response.status_code == 200
+            if response.status_code != 200:
+                print("[FAIL]     GCOM-X Telemetry  POST: " + str(response.status_code))
+                self.store(timestamp, payload)
+        except Exception as e:
+            self.stats.on_error(e)
+            self.link_up = False
+            print("[ERROR]    GCOM-X Telemetry  Exception encountered: " + str(e))
+            self.store(timestamp, payload)
+        finally:
+            self.in_flight.release()
+
+    def store(self, timestamp, payload):
+        if self.spool is not None:
+            self.spool.append(timestamp, payload)
+            self.stats.on_spool()
+
+    def backfill(self, batch, cursor):
+        try:
+            response = self.session.post(
+                self.endpoint,
+                headers=HEADERS,
+                data=json.dumps(batch),
+                timeout=3
+            )
+            if response.status_code == 200:
+                self.spool.commit(cursor, len(batch))
+                self.stats.on_backfill(len(batch))
+            else:
+                self.link_up = False
+                print("[FAIL]     GCOM-X Telemetry  Backfill POST: " + str(response.status_code))
+        except Exception as e:
+            self.link_up = False
+            print("[ERROR]    GCOM-X Telemetry  Backfill exception encountered: " + str(e))
+        finally:
+            self.backfilling = False
+            self.in_flight.release()
+
+    def report(self):
+        stats = self.stats.to_dict()
+        print("[OK]       GCOM-X Telemetry  %s Hz, jitter %s ms, %d failed, %d errors, %d skipped, %d spooled" % (
+            "-" if stats["rate_hz"] is None else round(stats["rate_hz"], 1),
+            "-" if stats["jitter_ms"] is None else round(stats["jitter_ms"], 1),
+            stats["failed"], stats["errors"], stats["skipped"], stats.get("spool_pending", 0)))
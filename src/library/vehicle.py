@@ -2,16 +2,23 @@ import json
 import threading
 import time
 
-import requests
+import numpy as np
 from flask import current_app
 from pymavlink import mavutil
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
 
 import src.library.telemetry
+from src.library.airdrop import CommandLatency, DropPredictor
 from src.library.arduinoconnector import ArduinoConnector
+from src.library.conflict import ConflictMonitor
+from src.library.executor import Arrival, RerouteExecutor
+from src.library.geofence import Geofence
 from src.library.location import Location
-from src.library.util import get_distance_metres, get_point_further_away, get_degrees_needed_to_turn
+from src.library.planner import VisibilityPlanner, obstacles_from_json
+from src.library.projection import LocalProjection
+from src.library.route import Route, check_points
+from src.library.setpoints import POSITION_ONLY, SetpointStreamer
+from src.library.spool import TelemetrySpool
+from src.library.uplink import GcomUplink
 from src.library.waypoints import Waypoints
 
 with open('config.json', 'r') as f:
@@ -19,6 +26,9 @@ with open('config.json', 'r') as f:
 
 GCOM_TELEMETRY_ENDPOINT = config["setup"]["GCOMEndpoint"]
 
+# seconds between checks of the distance to the airdrop target
+WINCH_POLL_INTERVAL = 0.1
+
 """
 Winch status
 0 - Disconnected
@@ -33,62 +43,33 @@ Winch status
 class Vehicle:
     def __init__(self):
         self.waypoints = None
-        self.reroute_thread = None
+        self.reroute_executor = None
+        self.route = None
+        self.reroute_obstacles = []
         self.mavlink_connection = None
         self.telemetry = None
+        self.uplink = None
         self.waypoint_loader = None
+        self.projection = None
+        self.planner = None
+        self.planner_projection = None
+        self.planner_lock = threading.Lock()
+        self.geofence = None
+        self.conflicts = None
+        self.avoiding = threading.Lock()
         self.connecting = False
         self.winch_enabled = config["winch"]["winchEnable"]
 
         # Rover status to make sure drop is completed before rtl
         self.winch_status = 0
+        # measured mode change latency, the loiter for the drop is sent this much early
+        self.mode_latency = CommandLatency(config["winch"]["commandLatency"])
+        # predicted and actual stop distance of each drop, see record_drop
+        self.drop_reports = []
 
-        # locks to prevent race conditions between post_to_gcom thread and winch_automation changing winch_status
+        # locks to prevent race conditions between the GCOM uplink and winch_automation changing winch_status
         self.lock = threading.Lock()
 
-    # Threaded: Continuously post telemetry data to GCOM-X
-    def post_to_gcom(self):
-        while True:
-            try:
-                location = vehicle.get_location()
-
-                http = requests.Session()
-                retry = Retry(total=3, backoff_factor=0.5)
-                adapter = HTTPAdapter(max_retries=retry)
-                http.mount('http://', adapter)
-
-                self.lock.acquire()
-                json_data = json.dumps({
-                    "latitude_dege7":  location["lat"]*10**7,
-                    "longitude_dege7": location["lng"]*10**7,
-                    "altitude_msl_m":  location["alt"],
-                    "heading_deg":     vehicle.get_heading(),
-                    "groundspeed_m_s": vehicle.get_speed(),
-                    # "chan3_raw":       vehicle.get_rc_channel(),
-                    "winch_status":    self.winch_status
-                })
-                self.lock.release()
-
-                gcom_telemetry_post = http.post(
-                    GCOM_TELEMETRY_ENDPOINT,
-                    headers={'content-type': 'application/json',
-                             'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X x.y; rv:42.0) Gecko/20100101 Firefox/42.0'},
-                    data=json_data,
-                    timeout=3
-                )
-
-                if gcom_telemetry_post.status_code == 200:
-                    print("[OK]       GCOM-X Telemetry  POST")
-                else:
-                    print("[FAIL]     GCOM-X Telemetry  POST: " +
-                          str(gcom_telemetry_post.status_code))
-
-            except Exception as e:
-                print(
-                    "[ERROR]    GCOM-X Telemetry  Exception encountered: " + str(e))
-
-            time.sleep(0.1)
-
     # Threaded: Gets the target winch drop-off and initiates drop automatically when the drone reaches that position
     def winch_automation(self):
         if self.winch_enabled:
@@ -96,11 +77,14 @@ class Vehicle:
             
             while arduino is None:
                 try:
-                    arduino = ArduinoConnector(self)
+                    arduino = ArduinoConnector(self, portCache=config["winch"]["portCache"],
+                                               wakeTime=config["winch"]["wakeTime"],
+                                               probeTimeout=config["winch"]["probeTimeout"],
+                                               readTimeout=config["winch"]["readTimeout"])
                     print("[ALERT]    Rover & Winch     Arduino initialized")
                     self.lock.acquire()
                     self.winch_status = 1
-                    self.lock.acquire()
+                    self.lock.release()
                 except Exception as ex:
                     print("[ERROR]    Rover & Winch    ", ex)
 
@@ -117,66 +101,134 @@ class Vehicle:
                 time.sleep(1)
             print("[ALERT]    Rover & Winch     Target position found!")
 
+            # the target is projected once, each position update is then planar maths
+            projection = self.local_projection(target.lat, target.lng)
+
             # Radius acceptable from target location, change in config.json file
             allowed_radius = config["winch"]["allowedRadius"]
+            predictor = DropPredictor(projection, target, allowed_radius,
+                                      config["winch"]["deceleration"], config["winch"]["historyWindow"])
 
             while True:
                 # See details in returning_home declaration above
-                # Only exit if the drop has not yet started
-                if self.winch_status == 1 or self.winch_status == 4:
+                # Only exit once the drop is complete, or was called off before it started
+                if self.winch_status == 4:
                     return
                 # If emergency reel status initiated then send command and change status
                 if self.winch_status == 5:
-                    arduino.sendCommandMessage("AIRDROPCANCEL1")
-                    self.lock.acquire()
-                    self.winch_status = 1
-                    self.lock.release()
-                # Get drone location
-                try:
-                    location = vehicle.get_location()
-                except:
-                    print("[ERROR]    Rover & Winch     Failed to get location")
+                    self.cancel_drop(arduino)
+                    return
                 try:
-                    # Compare current location to fetched drop location
-                    curr_loc = Location(
-                        location["lat"], location["lng"], location["alt"])
-                    dist = get_distance_metres(target, curr_loc)
+                    # Extrapolate the position history to predict when the loiter has to be
+                    # sent, leading the target by the command latency and braking distance
+                    estimate = predictor.estimate(self.telemetry.history, self.telemetry)
+                    if estimate is None:
+                        # no position yet
+                        time.sleep(WINCH_POLL_INTERVAL)
+                        continue
+                    position, velocity = estimate
+                    latency = self.mode_latency.estimate()
+                    plan = predictor.plan(position, velocity, latency)
                     print("[OK]       Rover & Winch     Distance from target: ", round(
-                        dist, 2), "m")
-                    # Initiate commands if within the target drop location radius
-                    if dist < allowed_radius:
+                        plan["distance"], 2), "m")
+                    # Initiate commands if the loiter is due before the next check
+                    if plan["fire_in"] is not None and plan["fire_in"] < WINCH_POLL_INTERVAL:
+                        time.sleep(plan["fire_in"])
                         # Loiter the drone
-                        vehicle.set_loiter()
+                        self.set_loiter()
                         print(
-                            "[ALERT]    Rover & Winch     In target distance; Loitering")
-
-                        # Send “AIRDROPBEGIN1” to the winch
-                        self.lock.acquire()
-                        self.winch_status = 1
-                        self.lock.release()
-
-                        arduino.sendCommandMessage("AIRDROPBEGIN1")
-                        print("[START]    Rover & Winch     Starting deployment")
-
-                        # Wait for winch to return “AIRDROPCOMPLETE”
-                        arduino.listenSuccessMessage()
-                        print("[FINISH]   Rover & Winch     Task completed")
-
-                        # Return to the mission in auto mode
-                        vehicle.set_auto()
-                        self.lock.acquire()
-                        self.winch_status = 4
-                        self.lock.release()
-
+                            "[ALERT]    Rover & Winch     Approaching target; Loitering")
+                        report = {
+                            "timestamp": time.time(),
+                            "distance": plan["distance"],
+                            "fire_in": plan["fire_in"],
+                            "speed": float(np.hypot(*velocity)),
+                            "latency": latency,
+                            "predicted": plan["predicted"],
+                        }
+                        # the drop starts once the aircraft has stopped, or is called off
+                        # by an emergency reel while it brakes
+                        self.record_drop(predictor, report)
+
+                        # the drop then follows the winch's events until it ends
+                        self.drop_payload(arduino)
                         return
                 except Exception as e:
                     print("[ERROR]    Rover & Winch     Function failure: ", e)
-                time.sleep(0.1)
+                time.sleep(WINCH_POLL_INTERVAL)
         else:
             print("[ALERT]    Rover & Winch     Winch disabled")
             return
 
 
+    def drop_payload(self, arduino):
+        """
+        starts the drop and follows it through the winch's events without blocking on the
+        serial port, so an emergency reel (winch_status 5) reaches the winch within one read
+        cycle. Returns True once the winch completed the drop
+
+        Args:
+            arduino (ArduinoConnector): connected winch
+        """
+        self.lock.acquire()
+        reel = self.winch_status == 5
+        if not reel:
+            self.winch_status = 2
+        self.lock.release()
+        if reel:
+            # reeled in before the drop started
+            return self.cancel_drop(arduino)
+
+        # Send “AIRDROPBEGIN1” to the winch, done once it returns “AIRDROPCOMPLETE”
+        drop = arduino.sendCommandMessage("AIRDROPBEGIN1", acks=("AIRDROPCOMPLETE",),
+                                          timeout=config["winch"]["dropTimeout"])
+        print("[START]    Rover & Winch     Starting deployment")
+
+        while True:
+            if self.winch_status == 5:
+                return self.cancel_drop(arduino)
+
+            event = arduino.nextEvent(config["winch"]["readTimeout"])
+            if event is None:
+                continue
+            if event.type == "complete":
+                print("[FINISH]   Rover & Winch     Task completed")
+                # Return to the mission in auto mode
+                self.set_auto()
+                self.lock.acquire()
+                self.winch_status = 4
+                self.lock.release()
+                return True
+            if event.type == "error":
+                print("[ALERT]    Rover & Winch     Drop failed; retrying")
+            elif event.type == "disconnected" or event.type == "timeout" and event.command is drop:
+                # stays loitering over the target for the operator
+                print("[ERROR]    Rover & Winch     Drop failed:", event.type, event.line)
+                self.lock.acquire()
+                self.winch_status = 3
+                self.lock.release()
+                return False
+
+    def cancel_drop(self, arduino):
+        """sends the emergency reel to the winch and returns to standby. Returns False, the drop did not complete"""
+        arduino.sendCommandMessage("AIRDROPCANCEL1")
+        print("[ALERT]    Rover & Winch     Drop cancelled; reeling in")
+        self.lock.acquire()
+        self.winch_status = 1
+        self.lock.release()
+        return False
+
+    def record_drop(self, predictor, report):
+        """
+        waits for the aircraft to stop after the loiter, or an emergency reel, and records
+        how far from the target it was
+        """
+        report["actual"] = predictor.stop_distance(self.telemetry, cancelled=lambda: self.winch_status == 5)
+        self.drop_reports.append(report)
+        if report["actual"] is not None:
+            print("[OK]       Rover & Winch     Stopped %.2f m from target, predicted %.2f m" % (
+                report["actual"], report["predicted"]))
+
     def setup_mavlink_connection(self, connection, address, port=None, baud=57600):
         if self.mavlink_connection is None or self.mavlink_connection.target_system < 1 and not self.connecting:
             self.connecting = True
@@ -201,11 +253,16 @@ class Vehicle:
 
             # connection established, vehicle initialized
             # begin eternally posting telemetry to GCOM
-            # via an eternal thread
+            # samples that cannot be posted are kept on disk and sent once GCOM is back
+            spool_config = config["uplink"]["spool"]
+            spool = TelemetrySpool(spool_config["directory"],
+                                   spool_config["segmentBytes"], spool_config["maxBytes"])
+            self.uplink = GcomUplink(self, GCOM_TELEMETRY_ENDPOINT,
+                                     config["uplink"]["rate"], config["uplink"]["maxInFlight"],
+                                     spool=spool, batch_size=spool_config["batchSize"])
+            self.uplink.start()
+
             with current_app.app_context():
-                post_to_gcom_thread = threading.Thread(
-                    target=self.post_to_gcom, daemon=True)
-                post_to_gcom_thread.start()
                 winch_automation_thread = threading.Thread(
                     target=self.winch_automation, daemon=True)
                 winch_automation_thread.start()
@@ -227,15 +284,19 @@ class Vehicle:
         self.mavlink_connection.arducopter_disarm()
 
     def set_guided(self):
+        self.mode_latency.sent('GUIDED')
         self.mavlink_connection.set_mode('GUIDED')
 
     def set_auto(self):
+        self.mode_latency.sent('AUTO')
         self.mavlink_connection.set_mode('AUTO')
 
     def set_rtl(self):
+        self.mode_latency.sent('RTL')
         vehicle.mavlink_connection.set_mode('RTL')
 
     def set_loiter(self):
+        self.mode_latency.sent('LOITER')
         vehicle.mavlink_connection.set_mode('LOITER')
 
     def set_pos_hold(self):
@@ -256,27 +317,252 @@ class Vehicle:
             0,
         )
 
-    def reroute(self, points):
-        self.reroute_thread = threading.Thread(
-            target=self.start_reroute, args=[points], daemon=True)
-        self.reroute_thread.start()
+    def local_projection(self, lat, lng):
+        """
+        Returns the tangent plane projection to use for geometry around lat, lng. It is
+        anchored at the mission's home position when that is close enough, otherwise at
+        lat, lng, and replaced when a position outside its accurate radius is requested
+
+        Args:
+            lat, lng (number): position the projection is needed around, degrees
+        """
+        projection = self.projection
+        if projection is not None and projection.contains(lat, lng):
+            return projection
+
+        max_error = config["projection"]["maxError"]
+        home = self.waypoints.mission.home() if self.waypoints is not None else None
+        projection = None
+        if home is not None and (home.x != 0 or home.y != 0):
+            projection = LocalProjection(home.x * 1.0e-7, home.y * 1.0e-7, home.z, max_error=max_error)
+        if projection is None or not projection.contains(lat, lng):
+            projection = LocalProjection(lat, lng, max_error=max_error)
+        self.projection = projection
+        return projection
+
+    def plan_reroute(self, points, obstacles):
+        """
+        Returns one leg per reroute point, its detours around the obstacles then the point,
+        planned from the current position. Detour points take the altitude of the point
+        they lead to. The planner is kept between calls and repaired for the obstacles
+        that moved. Raises an Exception if a point is inside an obstacle or cannot be reached
+
+        Args:
+            points (list): reroute points, {"lat", "lng", "alt"}
+            obstacles (list): no-fly obstacles, see planner.obstacles_from_json
+        """
+        location = self.get_location()
+        with self.planner_lock:
+            projection = self.local_projection(location["lat"], location["lng"])
+            planned = obstacles_from_json(projection, obstacles)
+            if self.planner is None or self.planner_projection is not projection:
+                self.planner = VisibilityPlanner(planned, config["planner"]["margin"],
+                                                 config["planner"]["circleSides"])
+                self.planner_projection = projection
+            else:
+                self.planner.update(planned)
+
+            start = projection.point(location["lat"], location["lng"])
+            goals = [projection.point(point["lat"], point["lng"]) for point in points]
+            legs = self.planner.plan_route((start.east, start.north), [(goal.east, goal.north) for goal in goals])
+
+        route = []
+        for point, leg in zip(points, legs):
+            detours = [projection.from_enu(east, north) for east, north in leg[:-1]]
+            route.append([{"lat": d.lat, "lng": d.lng, "alt": point["alt"]} for d in detours] + [point])
+        return route
+
+    def reroute(self, points, obstacles=None, arrival=None):
+        """
+        Flies to the points in guided mode, then returns to auto. With obstacles, detours
+        around them are planned first, and replan_reroute can update them on the way.
+        Moving obstacle tracks predicted to conflict are avoided too, see set_tracks.
+        A reroute in progress is replaced
+
+        Args:
+            points (list): reroute points, {"lat", "lng", "alt"}
+            obstacles (list, optional): no-fly obstacles, see planner.obstacles_from_json
+            arrival (dict, optional): when a point counts as reached, {"radius", "passPlane",
+                "timeBudget"}, each defaulting to the reroute arrival in config.json. When
+                setpoints are streamed, see reroute streaming in config.json, passPlane
+                defaults to true as the aircraft cuts the corners at the points
+        """
+        # checked before anything is planned or sent to the vehicle
+        check_points(points)
+        planned = (obstacles or []) + self.conflict_obstacles()
+        legs = self.plan_reroute(points, planned) if planned else [[point] for point in points]
+        self.check_reroute(legs)
+        self.reroute_obstacles = obstacles or []
+        self.route = Route(points, legs)
+
+        if self.reroute_executor is not None:
+            self.reroute_executor.cancel()
+        streaming = config["reroute"]["streaming"]
+        streamer = SetpointStreamer(self, streaming["rate"], streaming["lookahead"]) if streaming["enabled"] else None
+        defaults = {**config["reroute"]["arrival"], **({"passPlane": True} if streamer else {})}
+        self.reroute_executor = RerouteExecutor(
+            self, self.route, Arrival.from_json({**defaults, **(arrival or {})}), streamer)
+        self.reroute_executor.start()
+
+    def replan_reroute(self, obstacles):
+        """
+        Plans the active reroute's remaining points around updated obstacles and hands the
+        new detours to the reroute thread, which keeps flying in guided mode. Returns the
+        remaining route. Raises an Exception if there is no active reroute or no path
+
+        Args:
+            obstacles (list): no-fly obstacles, see planner.obstacles_from_json
+        """
+        route = self.route
+        if route is None or route.finished():
+            raise Exception("No reroute in progress")
+        self.reroute_obstacles = obstacles
+        goals, version = route.remaining_goals()
+        legs = self.plan_reroute(goals, obstacles + self.conflict_obstacles())
+        self.check_reroute(legs)
+        route.replace(legs, version)
+        self.reroute_executor.refresh()
+        return [point for leg in legs for point in leg]
+
+    def set_tracks(self, tracks):
+        """
+        Replaces the moving obstacle tracks, which are predicted against our own track on
+        every position update. Returns their predictions, see predict_conflicts
+
+        Args:
+            tracks (list): {"id", "lat", "lng", "alt", "vx", "vy", "vz"}, see ConflictMonitor.set_tracks
+        """
+        location = self.get_location()
+        projection = self.local_projection(location["lat"], location["lng"])
+        monitor = self.conflicts
+        if monitor is None or monitor.projection is not projection:
+            monitor = ConflictMonitor(projection, config["conflict"]["separation"], config["conflict"]["horizon"])
+            monitor.on_conflict(self.avoid_conflicts)
+        monitor.set_tracks(tracks)
+        self.conflicts = monitor
+        return self.predict_conflicts()
+
+    def own_track(self):
+        """our position and velocity from the latest telemetry, without waiting, or None before both arrived"""
+        telemetry = self.telemetry
+        if telemetry.lat is None or telemetry.alt is None or telemetry.vx is None:
+            return None
+        return telemetry.lat, telemetry.lng, telemetry.alt, (telemetry.vx, telemetry.vy, telemetry.vz)
+
+    def predict_conflicts(self):
+        """returns the closest approach of every track to our own, see ConflictMonitor.predict"""
+        monitor = self.conflicts
+        if monitor is None:
+            return []
+        track = self.own_track()
+        if track is None:
+            raise Exception("No position and velocity received yet")
+        return monitor.predict(*track)
+
+    # Called by the telemetry thread on every GLOBAL_POSITION_INT while there are tracks
+    def check_conflicts(self):
+        monitor, track = self.conflicts, self.own_track()
+        if monitor is not None and track is not None:
+            monitor.check(*track)
+
+    def avoid_conflicts(self, conflicts):
+        """
+        Conflict handler: replans the active reroute around the conflicting tracks. The
+        replan runs on its own thread so the telemetry thread is not held up, and a
+        conflict arriving during one is covered by the next
+        """
+        if not config["conflict"]["autoReroute"]:
+            return
+        route = self.route
+        if route is None or route.finished() or not self.avoiding.acquire(blocking=False):
+            return
+        threading.Thread(target=self.replan_around_conflicts, daemon=True).start()
+
+    def replan_around_conflicts(self):
+        try:
+            self.replan_reroute(self.reroute_obstacles)
+        except Exception as e:
+            print("Could not reroute around the conflicting tracks: " + str(e))
+        finally:
+            self.avoiding.release()
+
+    def conflict_obstacles(self):
+        """
+        circle obstacles, one separation wide, where the conflicting tracks will be at
+        their closest approach. Those we are already within are left out, as no detour
+        can start inside an obstacle
+        """
+        monitor = self.conflicts
+        if monitor is None or not monitor.last or self.telemetry.lat is None:
+            return []
+        projection = monitor.projection
+        here = projection.point(self.telemetry.lat, self.telemetry.lng)
+        obstacles = []
+        for conflict in monitor.last:
+            there = projection.point(conflict["lat"], conflict["lng"])
+            if projection.distance(here, there) > monitor.separation:
+                obstacles.append({"type": "circle", "lat": conflict["lat"], "lng": conflict["lng"],
+                                  "radius": monitor.separation})
+        return obstacles
+
+    def set_geofence(self, geofence):
+        """
+        Replaces the geofence mission uploads and reroutes are checked against, or removes
+        it when there is neither a fence nor obstacles
+
+        Args:
+            geofence (dict): {"fence": [{"lat", "lng"}, ...], "obstacles": [...]}, see Geofence
+        """
+        points = (geofence.get("fence") or []) + [
+            obstacle["points"][0] if obstacle.get("type") == "polygon" else obstacle
+            for obstacle in geofence.get("obstacles") or []]
+        if not points:
+            self.geofence = None
+            return
+        projection = self.local_projection(points[0]["lat"], points[0]["lng"])
+        self.geofence = Geofence(projection, geofence, config["geofence"]["cellSize"])
+
+    def check_reroute(self, legs):
+        """raises a GeofenceViolation if the legs of a reroute leave the geofence or enter an obstacle"""
+        geofence = self.geofence
+        if geofence is None:
+            return
+        points, names = [], []
+        for index, leg in enumerate(legs):
+            points += leg
+            names += ["detour %d to point %d" % (i, index) for i in range(len(leg) - 1)] + ["point %d" % index]
+        location = self.get_location()
+        geofence.check(points, names, {"lat": location["lat"], "lng": location["lng"], "name": "the current position"})
 
     def stop_reroute(self):
-        self.reroute_thread.kill()
+        """cancels the reroute in progress and resumes the mission in auto mode"""
+        executor = self.reroute_executor
+        if executor is None or not executor.cancel():
+            raise Exception("No reroute in progress")
+        self.set_auto()
 
+    def reroute_status(self):
+        """progress of the last reroute, see RerouteExecutor.status"""
+        executor = self.reroute_executor
+        if executor is None:
+            return {"state": "idle"}
+        return executor.status()
+
+    # The getters below return cached telemetry when it is fresher than the telemetry
+    # maxAge in config.json, and only block on the link when it is stale
     def get_location(self):
-        self.telemetry.wait('GPS_RAW_INT')
-        self.telemetry.wait('GLOBAL_POSITION_INT')
+        self.telemetry.latest('GPS_RAW_INT')
+        self.telemetry.latest('GLOBAL_POSITION_INT')
         return Location(self.telemetry.lat,
                         self.telemetry.lng,
                         self.telemetry.alt).__dict__
 
     def get_speed(self):
-        self.telemetry.wait('VFR_HUD')
+        self.telemetry.latest('VFR_HUD')
         return self.telemetry.groundspeed
 
     def get_heading(self):
-        self.telemetry.wait('GLOBAL_POSITION_INT')
+        self.telemetry.latest('GLOBAL_POSITION_INT')
         return self.telemetry.heading
 
     # def get_rc_channel(self):
@@ -298,60 +584,16 @@ class Vehicle:
                                                       alt
                                                       )
 
-    def start_reroute(self, points):
-        self.set_guided()
-        for index, point in enumerate(points):
-            # if a new reroute task has been started, exit this one
-            if threading.get_ident() != self.reroute_thread.ident:
-                print("Reroute task cancelled")
-                return
-
-            lat = point["lat"]
-            lng = point["lng"]
-            alt = point["alt"]
-
-            gps_data = self.get_location()
-            current_location = Location(
-                gps_data['lat'], gps_data['lng'], gps_data['alt'])
-
-            target_location = Location(lat, lng, alt)
-            sharp_turn = get_degrees_needed_to_turn(
-                self.get_heading(), current_location, target_location) > 80
-
-            overShootLocation = get_point_further_away(
-                current_location, target_location, 40)
-            overshoot_lat = overShootLocation.lat
-            overshoot_lng = overShootLocation.lng
-            overshoot_alt = overShootLocation.alt
-
-            print("Rerouting to : " + str(target_location))
-
-            # if the current point is the last point or a sharpturn, fly to that location, otherwise overshoot
-            # if index == len(points) - 1 or sharp_turn:
-            #     self.fly_to(target_location.lat, target_location.lng, target_location.alt)
-            # else:
-            #     self.fly_to(overshoot_lat, overshoot_lng, overshoot_alt)
-
-            self.fly_to(target_location.lat,
-                        target_location.lng, target_location.alt)
-
-            while True:  # !!! TO-DO Change True to while vehicle is in guided mode
-                # if a new reroute task has been started, exit this one
-                if threading.get_ident() != self.reroute_thread.ident:
-                    print("Reroute task cancelled")
-                    return
-
-                self.telemetry.wait('GPS_RAW_INT')
-                current_location = Location(
-                    self.telemetry.lat, self.telemetry.lng, self.telemetry.alt)
-
-                remainingDistance = get_distance_metres(
-                    current_location, target_location)
-                print("Distance to target: " + str(remainingDistance))
-                if remainingDistance <= 1:  # Just below target, in case of undershoot.
-                    print("Reached waypoint")
-                    break
-        self.set_auto()
+    def send_setpoint(self, lat, lng, alt):
+        """sends a guided position target, alt relative to home"""
+        connection = self.mavlink_connection
+        connection.mav.set_position_target_global_int_send(0, connection.target_system, connection.target_component,
+                                                           mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT_INT,
+                                                           POSITION_ONLY,
+                                                           int(lat * 1.0e7),
+                                                           int(lng * 1.0e7),
+                                                           alt,
+                                                           0, 0, 0, 0, 0, 0, 0, 0)
 
 
 vehicle = Vehicle()
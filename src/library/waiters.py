@@ -0,0 +1,90 @@
+import threading
+from concurrent.futures import Future
+
+
+class MessageWaiters:
+    def __init__(self):
+        """
+        Registry of callers blocked on the next message of a given type. Waiters are
+        resolved directly from the telemetry dispatch, so a blocked thread wakes up as
+        soon as the message is received instead of on its next polling tick.
+        """
+        self.lock = threading.Lock()
+        self.waiters = {}  # msg_type -> list of (predicate, future)
+
+    def register(self, msg_type, predicate=None):
+        """
+        registers interest in the next msg_type message and returns a future that is
+        resolved with it
+
+        Args:
+            msg_type (string): mavlink message
+            predicate (function, optional): messages it returns False for are skipped
+        """
+        future = Future()
+        with self.lock:
+            self.waiters.setdefault(msg_type, []).append((predicate, future))
+        return future
+
+    def unregister(self, msg_type, future):
+        """
+        removes a pending future. returns False if it has already been resolved
+        """
+        with self.lock:
+            waiters = self.waiters.get(msg_type)
+            if waiters is None:
+                return False
+            remaining = [waiter for waiter in waiters if waiter[1] is not future]
+            if len(remaining) == len(waiters):
+                return False
+            if remaining:
+                self.waiters[msg_type] = remaining
+            else:
+                del self.waiters[msg_type]
+            return True
+
+    def wait(self, msg_type, timeout=None, predicate=None):
+        """
+        blocks until the next msg_type message is received, and returns it. if timeout
+        is specified and is reached, returns None
+
+        Args:
+            msg_type (string): mavlink message
+            timeout (number, optional): timeout in seconds. Defaults to None.
+            predicate (function, optional): messages it returns False for are skipped
+        """
+        future = self.register(msg_type, predicate)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            if self.unregister(msg_type, future):
+                return None
+            # resolved between the timeout and the unregister
+            return future.result()
+
+    def notify(self, msg_type, msg):
+        """
+        resolves every waiter for msg_type whose predicate accepts msg. called from the
+        telemetry polling thread for each received message
+        """
+        if msg_type not in self.waiters:
+            return
+
+        with self.lock:
+            waiters = self.waiters.pop(msg_type, None)
+            if not waiters:
+                return
+            resolved = []
+            remaining = []
+            for predicate, future in waiters:
+                if predicate is None or predicate(msg):
+                    resolved.append(future)
+                else:
+                    remaining.append((predicate, future))
+            if remaining:
+                self.waiters[msg_type] = remaining
+
+        for future in resolved:
+            # futures awaited from asyncio may have been cancelled by a timeout
+            if future.set_running_or_notify_cancel():
+                future.set_result(msg)
@@ -1,4 +1,8 @@
+from threading import Lock
+
 from pymavlink import mavwp, mavutil
+from src.library.mission_cache import MissionCache
+from src.library.mission_transfer import MissionDownload, MissionPartialUpload, MissionUpload, changed_ranges
 from src.library.util import parseJson
 
 
@@ -19,71 +23,71 @@ class Waypoints:
 
         self.airdrop = {"lat": 0, "lng": 0, "alt": 0}
 
-    def download_mission_wps(self):
-        """Downloads the current mission waypoints"""
-        self.mavlink_connection.waypoint_request_list_send()
+        # copy of the vehicle's mission, kept up to date by the telemetry link
+        self.mission = MissionCache(self.mavlink_connection)
+        self.mission.attach(vehicle.telemetry.dispatcher)
+        self.transfer_lock = Lock()  # one mission transfer at a time
 
-        count = None
-        stored = None
-        wps = []
+    def download_mission_wps(self, refresh=False):
+        """Returns the current mission waypoints"""
+        return self.get_mission(refresh)[1]
+
+    def get_mission(self, refresh=False):
+        """
+        Returns the ETag and the waypoints of the vehicle's mission. The cached copy is
+        used unless it has been invalidated or refresh is set, in which case the mission
+        is downloaded. The ETag is None if the mission changed during the download
+
+        Args:
+            refresh (bool, optional): download the mission even if a copy is cached
+        """
+        if not refresh:
+            etag, items = self.mission.snapshot()
+            if items is not None:
+                return etag, self.mission_to_json(items)
+
+        with self.transfer_lock:
+            if not refresh:
+                # another request may have downloaded it while we waited
+                etag, items = self.mission.snapshot()
+                if items is not None:
+                    return etag, self.mission_to_json(items)
+            generation = self.mission.begin_transfer()
+            try:
+                items = MissionDownload(self.vehicle.telemetry).run()
+                etag = self.mission.store(items, generation)
+            finally:
+                self.mission.end_transfer()
+        return etag, self.mission_to_json(items)
+
+    def mission_to_json(self, items):
+        """Converts MISSION_ITEM_INT messages to the mission format of the api"""
         homePos = None
         takeoffAlt = None
         rtl = False
+        wps = []
 
-        airdrop = self.airdrop
-
-        while True:
-            if count is None:
-                try:
-                    count = self.vehicle.telemetry.wait(
-                        "MISSION_COUNT", timeout=5
-                    ).count
-                except:
-                    count = None
-                    continue
-                # print('Waypoint list request recieved waypoints', count)
-
-                if count == 0:
-                    # print('Waypoint request transaction complete, 0 waypoints found')
-                    break
-                self.mavlink_connection.waypoint_request_send(0)
-
-            next_wp = self.vehicle.telemetry.wait("MISSION_ITEM", timeout=5)
-            if next_wp is not None:
-                # home position wp
-                if (
-                        next_wp.command == mavutil.mavlink.MAV_CMD_NAV_WAYPOINT
-                        and next_wp.seq == 0
-                ):
-                    homePos = {"lat": next_wp.x,
-                               "lng": next_wp.y, "alt": next_wp.z}
-
-                # take off wp
-                elif next_wp.command == mavutil.mavlink.MAV_CMD_NAV_TAKEOFF:
-                    takeoffAlt = next_wp.z
-
-                # mission wps
-                elif next_wp.command == mavutil.mavlink.MAV_CMD_NAV_RETURN_TO_LAUNCH:
-                    rtl = True
-                else:
-                    wp_json = {"lat": next_wp.x,
-                               "lng": next_wp.y, "alt": next_wp.z}
-                    wps.append(wp_json)
-
-            if stored is None or (next_wp and stored.seq != next_wp.seq):
-                stored = next_wp
-
-            count -= 1
-            if count == 0:
-                # print('Waypoint request transaction complete')
-                break
-            # print('getting next waypoint: ', next_wp.seq + 1)
-            self.mavlink_connection.waypoint_request_send(next_wp.seq + 1)
-
-        return {"homePos": homePos, "rtl": rtl, "takeoffAlt": takeoffAlt, "airdrop": airdrop, "wps": wps}
+        for item in items:
+            lat = item.x * 1.0e-7
+            lng = item.y * 1.0e-7
+            # home position wp
+            if item.command == mavutil.mavlink.MAV_CMD_NAV_WAYPOINT and item.seq == 0:
+                homePos = {"lat": lat, "lng": lng, "alt": item.z}
 
-    def upload_mission_wps(self, waypoints, takeoffAlt, rtl):
-        """Uploads the mission waypoints to the flight controller"""
+            # take off wp
+            elif item.command == mavutil.mavlink.MAV_CMD_NAV_TAKEOFF:
+                takeoffAlt = item.z
+
+            # mission wps
+            elif item.command == mavutil.mavlink.MAV_CMD_NAV_RETURN_TO_LAUNCH:
+                rtl = True
+            else:
+                wps.append({"lat": lat, "lng": lng, "alt": item.z})
+
+        return {"homePos": homePos, "rtl": rtl, "takeoffAlt": takeoffAlt, "airdrop": self.airdrop, "wps": wps}
+
+    def build_mission(self, waypoints, takeoffAlt, rtl):
+        """Returns the mission items for the waypoints and the number of mission wps in them"""
         frame = mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT
         seqNum = 0
         self.waypoint_loader.clear()
@@ -156,29 +160,84 @@ class Waypoints:
         if rtl:
             num_wps_loaded -= 1
 
-        # clear the current wps in the send queue and loads the new set
-        self.mavlink_connection.waypoint_clear_all_send()
-        self.mavlink_connection.waypoint_count_send(
-            self.waypoint_loader.count())
+        items = [self.waypoint_loader.wp(i) for i in range(self.waypoint_loader.count())]
+        return items, num_wps_loaded
+
+    def check_geofence(self, waypoints, rtl):
+        """raises a GeofenceViolation if the mission leaves the vehicle's geofence or enters an obstacle"""
+        geofence = self.vehicle.geofence
+        if geofence is None:
+            return
+        points = list(waypoints)
+        names = ["waypoint %d" % i for i in range(len(waypoints))]
+        start = None
+        home = self.mission.home()
+        if home is not None and (home.x != 0 or home.y != 0):
+            start = {"lat": home.x * 1.0e-7, "lng": home.y * 1.0e-7, "name": "home"}
+            if rtl:
+                points.append(start)
+                names.append("home")
+        geofence.check(points, names, start)
 
-        # send wps 1 by 1
-        for i in range(self.waypoint_loader.count()):
-            msg = self.vehicle.telemetry.wait("MISSION_REQUEST", timeout=5)
-            self.mavlink_connection.mav.send(self.waypoint_loader.wp(msg.seq))
-            # print('Sending waypoint %d', msg.seq)
+    def upload_mission_wps(self, waypoints, takeoffAlt, rtl):
+        """Uploads the mission waypoints to the flight controller"""
+        self.check_geofence(waypoints, rtl)
+        items, num_wps_loaded = self.build_mission(waypoints, takeoffAlt, rtl)
 
-        # get wp count received
-        self.mavlink_connection.waypoint_request_list_send()
-        count = int(self.vehicle.telemetry.wait(
-            "MISSION_COUNT", timeout=5).count)
+        # send the new set; it replaces the current mission once the autopilot acks it
+        with self.transfer_lock:
+            self.upload(items, self.mission.home())
+        return num_wps_loaded
 
-        if count == self.waypoint_loader.count():
-            return num_wps_loaded
-        else:
-            raise Exception("Waypoints failed to upload.")
+    def patch_mission_wps(self, waypoints, takeoffAlt, rtl):
+        """
+        Updates the flight controller's mission to the waypoints, uploading only the items
+        that differ from the current mission. Falls back to a full upload if the number of
+        items changes. Returns the number of mission wps and the number of items sent
+        """
+        self.check_geofence(waypoints, rtl)
+        items, num_wps_loaded = self.build_mission(waypoints, takeoffAlt, rtl)
+        # compare against the vehicle's mission, downloading it if it is not cached
+        self.get_mission()
+
+        with self.transfer_lock:
+            current = self.mission.snapshot()[1]
+            if current is None or len(current) != len(items):
+                self.upload(items, current[0] if current else None)
+                return num_wps_loaded, len(items)
+
+            ranges = changed_ranges(current, items)
+            generation = self.mission.begin_transfer()
+            try:
+                for start, end in ranges:
+                    MissionPartialUpload(self.vehicle.telemetry, items[start:end + 1]).run()
+                self.mission.store([current[0]] + items[1:], generation)
+            except Exception:
+                self.mission.invalidate("partial upload failed")
+                raise
+            finally:
+                self.mission.end_transfer()
+        return num_wps_loaded, sum(end - start + 1 for start, end in ranges)
+
+    def upload(self, items, home):
+        """uploads a whole mission and caches it. called with the transfer lock held"""
+        generation = self.mission.begin_transfer()
+        try:
+            MissionUpload(self.vehicle.telemetry, items).run()
+            # the autopilot keeps its own home in item 0, the stub is not stored
+            if home is not None:
+                self.mission.store([home] + items[1:], generation)
+            else:
+                self.mission.invalidate("home position unknown")
+        except Exception:
+            # a failed upload may have changed part of the mission
+            self.mission.invalidate("upload failed")
+            raise
+        finally:
+            self.mission.end_transfer()
 
     def generate_mission_item(self, seqNum, frame, wpType, hold, radius, lat, lng, alt):
-        return mavutil.mavlink.MAVLink_mission_item_message(
+        return mavutil.mavlink.MAVLink_mission_item_int_message(
             self.mavlink_connection.target_system,
             self.mavlink_connection.target_component,
             seqNum,
@@ -190,7 +249,7 @@ class Waypoints:
             radius,  # acceptance radius
             0,  # pass radius
             0,  # yaw
-            lat,
-            lng,
+            int(round(lat * 1.0e7)),
+            int(round(lng * 1.0e7)),
             alt,
         )
@@ -0,0 +1,152 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import serial
+
+# lines the winch Arduino sends and the event type each becomes, any other line
+# arrives as an "unknown" event
+EVENT_TYPES = {
+    "uas": "handshake",
+    "AIRDROPCOMPLETE": "complete",
+    "AIRDROPERROR": "error",
+}
+
+# type: one of EVENT_TYPES, "unknown", "timeout" when a command's deadline passed without
+# an acknowledgement, or "disconnected" when the port failed. command: the command the
+# line acknowledged or that timed out, otherwise None
+WinchEvent = namedtuple("WinchEvent", ["type", "line", "timestamp", "command"])
+
+
+class WinchCommand:
+    def __init__(self, message, acks, deadline):
+        """
+        A command sent to the winch, pending until one of its acknowledgement lines
+        arrives or its deadline passes
+
+        Args:
+            message (string): line sent
+            acks (tuple): lines that acknowledge the command
+            deadline (number): monotonic time by which an acknowledgement is expected, or None
+        """
+        self.message = message
+        self.acks = acks
+        self.deadline = deadline
+        self.state = "pending" if acks else "sent"
+        self.reply = None
+        self.done = threading.Event()
+        if not acks:
+            self.done.set()
+
+    def complete(self, state, reply=None):
+        self.state = state
+        self.reply = reply
+        self.done.set()
+
+    def wait(self, timeout=None):
+        """waits for the acknowledgement, returns True if the command was acknowledged"""
+        self.done.wait(timeout)
+        return self.state == "acknowledged"
+
+
+class WinchLink:
+    def __init__(self, port, read_timeout=0.1, clock=time.monotonic):
+        """
+        Line framed link to the winch Arduino. A background reader frames the incoming
+        bytes into lines and queues them as WinchEvents, while commands are written
+        straight away from the caller's thread, so a cancel never waits behind a read
+
+        Args:
+            port (Serial): open serial port
+            read_timeout (number, optional): seconds each read waits for data, and so the
+                longest a command deadline can be overrun by
+            clock (function, optional): monotonic time source
+        """
+        self.port = port
+        self.port.timeout = read_timeout
+        self.read_timeout = read_timeout
+        self.clock = clock
+        self.events = queue.Queue()
+        self.pending = []
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.buffer = b""
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="winch-link", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.port.close()
+
+    def send(self, message, acks=(), timeout=None):
+        """
+        writes a command to the winch without waiting for a reply, and returns its
+        WinchCommand. With acks the command stays pending until one of those lines is
+        read, or a "timeout" event is queued once timeout seconds have passed
+
+        Args:
+            message (string): line to send
+            acks (tuple, optional): lines that acknowledge the command
+            timeout (number, optional): seconds to wait for an acknowledgement, forever if None
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        command = WinchCommand(message, tuple(acks), deadline)
+        if command.acks:
+            with self.lock:
+                self.pending.append(command)
+        with self.write_lock:
+            self.port.write(bytes(message, 'utf-8'))
+        return command
+
+    def next_event(self, timeout=None):
+        """returns the next WinchEvent, or None if none arrived within timeout seconds"""
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                data = self.port.read(max(self.port.in_waiting, 1))
+            except (OSError, serial.SerialException) as e:
+                if not self.stopped.is_set():
+                    self.events.put(WinchEvent("disconnected", str(e), self.clock(), None))
+                return
+            for line in self.frame(data):
+                self.handle_line(line)
+            self.expire()
+
+    def frame(self, data):
+        """returns the complete lines in the bytes read so far, keeping a partial line for the next read"""
+        self.buffer += data
+        *lines, self.buffer = self.buffer.split(b"\n")
+        return [line.decode('utf-8', errors='ignore').strip() for line in lines if line.strip()]
+
+    def handle_line(self, line):
+        command = None
+        with self.lock:
+            for pending in self.pending:
+                if line in pending.acks:
+                    command = pending
+                    self.pending.remove(pending)
+                    break
+        if command is not None:
+            command.complete("acknowledged", line)
+        self.events.put(WinchEvent(EVENT_TYPES.get(line, "unknown"), line, self.clock(), command))
+
+    def expire(self):
+        now = self.clock()
+        with self.lock:
+            expired = [command for command in self.pending if command.deadline is not None and now >= command.deadline]
+            self.pending = [command for command in self.pending if command not in expired]
+        for command in expired:
+            command.complete("expired")
+            self.events.put(WinchEvent("timeout", command.message, now, command))
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify, abort, Response, current_app
 from pymavlink import mavutil, mavwp
+from src.library.geofence import GeofenceViolation
+from src.library.stream import CHANNELS
 from src.library.util import parseRequest, parseJson
 import json
 import logging
@@ -50,13 +52,56 @@ def aircraft_connect():
 
 # Receives an array of waypoints
 # Interrupts aircraft auto mode, switches to guided, runs waypoints, then returns to auto
+# With "obstacles", detours around them are planned first, see Vehicle.reroute
+# With "arrival", {"radius", "passPlane", "timeBudget"}, points are reached as it says
 @aircraft.route("/reroute", methods=["POST"])
 @connection_required
 def aircraft_reroute():
     json = request.json
     points = json["waypoints"]
-    vehicle.reroute(points)
-    return aircraft_gps()
+    kwargs = {"arrival": json["arrival"]} if json.get("arrival") else {}
+    try:
+        if json.get("obstacles"):
+            vehicle.reroute(points, json["obstacles"], **kwargs)
+        else:
+            vehicle.reroute(points, **kwargs)
+    except GeofenceViolation as e:
+        return geofence_error(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(vehicle.telemetry.get_location()), 200
+
+
+# Progress of the reroute: state, leg, target, distance and remaining metres, ETA in seconds
+@aircraft.route("/reroute", methods=["GET"])
+@connection_required
+def aircraft_reroute_status():
+    return jsonify(vehicle.reroute_status()), 200
+
+
+# Cancels the reroute in progress and resumes the mission in auto mode
+@aircraft.route("/reroute", methods=["DELETE"])
+@connection_required
+def aircraft_reroute_cancel():
+    try:
+        vehicle.stop_reroute()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(vehicle.reroute_status()), 200
+
+
+# Replans the active reroute around updated obstacles, e.g. moving ones, while it is flown.
+# Returns the remaining waypoints, detours included
+@aircraft.route("/reroute/obstacles", methods=["PUT"])
+@connection_required
+def aircraft_reroute_obstacles():
+    try:
+        points = vehicle.replan_reroute(request.json["obstacles"])
+    except GeofenceViolation as e:
+        return geofence_error(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"waypoints": points}), 200
 
 
 # Arms the aircraft
@@ -64,7 +109,7 @@ def aircraft_reroute():
 @connection_required
 def aircraft_arm():
     vehicle.arm()
-    return aircraft_heartbeat()[0], 201
+    return fresh_heartbeat()[0], 201
 
 
 # Disarms the aircraft
@@ -72,7 +117,7 @@ def aircraft_arm():
 @connection_required
 def aircraft_disarm():
     vehicle.disarm()
-    return aircraft_heartbeat()[0], 201
+    return fresh_heartbeat()[0], 201
 
 
 # Returns status of the aircraft
@@ -87,7 +132,7 @@ def aircraft_isarmed():
 @connection_required
 def aircraft_rtl():
     vehicle.mavlink_connection.set_mode_rtl()
-    return aircraft_heartbeat()
+    return fresh_heartbeat()
 
 
 # set mode manual
@@ -95,7 +140,7 @@ def aircraft_rtl():
 @connection_required
 def aircraft_manual():
     vehicle.mavlink_connection.set_mode_manual()
-    return aircraft_heartbeat()
+    return fresh_heartbeat()
 
 
 # set mode to auto
@@ -103,7 +148,7 @@ def aircraft_manual():
 @connection_required
 def aircraft_auto():
     vehicle.mavlink_connection.set_mode_auto()
-    return aircraft_heartbeat()
+    return fresh_heartbeat()
 
 
 # set mode to guided
@@ -111,7 +156,7 @@ def aircraft_auto():
 @connection_required
 def aircraft_guided():
     vehicle.mavlink_connection.set_mode("GUIDED")
-    return aircraft_heartbeat()
+    return fresh_heartbeat()
 
 
 # set mode to loiter
@@ -119,7 +164,7 @@ def aircraft_guided():
 @connection_required
 def aircraft_loiter():
     vehicle.mavlink_connection.set_mode_loiter()
-    return aircraft_heartbeat()
+    return fresh_heartbeat()
 
 
 # Request flight mode
@@ -130,31 +175,112 @@ def aircraft_flightmode():
     return jsonify({"flightmode": flightmode}), 200
 
 
+# Serves a telemetry response serialised when its message arrived, see ResponseCache.
+# Headers give the unix time of the message and its age; a client sending the ETag
+# back in If-None-Match gets 304 Not Modified until the value changes
+def cached_response(name, fallback):
+    cached = vehicle.telemetry.responses.get(name)
+    if cached is None:
+        # nothing received yet
+        return fallback()
+
+    if request.if_none_match.contains(cached.etag):
+        response = Response(status=304)
+    else:
+        response = Response(cached.body, status=200, mimetype="application/json")
+    response.set_etag(cached.etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Telemetry-Timestamp"] = "%.3f" % cached.timestamp
+    response.headers["X-Telemetry-Age"] = "%.3f" % cached.age()
+    return response
+
+
 # Request gps data
 @aircraft.route("/telemetry/gps", methods=["GET"])
 @connection_required
 def aircraft_gps():
-    location = vehicle.telemetry.get_location()
-    return jsonify(location), 200
+    return cached_response("gps", lambda: (jsonify(vehicle.telemetry.get_location()), 200))
 
 
 @aircraft.route("/telemetry/gps_with_timestamp", methods=["GET"])
 @connection_required
 def aircraft_gps_with_timestamp():
-    location = vehicle.telemetry.get_location()
-    # the timestamp is specifically for SkyPasta which requires a timestamp to be given along with the telemetry data
-    location['timestamp'] = int(time.time())  # get the current unix timestamp
-    return jsonify(location), 200
+    def fallback():
+        location = vehicle.telemetry.get_location()
+        # the timestamp is specifically for SkyPasta which requires a timestamp to be given along with the telemetry data
+        location['timestamp'] = int(time.time())  # get the current unix timestamp
+        return jsonify(location), 200
+
+    return cached_response("gps_with_timestamp", fallback)
+
+
+# Request recent telemetry, e.g. a position trail
+# query: seconds (window length, default 60), maxPoints (decimate to at most this many samples)
+@aircraft.route("/telemetry/history", methods=["GET"])
+@connection_required
+def aircraft_telemetry_history():
+    seconds = request.args.get("seconds", 60, type=float)
+    max_points = request.args.get("maxPoints", None, type=int)
+    if seconds <= 0 or (max_points is not None and max_points <= 0):
+        return jsonify({"error": "seconds and maxPoints must be >0"}), 400
+
+    history = vehicle.telemetry.history.summary(
+        time.monotonic() - seconds, max_points=max_points)
+    return jsonify(history), 200
+
+
+# Stream live telemetry as server-sent events, instead of polling the routes above
+# query: channels (comma separated, default all of gps,heartbeat,speed), rate (max updates/s, default 10)
+@aircraft.route("/telemetry/stream", methods=["GET"])
+@connection_required
+def aircraft_telemetry_stream():
+    channels = request.args.get("channels", ",".join(CHANNELS)).split(",")
+    rate = request.args.get("rate", 10, type=float)
+    if not set(channels) <= set(CHANNELS):
+        return jsonify({"error": "Unknown channel, expected any of " + ",".join(CHANNELS)}), 400
+    if rate <= 0:
+        return jsonify({"error": "rate must be >0"}), 400
+
+    stream = vehicle.telemetry.stream
+    subscriber = stream.subscribe(channels, rate)
+
+    def events():
+        # sent right away so the client sees the stream open before the first update
+        yield ": connected\n\n"
+        while True:
+            updates = subscriber.next(timeout=15)
+            if not updates:
+                # keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+            for channel, value in updates.items():
+                yield "event: %s\ndata: %s\n\n" % (channel, json.dumps(value))
+
+    response = Response(events(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.call_on_close(lambda: stream.unsubscribe(subscriber))
+    return response
 
 
 # Request heartbeat data
 @aircraft.route("/telemetry/heartbeat", methods=["GET"])
 @connection_required
 def aircraft_heartbeat():
+    return cached_response("heartbeat", fresh_heartbeat)
+
+
+# the commands answer with a heartbeat received after them, not the cached one
+def fresh_heartbeat():
     vehicle.telemetry.wait("HEARTBEAT")
     return jsonify(vehicle.telemetry.heartbeat.to_dict()), 200
 
 
+# Request GCOM-X telemetry uplink statistics
+@aircraft.route("/telemetry/uplink", methods=["GET"])
+@connection_required
+def aircraft_uplink():
+    return jsonify(vehicle.uplink.stats.to_dict()), 200
+
+
 # Guided control / Fly-to
 @aircraft.route("/flyto", methods=["POST"])
 @connection_required
@@ -163,7 +289,7 @@ def aircraft_flyto(lat=0, lng=0, alt=0):
     lng = parseRequest(request, "lng", lng)
     alt = parseRequest(request, "alt", alt)
     vehicle.fly_to(lat, lng, alt)
-    return aircraft_heartbeat()
+    return fresh_heartbeat()
 
 
 # Guided control / Take-off
@@ -183,7 +309,7 @@ def aircraft_takeoff():
         parseRequest(request, "lng", 0),
         parseRequest(request, "alt", 0),
     )
-    return aircraft_heartbeat()
+    return fresh_heartbeat()
 
 
 @aircraft.route("/home_position", methods=["GET"])
@@ -220,12 +346,8 @@ def aircraft_home_position():
     ), 200
 
 
-# upload mission waypoints
-@aircraft.route("/mission", methods=["POST"])
-@connection_required
-def upload_mission_wps():
-    missionRequest = request.json
-    # error checking
+# returns an error response if the mission request is invalid, None otherwise
+def validate_mission(missionRequest):
     if missionRequest:
         if "wps" not in missionRequest or not missionRequest["wps"]:
             return jsonify({"error": "No waypoints were given"}), 402
@@ -236,6 +358,23 @@ def upload_mission_wps():
             return jsonify({"error": "Takeoff altitude must be >0"}), 404
     else:
         return jsonify({"error": "Mission format is invalid"}), 405
+    return None
+
+
+# response for a mission or reroute rejected by the geofence, listing what is wrong with it
+def geofence_error(e):
+    return jsonify({"error": "The route violates the geofence", "violations": e.violations}), 400
+
+
+# upload mission waypoints
+@aircraft.route("/mission", methods=["POST"])
+@connection_required
+def upload_mission_wps():
+    missionRequest = request.json
+    # error checking
+    error = validate_mission(missionRequest)
+    if error is not None:
+        return error
 
     # checks the number of wps recieved vs the number sent
     try:
@@ -251,17 +390,117 @@ def upload_mission_wps():
             ),
             201,
         )
+    except GeofenceViolation as e:
+        return geofence_error(e)
+    except Exception as e:
+        traceback.print_exception(*sys.exc_info())
+        return jsonify({"error": "Waypoints failed to upload."}), 401
+
+
+# update mission waypoints
+# takes the same mission as POST but only sends the items that differ from the vehicle's mission
+@aircraft.route("/mission", methods=["PATCH"])
+@connection_required
+def patch_mission_wps():
+    missionRequest = request.json
+    error = validate_mission(missionRequest)
+    if error is not None:
+        return error
+
+    try:
+        num_wps_loaded, items_sent = vehicle.waypoints.patch_mission_wps(
+            missionRequest["wps"], missionRequest["takeoffAlt"], missionRequest.get("rtl", False)
+        )
+        return (
+            jsonify(
+                {
+                    "result": "Waypoints updated successfully!",
+                    "wps_uploaded": num_wps_loaded,
+                    "items_sent": items_sent,
+                }
+            ),
+            200,
+        )
+    except GeofenceViolation as e:
+        return geofence_error(e)
     except Exception as e:
         traceback.print_exception(*sys.exc_info())
         return jsonify({"error": "Waypoints failed to upload."}), 401
 
 
 # download mission waypoints
+# served from ACOM's copy of the mission unless it is stale or ?refresh=true is given,
+# clients can revalidate with If-None-Match
 @aircraft.route("/mission", methods=["GET"])
 @connection_required
 def download_mission_wps():
-    data = vehicle.waypoints.download_mission_wps()
-    return jsonify(data), 200
+    refresh = request.args.get("refresh", "false").lower() in ("1", "true")
+    try:
+        etag, data = vehicle.waypoints.get_mission(refresh=refresh)
+    except Exception:
+        traceback.print_exception(*sys.exc_info())
+        return jsonify({"error": "Waypoints failed to download."}), 504
+
+    response = jsonify(data)
+    if etag is not None:
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+# geofence that mission uploads and reroutes are checked against
+# {"fence": [{"lat", "lng"}, ...], "obstacles": [...]}, obstacles as in reroute
+@aircraft.route("/geofence", methods=["GET"])
+def get_geofence():
+    geofence = vehicle.geofence
+    return jsonify(geofence.json if geofence is not None else {"fence": [], "obstacles": []}), 200
+
+
+@aircraft.route("/geofence", methods=["PUT"])
+def set_geofence():
+    try:
+        vehicle.set_geofence(request.json)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(request.json), 200
+
+
+@aircraft.route("/geofence", methods=["DELETE"])
+def delete_geofence():
+    vehicle.set_geofence({})
+    return jsonify({"fence": [], "obstacles": []}), 200
+
+
+# moving obstacle tracks, predicted against ours on every position update. Conflicting
+# tracks are avoided by an active reroute, see Vehicle.set_tracks
+# {"tracks": [{"id", "lat", "lng", "alt", "vx", "vy", "vz", "timestamp"}, ...]}, velocities
+# in m/s north, east and down, timestamp optional in unix seconds
+@aircraft.route("/tracks", methods=["PUT"])
+@connection_required
+def set_tracks():
+    try:
+        predictions = vehicle.set_tracks(request.json["tracks"])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"predictions": predictions}), 200
+
+
+@aircraft.route("/tracks", methods=["DELETE"])
+@connection_required
+def delete_tracks():
+    vehicle.set_tracks([])
+    return jsonify({"predictions": []}), 200
+
+
+# time to closest approach and miss distance of every track, soonest first
+@aircraft.route("/conflicts", methods=["GET"])
+@connection_required
+def get_conflicts():
+    try:
+        predictions = vehicle.predict_conflicts()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"predictions": predictions}), 200
 
 
 # Ensure mavlink connection is created before sending requests
@@ -280,8 +519,18 @@ def get_winch_status():
     return jsonify({"winch_status": data}), 200
 
 
+# predicted and actual stop distance of each drop, and the mode change latency the
+# loiter is sent early by, for tuning the winch deceleration in config.json
+@aircraft.route("/winch/drops", methods=["GET"])
+@connection_required
+def get_winch_drops():
+    return jsonify({"drops": vehicle.drop_reports, "latency": vehicle.mode_latency.to_dict()}), 200
+
+
 @aircraft.route("/winch/command", methods=["POST"])
 @connection_required
 def send_winch_command():
-    vehicle.winch_status = 5
+    # under the lock, so the drop cannot overwrite it while it starts
+    with vehicle.lock:
+        vehicle.winch_status = 5
     return jsonify({"command": 5}), 200
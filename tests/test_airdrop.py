@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from pymavlink import mavutil
+
+from src.library.airdrop import CommandLatency, DropPredictor
+from src.library.history import TelemetryHistory
+from src.library.location import Location
+from src.library.projection import LocalProjection
+from src.library.vehicle import Vehicle
+from src.library.winchlink import WinchEvent
+
+drops_endpoint = "/aircraft/winch/drops"
+
+ORIGIN = (49.2578, -123.2470)
+PROJECTION = LocalProjection(*ORIGIN)
+TARGET = Location(*ORIGIN, 30)
+
+
+def heartbeat(custom_mode):
+    return mavutil.mavlink.MAVLink_heartbeat_message(
+        mavutil.mavlink.MAV_TYPE_QUADROTOR, mavutil.mavlink.MAV_AUTOPILOT_ARDUPILOTMEGA,
+        mavutil.mavlink.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED, custom_mode, 0, 3)
+
+
+def test_command_latency():
+    latency = CommandLatency(initial=0.5)
+    assert latency.estimate() == 0.5
+
+    latency.sent("LOITER", now=10)
+    latency.on_heartbeat(heartbeat(3), now=10.2)  # still AUTO
+    latency.on_heartbeat(heartbeat(5), now=10.3)  # LOITER
+    latency.on_heartbeat(heartbeat(5), now=11)
+
+    assert latency.to_dict() == {"estimate": pytest.approx(0.3), "samples": [pytest.approx(0.3)]}
+
+
+def test_plan_leads_the_target():
+    predictor = DropPredictor(PROJECTION, TARGET, radius=2, deceleration=2.5)
+    # 200 m south of the target, flying north at 10 m/s, passing 1 m to its side
+    plan = predictor.plan((1, -200), (0, 10), latency=0.5)
+
+    # 5 m flown during the latency and 20 m braking
+    assert plan["fire_in"] == pytest.approx((200 - 25) / 10)
+    assert plan["predicted"] == pytest.approx(1)
+    assert plan["distance"] == pytest.approx(np.hypot(1, 200))
+
+
+def test_plan_does_not_fire_off_track_or_late():
+    predictor = DropPredictor(PROJECTION, TARGET, radius=2, deceleration=2.5)
+
+    assert predictor.plan((10, -200), (0, 10), latency=0.5)["fire_in"] is None
+    # too close to stop in time, only fired inside the radius
+    assert predictor.plan((0, -10), (0, 10), latency=0.5)["fire_in"] is None
+    assert predictor.plan((0, -1), (0, 10), latency=0.5)["fire_in"] == 0
+    assert predictor.plan((0, -1), (0, 0), latency=0.5)["fire_in"] == 0
+
+
+def test_estimate_fits_the_position_history():
+    history = TelemetryHistory(100)
+    rng = np.random.default_rng(0)
+    for i in range(10):
+        east, north = 0.1 * rng.standard_normal(2) + (3 * i * 0.1, -100 + 10 * i * 0.1)
+        location = PROJECTION.from_enu(east, north)
+        history.record(1000 + i * 0.1, location.lat, location.lng, 30, 0, 10, True)
+    predictor = DropPredictor(PROJECTION, TARGET, radius=2, window=1.0)
+
+    position, velocity = predictor.estimate(history, SimpleNamespace(lat=None), now=1001.0)
+
+    assert velocity == pytest.approx([3, 10], abs=0.5)
+    assert position == pytest.approx([3, -100 + 10], abs=0.3)
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_drops_endpoint(vehicle: Vehicle, app):
+    reports = [{"timestamp": 1.0, "distance": 200.0, "fire_in": 0.05, "speed": 10.0, "latency": 0.5,
+                "predicted": 1.0, "actual": 1.5}]
+    vehicle.drop_reports = reports
+    vehicle.mode_latency.to_dict.return_value = {"estimate": 0.5, "samples": [0.5]}
+
+    response = app.get(drops_endpoint)
+
+    assert response.status_code == 200
+    assert json.loads(response.data) == {"drops": reports, "latency": {"estimate": 0.5, "samples": [0.5]}}
+
+
+class FakeArduino:
+    """winch that completes a drop right after AIRDROPBEGIN1"""
+
+    def __init__(self, vehicle):
+        self.commands = []
+        self.events = []
+
+    def sendCommandMessage(self, message, acks=(), timeout=None):
+        self.commands.append(message)
+        if message == "AIRDROPBEGIN1":
+            self.events.append(WinchEvent("complete", "AIRDROPCOMPLETE", time.monotonic(), None))
+
+    def nextEvent(self, timeout=None):
+        if self.events:
+            return self.events.pop(0)
+        time.sleep(timeout)
+        return None
+
+
+def winch_vehicle(vx):
+    vehicle = Vehicle()
+    vehicle.winch_enabled = True
+    vehicle.waypoints = SimpleNamespace(airdrop={"lat": TARGET.lat, "lng": TARGET.lng, "alt": TARGET.alt},
+                                        mission=SimpleNamespace(home=lambda: None))
+    vehicle.telemetry = SimpleNamespace(history=TelemetryHistory(10), lat=None, lng=None, vx=vx, vy=0.0)
+    return vehicle
+
+
+def run_automation(vehicle, arduinos):
+    with patch("src.library.vehicle.ArduinoConnector", side_effect=lambda *args, **kwargs: arduinos.append(
+            FakeArduino(vehicle)) or arduinos[-1]), \
+            patch.object(vehicle, "set_loiter"), patch.object(vehicle, "set_auto"):
+        thread = threading.Thread(target=vehicle.winch_automation, daemon=True)
+        thread.start()
+        # waits for a position before doing anything
+        time.sleep(1.5)
+        assert vehicle.winch_status == 1 and thread.is_alive()
+        vehicle.telemetry.lat, vehicle.telemetry.lng = TARGET.lat, TARGET.lng
+        thread.join(5)
+        assert not thread.is_alive()
+        return vehicle.set_loiter.call_count
+
+
+def test_winch_automation_drops_over_the_target():
+    vehicle = winch_vehicle(vx=0.0)
+    arduinos = []
+
+    loiters = run_automation(vehicle, arduinos)
+
+    assert loiters == 1
+    assert arduinos[0].commands == ["AIRDROPBEGIN1"]
+    assert vehicle.winch_status == 4
+    assert vehicle.drop_reports[0]["actual"] == pytest.approx(0, abs=0.01)
+
+
+def test_emergency_reel_while_braking_calls_off_the_drop():
+    # still moving, so the drop waits for the aircraft to stop
+    vehicle = winch_vehicle(vx=0.1)
+    vehicle.telemetry.vy = 5.0
+    arduinos = []
+    threading.Timer(2.0, lambda: setattr(vehicle, "winch_status", 5)).start()
+
+    with patch("src.library.vehicle.DropPredictor.plan",
+               return_value={"fire_in": 0.0, "distance": 0.0, "predicted": 0.0}):
+        run_automation(vehicle, arduinos)
+
+    assert arduinos[0].commands == ["AIRDROPCANCEL1"]
+    assert vehicle.winch_status == 1
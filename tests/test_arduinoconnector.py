@@ -0,0 +1,116 @@
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+from serial.tools.list_ports_common import ListPortInfo
+
+from src.library.arduinoconnector import ArduinoConnector
+
+
+def port(device, vid=None, pid=None):
+    info = ListPortInfo(device)
+    info.vid, info.pid = vid, pid
+    return info
+
+
+class FakeSerial:
+    """answers the handshake on the payload port only, after delay seconds"""
+    payload = "/dev/ttyACM1"
+    delay = 0.0
+    opened = []
+    in_waiting = 0
+
+    def __init__(self, port, baudrate, timeout, write_timeout):
+        self.port = port
+        self.timeout = timeout
+        self.closed = False
+        self.answer = False
+        FakeSerial.opened.append(port)
+
+    def write(self, data):
+        self.answer = self.port == FakeSerial.payload and data == b"uas1"
+
+    def readline(self):
+        if self.answer:
+            time.sleep(FakeSerial.delay)
+            self.answer = False
+            return b"uas\r\n"
+        time.sleep(self.timeout)
+        return b""
+
+    def read(self, size=1):
+        time.sleep(self.timeout)
+        return b""
+
+    def close(self):
+        self.closed = True
+
+
+PORTS = [port("/dev/ttyACM0", 0x2341, 0x0043), port("/dev/ttyACM1", 0x2341, 0x0042), port("/dev/ttyS0")]
+
+
+@pytest.fixture(autouse=True)
+def fake_serial():
+    FakeSerial.opened = []
+    FakeSerial.delay = 0.0
+    with patch("src.library.arduinoconnector.serial.Serial", FakeSerial), \
+            patch.object(ArduinoConnector, "getSerialPorts", return_value=PORTS):
+        yield
+
+
+def test_probes_ports_concurrently_and_caches_the_payload_port(tmp_path):
+    cache = tmp_path / "arduino_port.json"
+    start = time.monotonic()
+
+    connector = ArduinoConnector(None, portCache=str(cache), wakeTime=0.2, probeTimeout=1)
+
+    # the ports wake together, not one after another
+    assert time.monotonic() - start < 0.6
+    assert connector.arduino.port == "/dev/ttyACM1"
+    assert json.loads(cache.read_text()) == {"port": "/dev/ttyACM1", "vid": 0x2341, "pid": 0x0042}
+
+
+def test_cached_port_is_probed_alone_first(tmp_path):
+    cache = tmp_path / "arduino_port.json"
+    cache.write_text(json.dumps({"port": "/dev/ttyACM1", "vid": 0x2341, "pid": 0x0042}))
+
+    connector = ArduinoConnector(None, portCache=str(cache), wakeTime=0, probeTimeout=1)
+
+    assert connector.arduino.port == "/dev/ttyACM1"
+    assert FakeSerial.opened == ["/dev/ttyACM1"]
+
+
+def test_cached_vid_pid_followed_to_a_new_port(tmp_path):
+    cache = tmp_path / "arduino_port.json"
+    cache.write_text(json.dumps({"port": "/dev/ttyACM3", "vid": 0x2341, "pid": 0x0042}))
+
+    connector = ArduinoConnector(None, portCache=str(cache), wakeTime=0, probeTimeout=1)
+
+    assert FakeSerial.opened == ["/dev/ttyACM1"]
+    assert json.loads(cache.read_text())["port"] == "/dev/ttyACM1"
+    assert connector.arduino.port == "/dev/ttyACM1"
+
+
+def test_stale_cache_falls_back_to_searching(tmp_path):
+    cache = tmp_path / "arduino_port.json"
+    cache.write_text(json.dumps({"port": "/dev/ttyACM0", "vid": 0x2341, "pid": 0x0043}))
+
+    connector = ArduinoConnector(None, portCache=str(cache), wakeTime=0, probeTimeout=0.5)
+
+    assert FakeSerial.opened[0] == "/dev/ttyACM0"
+    assert sorted(FakeSerial.opened[1:]) == ["/dev/ttyACM1", "/dev/ttyS0"]
+    assert json.loads(cache.read_text())["port"] == "/dev/ttyACM1"
+    assert connector.arduino.port == "/dev/ttyACM1"
+
+
+def test_payload_not_found():
+    FakeSerial.payload = None
+    try:
+        start = time.monotonic()
+        with pytest.raises(Exception, match="Payload not found"):
+            ArduinoConnector(None, wakeTime=0, probeTimeout=0.5)
+        # every port gets its own timeout, at the same time
+        assert time.monotonic() - start < 1.2
+    finally:
+        FakeSerial.payload = "/dev/ttyACM1"
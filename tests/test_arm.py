@@ -36,3 +36,6 @@ def test_arm_endpoint_calls_vehicle_arm(vehicle: Vehicle, app):
     assert json.loads(response.data) == test_heartbeat
 
     vehicle.arm.assert_called_once()
+    # answered with a heartbeat received after the command, not the cached one
+    vehicle.telemetry.wait.assert_called_once_with("HEARTBEAT")
+    vehicle.telemetry.latest.assert_not_called()
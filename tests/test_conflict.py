@@ -0,0 +1,112 @@
+import json
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from src.library.conflict import ConflictMonitor, closest_approach
+from src.library.projection import LocalProjection
+from src.library.vehicle import Vehicle
+
+tracks_endpoint = "/aircraft/tracks"
+conflicts_endpoint = "/aircraft/conflicts"
+
+ORIGIN = (49.2578, -123.2470)
+PROJECTION = LocalProjection(*ORIGIN)
+
+
+def at(east, north, alt=30):
+    location = PROJECTION.from_enu(east, north)
+    return {"lat": location.lat, "lng": location.lng, "alt": alt}
+
+
+def test_closest_approach():
+    positions = np.array([
+        [1000, 0, 0],  # head on
+        [100, -100, 0],  # crossing from the south
+        [0, 500, 0],  # flying alongside
+        [-100, 0, 0],  # behind us, slower
+        [5000, 0, 0],  # head on, beyond the horizon
+    ])
+    velocities = np.array([[-20, 0, 0], [0, 10, 0], [20, 0, 0], [10, 0, 0], [-20, 0, 0]])
+
+    times, distances = closest_approach([0, 0, 0], [20, 0, 0], positions, velocities, horizon=60)
+
+    assert times == pytest.approx([25, 6, 0, 0, 60])
+    assert distances == pytest.approx([0, np.hypot(100 - 20 * 6, -100 + 10 * 6), 500, 100, 5000 - 40 * 60])
+
+
+def test_closest_approach_matches_sampling():
+    rng = np.random.default_rng(0)
+    positions = rng.uniform(-2000, 2000, (200, 3))
+    velocities = rng.uniform(-30, 30, (200, 3))
+
+    times, distances = closest_approach([0, 0, 0], [15, 5, 0], positions, velocities, horizon=120)
+
+    samples = np.linspace(0, 120, 12001)
+    relative = positions[:, None, :] + (velocities - [15, 5, 0])[:, None, :] * samples[None, :, None]
+    sampled = np.linalg.norm(relative, axis=2)
+    assert np.all(distances <= sampled.min(axis=1) + 1e-9)
+    assert distances == pytest.approx(sampled.min(axis=1), abs=0.05)
+    assert times == pytest.approx(samples[sampled.argmin(axis=1)], abs=0.02)
+
+
+def test_monitor_reports_each_conflict_once():
+    monitor = ConflictMonitor(PROJECTION, separation=30, horizon=60)
+    reported = []
+    monitor.on_conflict(reported.append)
+    # one track heading straight at us from 600 m north, one passing 200 m east later
+    monitor.set_tracks([
+        {"id": "intruder", **at(0, 600), "vx": -20, "vy": 0, "vz": 0},
+        {"id": "passing", **at(200, 700), "vx": -20, "vy": 0, "vz": 0},
+    ], now=100)
+    here = at(0, 0)
+
+    for now in [100, 100.1, 100.2]:
+        conflicts = monitor.check(here["lat"], here["lng"], here["alt"], (0, 0, 0), now=now)
+
+    assert len(reported) == 1
+    assert [conflict["id"] for conflict in reported[0]] == ["intruder"]
+    assert conflicts[0]["time"] == pytest.approx(600 / 20 - 0.2, abs=1e-3)
+    assert conflicts[0]["distance"] == pytest.approx(0, abs=0.1)
+    predictions = monitor.predict(here["lat"], here["lng"], here["alt"], (0, 0, 0), now=100)
+    assert [(p["id"], p["conflict"]) for p in predictions] == [("intruder", True), ("passing", False)]
+    assert predictions[1]["distance"] == pytest.approx(200, abs=0.1)
+
+
+def test_monitor_reports_a_conflict_again_after_it_cleared():
+    monitor = ConflictMonitor(PROJECTION, separation=30, horizon=60)
+    reported = []
+    monitor.on_conflict(reported.append)
+    monitor.set_tracks([{"id": 1, **at(0, 600), "vx": -20}], now=0)
+    here = at(0, 0)
+
+    monitor.check(here["lat"], here["lng"], here["alt"], (0, 0, 0), now=0)
+    # we turn east out of its way, then back into it
+    monitor.check(here["lat"], here["lng"], here["alt"], (0, 20, 0), now=0)
+    monitor.check(here["lat"], here["lng"], here["alt"], (0, 0, 0), now=0)
+
+    assert len(reported) == 2
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_set_tracks_returns_predictions(vehicle: Vehicle, app):
+    tracks = [{"id": "a", **at(0, 600), "vx": -20, "vy": 0, "vz": 0}]
+    predictions = [{"id": "a", "time": 30.0, "distance": 0.0, "conflict": True, **at(0, 0)}]
+    vehicle.set_tracks.return_value = predictions
+
+    response = app.put(tracks_endpoint, json={"tracks": tracks})
+
+    assert response.status_code == 200
+    assert json.loads(response.data) == {"predictions": predictions}
+    vehicle.set_tracks.assert_called_once_with(tracks)
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_conflicts_without_telemetry(vehicle: Vehicle, app):
+    vehicle.predict_conflicts.side_effect = Exception("No position and velocity received yet")
+
+    response = app.get(conflicts_endpoint)
+
+    assert response.status_code == 400
+    assert json.loads(response.data) == {"error": "No position and velocity received yet"}
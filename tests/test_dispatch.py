@@ -0,0 +1,78 @@
+from pymavlink import mavutil
+
+from src.library.dispatch import Dispatcher, message_id
+
+
+def heartbeat():
+    return mavutil.mavlink.MAVLink_heartbeat_message(
+        mavutil.mavlink.MAV_TYPE_QUADROTOR, mavutil.mavlink.MAV_AUTOPILOT_ARDUPILOTMEGA, 0, 0, 0, 3)
+
+
+def test_handlers_run_in_order_with_late_handlers_last():
+    dispatcher = Dispatcher()
+    calls = []
+    dispatcher.on("HEARTBEAT", lambda msg: calls.append("late"), last=True)
+    dispatcher.on("HEARTBEAT", lambda msg: calls.append("first"))
+    dispatcher.on("HEARTBEAT", lambda msg: calls.append("second"))
+    dispatcher.on("VFR_HUD", lambda msg: calls.append("vfr"))
+
+    dispatcher.dispatch(heartbeat())
+
+    assert calls == ["first", "second", "late"]
+    assert dispatcher.subscribed(message_id("HEARTBEAT"))
+    assert not dispatcher.subscribed(message_id("GPS_RAW_INT"))
+
+
+def test_on_and_off_during_dispatch_apply_from_the_next_message():
+    dispatcher = Dispatcher()
+    calls = []
+
+    def added(msg):
+        calls.append("added")
+
+    def removed(msg):
+        calls.append("removed")
+
+    def changer(msg):
+        calls.append("changer")
+        dispatcher.off("HEARTBEAT", removed)
+        dispatcher.off("HEARTBEAT", changer)
+        dispatcher.on("HEARTBEAT", added)
+
+    dispatcher.on("HEARTBEAT", changer)
+    dispatcher.on("HEARTBEAT", removed)
+
+    dispatcher.dispatch(heartbeat())
+    assert calls == ["changer", "removed"]
+
+    calls.clear()
+    dispatcher.dispatch(heartbeat())
+    assert calls == ["added"]
+
+
+def test_off_last_handler_unsubscribes_the_id():
+    dispatcher = Dispatcher()
+    handler = dispatcher.on("HEARTBEAT", lambda msg: None, last=True)
+
+    dispatcher.off("HEARTBEAT", handler)
+
+    assert not dispatcher.subscribed(message_id("HEARTBEAT"))
+    dispatcher.dispatch(heartbeat())
+
+
+def test_failing_handler_does_not_stop_the_others():
+    dispatcher = Dispatcher()
+    calls = []
+
+    def faulty(msg):
+        raise AttributeError("total")
+
+    dispatcher.on("HEARTBEAT", faulty)
+    dispatcher.on("HEARTBEAT", lambda msg: calls.append("after"))
+    dispatcher.on("HEARTBEAT", lambda msg: calls.append("late"), last=True)
+
+    dispatcher.dispatch(heartbeat())
+    dispatcher.dispatch(heartbeat())
+
+    assert calls == ["after", "late", "after", "late"]
+    assert dispatcher.failures[faulty] == 2
@@ -0,0 +1,250 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from src.library.dispatch import Dispatcher, message_id
+from src.library.executor import Arrival, RerouteExecutor
+from src.library.projection import LocalProjection
+from src.library.route import Route, check_points
+from src.library.vehicle import Vehicle
+
+reroute_endpoint = "/aircraft/reroute"
+
+ORIGIN = (49.2578, -123.2470)
+PROJECTION = LocalProjection(*ORIGIN)
+
+
+def at(east, north, alt=30):
+    location = PROJECTION.from_enu(east, north)
+    return {"lat": location.lat, "lng": location.lng, "alt": alt}
+
+
+class FakeVehicle:
+    def __init__(self):
+        self.telemetry = SimpleNamespace(dispatcher=Dispatcher(), lat=None, lng=None, alt=None, vx=None, vy=None)
+        self.commands = []
+
+    def local_projection(self, lat, lng):
+        return PROJECTION
+
+    def fly_to(self, lat, lng, alt):
+        self.commands.append(("fly_to", round(lat, 7), round(lng, 7)))
+
+    def set_guided(self):
+        self.commands.append("guided")
+
+    def set_auto(self):
+        self.commands.append("auto")
+
+    def move(self, executor, east, north):
+        point = at(east, north)
+        self.telemetry.lat, self.telemetry.lng, self.telemetry.alt = point["lat"], point["lng"], point["alt"]
+        executor.on_position(None)
+
+
+def fly_to(point):
+    return ("fly_to", round(point["lat"], 7), round(point["lng"], 7))
+
+
+def subscribed(vehicle):
+    return vehicle.telemetry.dispatcher.subscribed(message_id("GPS_RAW_INT"))
+
+
+def test_flies_each_point_then_returns_to_auto():
+    vehicle = FakeVehicle()
+    points = [at(0, 100), at(100, 100)]
+    executor = RerouteExecutor(vehicle, Route(points, [[point] for point in points]), Arrival(radius=5))
+    vehicle.move(executor, 0, 0)
+
+    executor.start()
+    assert subscribed(vehicle)
+    for east, north in [(0, 50), (0, 97), (50, 100), (98, 101)]:
+        vehicle.move(executor, east, north)
+
+    assert vehicle.commands == ["guided", fly_to(points[0]), fly_to(points[1]), "auto"]
+    assert executor.status()["state"] == "finished"
+    assert not subscribed(vehicle)
+
+
+def test_pass_plane():
+    vehicle = FakeVehicle()
+    points = [at(0, 100), at(0, 200)]
+    route = Route(points, [[point] for point in points])
+    executor = RerouteExecutor(vehicle, route, Arrival(radius=1, pass_plane=True))
+    vehicle.move(executor, 0, 0)
+    executor.start()
+
+    # 20 m to the side of the first point, but past it
+    vehicle.move(executor, 20, 99)
+    assert route.target() is points[0]
+    vehicle.move(executor, 20, 101)
+
+    assert route.target() is points[1]
+    assert executor.status()["arrival"] == "pass plane"
+
+
+def test_time_budget():
+    vehicle = FakeVehicle()
+    clock = [0]
+    points = [at(0, 100), at(0, 200)]
+    route = Route(points, [[point] for point in points])
+    executor = RerouteExecutor(vehicle, route, Arrival(radius=1, time_budget=30), clock=lambda: clock[0])
+    vehicle.move(executor, 0, 0)
+    executor.start()
+
+    clock[0] = 29
+    vehicle.move(executor, 0, 10)
+    assert route.target() is points[0]
+    clock[0] = 30
+    vehicle.move(executor, 0, 10)
+
+    assert route.target() is points[1]
+    assert executor.status()["arrival"] == "time budget"
+
+
+def test_cancel_takes_effect_at_once():
+    vehicle = FakeVehicle()
+    points = [at(0, 100), at(100, 100)]
+    executor = RerouteExecutor(vehicle, Route(points, [[point] for point in points]), Arrival(radius=5))
+    vehicle.move(executor, 0, 0)
+    executor.start()
+
+    assert executor.cancel()
+    vehicle.move(executor, 0, 100)
+
+    assert not subscribed(vehicle)
+    assert vehicle.commands == ["guided", fly_to(points[0])]
+    assert executor.status()["state"] == "cancelled"
+    assert not executor.cancel()
+
+
+def test_replaced_route_is_flown_at_once():
+    vehicle = FakeVehicle()
+    goal = at(0, 200)
+    route = Route([goal], [[goal]])
+    executor = RerouteExecutor(vehicle, route, Arrival(radius=5))
+    vehicle.move(executor, 0, 0)
+    executor.start()
+
+    _, version = route.remaining_goals()
+    detour = at(50, 100)
+    route.replace([[detour, goal]], version)
+    executor.refresh()
+
+    assert vehicle.commands == ["guided", fly_to(goal), fly_to(detour)]
+
+
+def test_status():
+    vehicle = FakeVehicle()
+    points = [at(0, 100), at(100, 100)]
+    executor = RerouteExecutor(vehicle, Route(points, [[point] for point in points]), Arrival(radius=5))
+    vehicle.move(executor, 0, 0)
+    executor.start()
+    vehicle.telemetry.vx, vehicle.telemetry.vy = 10, 0
+    vehicle.move(executor, 0, 40)
+
+    status = executor.status()
+
+    assert status["state"] == "flying"
+    assert (status["leg"], status["legs"]) == (0, 2)
+    assert status["target"] == points[0]
+    assert status["distance"] == pytest.approx(60, abs=0.01)
+    assert status["remaining"] == pytest.approx(160, abs=0.01)
+    assert status["eta"] == pytest.approx(16, abs=0.01)
+
+
+def test_status_follows_a_replaced_route():
+    vehicle = FakeVehicle()
+    goal = at(0, 100)
+    route = Route([goal, at(100, 100)], [[goal], [at(100, 100)]])
+    executor = RerouteExecutor(vehicle, route, Arrival(radius=5))
+    vehicle.move(executor, 0, 0)
+    executor.start()
+    assert executor.status()["remaining"] == pytest.approx(200, abs=0.01)
+
+    _, version = route.remaining_goals()
+    route.replace([[goal], [at(0, 300)]], version)
+
+    assert executor.status()["remaining"] == pytest.approx(300, abs=0.01)
+    assert (executor.beyond, executor.revision) == (pytest.approx(200, abs=0.01), route.revision)
+
+
+def test_bad_first_point_changes_nothing():
+    vehicle = FakeVehicle()
+    points = [{"lat": ORIGIN[0], "lng": ORIGIN[1]}]
+    executor = RerouteExecutor(vehicle, Route(points, [points]), Arrival(radius=5))
+    vehicle.move(executor, 0, 0)
+
+    with pytest.raises(KeyError):
+        executor.start()
+
+    assert vehicle.commands == []
+    assert not subscribed(vehicle)
+    assert executor.status()["state"] == "failed"
+    assert not executor.cancel()
+
+
+def test_failed_start_resumes_the_mission():
+    vehicle = FakeVehicle()
+    points = [at(0, 100)]
+    executor = RerouteExecutor(vehicle, Route(points, [points]), Arrival(radius=5))
+    vehicle.move(executor, 0, 0)
+
+    with patch.object(vehicle, "fly_to", side_effect=OSError("link down")), pytest.raises(OSError):
+        executor.start()
+
+    assert vehicle.commands == ["guided", "auto"]
+    assert not subscribed(vehicle)
+    assert executor.status()["state"] == "failed"
+
+
+def test_failing_position_update_resumes_the_mission():
+    vehicle = FakeVehicle()
+    points = [at(0, 100), at(100, 100)]
+    executor = RerouteExecutor(vehicle, Route(points, [[point] for point in points]), Arrival(radius=5))
+    vehicle.move(executor, 0, 0)
+    executor.start()
+
+    with patch.object(vehicle, "fly_to", side_effect=OSError("link down")):
+        vehicle.move(executor, 0, 99)
+
+    assert vehicle.commands == ["guided", fly_to(points[0]), "auto"]
+    assert not subscribed(vehicle)
+    assert executor.status()["state"] == "failed"
+
+
+@pytest.mark.parametrize("points", [
+    [], {"lat": 1}, [{"lat": 49.2, "lng": -123.2}], [{"lat": 49.2, "lng": -123.2, "alt": "30"}],
+    [{"lat": 49.2, "lng": -123.2, "alt": True}], [{"lat": 91, "lng": -123.2, "alt": 30}], [None],
+])
+def test_check_points_rejects_bad_points(points):
+    with pytest.raises(Exception):
+        check_points(points)
+
+
+def test_check_points_accepts_points():
+    check_points([{"lat": 49.2, "lng": -123.2, "alt": 30}, {"lat": 49.3, "lng": -123.1, "alt": 30.5}])
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_status_endpoint(vehicle: Vehicle, app):
+    status = {"state": "flying", "leg": 0, "legs": 2, "target": at(0, 100), "distance": 60.0,
+              "remaining": 160.0, "eta": 16.0, "arrival": None}
+    vehicle.reroute_status.return_value = status
+
+    response = app.get(reroute_endpoint)
+
+    assert response.status_code == 200
+    assert json.loads(response.data) == status
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_cancel_without_reroute(vehicle: Vehicle, app):
+    vehicle.stop_reroute.side_effect = Exception("No reroute in progress")
+
+    response = app.delete(reroute_endpoint)
+
+    assert response.status_code == 400
+    assert json.loads(response.data) == {"error": "No reroute in progress"}
@@ -0,0 +1,108 @@
+from pymavlink.dialects.v10 import ardupilotmega as mavlink1
+from pymavlink.dialects.v20 import ardupilotmega as mavlink2
+
+from src.library.framing import FrameSplitter
+
+
+def heartbeat_v1():
+    mav = mavlink1.MAVLink(None, srcSystem=1)
+    return mavlink1.MAVLink_heartbeat_message(2, 3, 0, 0, 0, 3).pack(mav)
+
+
+def heartbeat_v2(signed=False):
+    mav = mavlink2.MAVLink(None, srcSystem=1)
+    if signed:
+        mav.signing.secret_key = bytes(32)
+        mav.signing.sign_outgoing = True
+        mav.signing.link_id = 0
+        mav.signing.timestamp = 1
+    return mavlink2.MAVLink_heartbeat_message(2, 3, 0, 0, 0, 3).pack(mav)
+
+
+def vfr_hud_v2():
+    mav = mavlink2.MAVLink(None, srcSystem=1)
+    return mavlink2.MAVLink_vfr_hud_message(12, 12, 90, 50, 100, 1).pack(mav)
+
+
+def split(data):
+    splitter = FrameSplitter()
+    splitter.feed(data)
+    return splitter, list(splitter.frames())
+
+
+def test_splits_v1_v2_and_signed_frames():
+    frames = [heartbeat_v1(), heartbeat_v2(), heartbeat_v2(signed=True), vfr_hud_v2()]
+
+    splitter, result = split(b"".join(frames))
+
+    assert result == [(0, frames[0]), (0, frames[1]), (0, frames[2]), (74, frames[3])]
+    assert len(frames[2]) == len(frames[1]) + 13
+    assert splitter.bad_bytes == 0
+    assert splitter.buf == bytearray()
+
+
+def test_partial_frames_are_kept_for_the_next_feed():
+    frame = vfr_hud_v2()
+    splitter = FrameSplitter()
+
+    for i in range(len(frame) - 1):
+        splitter.feed(frame[i:i + 1])
+        assert list(splitter.frames()) == []
+    splitter.feed(frame[-1:])
+
+    assert list(splitter.frames()) == [(74, frame)]
+    assert splitter.bad_bytes == 0
+
+
+def test_resyncs_after_garbage():
+    frame = heartbeat_v2()
+    # line noise, including a v2 magic with unknown incompat flags
+    noise = b"\x00\x11\x22\xfd\x09\x80\x00"
+
+    splitter, result = split(noise + frame)
+
+    assert result == [(0, frame)]
+    assert splitter.bad_bytes == len(noise)
+
+
+def test_false_sync_is_rejected_and_parsing_resumes():
+    frame = heartbeat_v2()
+    # a v1 header of a heartbeat, whose claimed frame swallows the start of the real one
+    false_sync = b"\xfe\x02\x00\x00\x00\x00"
+    splitter = FrameSplitter()
+    splitter.feed(false_sync + frame)
+
+    result = []
+    for msgid, data in splitter.frames():
+        result.append(data)
+        if data != frame:
+            # what the telemetry does when the frame fails its checksum
+            splitter.reject()
+
+    assert result == [false_sync + frame[:4], frame]
+    assert splitter.bad_bytes == len(false_sync)
+
+
+def test_stopping_early_keeps_the_remaining_frames():
+    first, second = heartbeat_v1(), vfr_hud_v2()
+    splitter = FrameSplitter()
+    splitter.feed(first + second)
+
+    for msgid, data in splitter.frames():
+        break
+
+    assert list(splitter.frames()) == [(74, second)]
+
+
+def test_frame_is_consumed_when_the_consumer_raises():
+    first, second = heartbeat_v1(), vfr_hud_v2()
+    splitter = FrameSplitter()
+    splitter.feed(first + second)
+
+    try:
+        for msgid, data in splitter.frames():
+            raise ValueError("handler failed")
+    except ValueError:
+        pass
+
+    assert list(splitter.frames()) == [(74, second)]
@@ -0,0 +1,114 @@
+import numpy as np
+from geographiclib.geodesic import Geodesic
+
+from src.library import geodesy
+
+
+def random_points(n, seed, lat_range=(-89, 89)):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(*lat_range, n), rng.uniform(-180, 180, n)
+
+
+def angle_difference(a, b):
+    return np.abs((np.asarray(a) - np.asarray(b) + 180) % 360 - 180)
+
+
+def testInverseMatchesGeographiclib():
+    lat1, lng1 = random_points(2000, 1)
+    lat2, lng2 = random_points(2000, 2)
+    # include nearly antipodal pairs, where vincenty does not converge
+    lat2[:10] = -lat1[:10] + 0.1
+    lng2[:10] = (lng1[:10] + 179.8 + 180) % 360 - 180
+
+    distance, azi1, azi2 = geodesy.inverse(lat1, lng1, lat2, lng2)
+
+    for i in range(len(lat1)):
+        expected = Geodesic.WGS84.Inverse(lat1[i], lng1[i], lat2[i], lng2[i])
+        assert abs(distance[i] - expected["s12"]) < 1e-3
+        assert angle_difference(azi1[i], expected["azi1"]) < 1e-6
+        assert angle_difference(azi2[i], expected["azi2"]) < 1e-6
+
+
+def testInverseMissionScale():
+    # points a few km apart around the competition field
+    lat1, lng1 = 38.1446, -76.4280
+    lat2 = lat1 + np.linspace(-0.02, 0.02, 40)
+    lng2 = lng1 + np.linspace(0.03, -0.03, 40)
+
+    distance = geodesy.distance(lat1, lng1, lat2, lng2)
+    bearing = geodesy.bearing(lat1, lng1, lat2, lng2)
+
+    assert distance.shape == (40,)
+    for i in range(40):
+        expected = Geodesic.WGS84.Inverse(lat1, lng1, lat2[i], lng2[i])
+        assert abs(distance[i] - expected["s12"]) < 1e-4
+        assert angle_difference(bearing[i], expected["azi1"]) < 1e-7
+
+
+def testScalarsAndCoincidentPoints():
+    assert geodesy.distance(49.26, -123.25, 49.26, -123.25) == 0
+    assert geodesy.bearing(0, 0, 0, 1) == 90
+    assert geodesy.bearing(0, 0, 1, 0) == 0
+    # bearings are in [0, 360)
+    assert abs(geodesy.bearing(0, 0, 0, -1) - 270) < 1e-9
+
+
+def testDestinationMatchesGeographiclib():
+    lat, lng = random_points(2000, 3)
+    rng = np.random.default_rng(4)
+    bearing = rng.uniform(0, 360, 2000)
+    distance = rng.uniform(0, 2e7, 2000)
+
+    lat2, lng2 = geodesy.destination(lat, lng, bearing, distance)
+
+    for i in range(len(lat)):
+        expected = Geodesic.WGS84.Direct(lat[i], lng[i], bearing[i], distance[i])
+        assert abs(lat2[i] - expected["lat2"]) < 1e-8
+        assert angle_difference(lng2[i], expected["lon2"]) < 1e-8
+
+
+def testDestinationRoundTrip():
+    lat, lng = 49.2578, -123.2470
+    bearings = np.arange(0, 360, 15)
+
+    lat2, lng2 = geodesy.destination(lat, lng, bearings, 1500)
+
+    assert np.allclose(geodesy.distance(lat, lng, lat2, lng2), 1500, atol=1e-6)
+    assert np.all(angle_difference(geodesy.bearing(lat, lng, lat2, lng2), bearings) < 1e-7)
+
+
+def closest_on_geodesic(lat, lng, start, end, steps=20000):
+    """brute force distance from a point to the geodesic start -> end"""
+    line = Geodesic.WGS84.InverseLine(start[0], start[1], end[0], end[1])
+    best = None
+    for s in np.linspace(0, line.s13, steps):
+        point = line.Position(s)
+        d = Geodesic.WGS84.Inverse(lat, lng, point["lat2"], point["lon2"])["s12"]
+        if best is None or d < best[0]:
+            best = (d, s)
+    return best
+
+
+def testCrossAndAlongTrack():
+    start = (38.1400, -76.4350)
+    end = (38.1550, -76.4150)
+    # points either side of a 2.4 km leg
+    lat = np.array([38.1500, 38.1450, 38.1430])
+    lng = np.array([-76.4300, -76.4150, -76.4260])
+
+    cross = geodesy.cross_track(lat, lng, *start, *end)
+    along = geodesy.along_track(lat, lng, *start, *end)
+
+    for i in range(len(lat)):
+        distance, s = closest_on_geodesic(lat[i], lng[i], start, end)
+        assert abs(abs(cross[i]) - distance) < 0.005 * distance + 0.5
+        assert abs(along[i] - s) < 0.005 * s + 0.5
+
+    # left of the leg heading north east, then right of it
+    assert cross[0] < 0
+    assert cross[1] > 0
+
+
+def testAlongTrackBehindStart():
+    along = geodesy.along_track(38.1390, -76.4370, 38.1400, -76.4350, 38.1550, -76.4150)
+    assert along < 0
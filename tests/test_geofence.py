@@ -0,0 +1,96 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from src.library.geofence import Geofence, GeofenceViolation
+from src.library.projection import LocalProjection
+from src.library.vehicle import Vehicle
+
+geofence_endpoint = "/aircraft/geofence"
+mission_endpoint = "/aircraft/mission"
+
+ORIGIN = (49.2578, -123.2470)
+PROJECTION = LocalProjection(*ORIGIN)
+
+
+def at(east, north):
+    location = PROJECTION.from_enu(east, north)
+    return {"lat": location.lat, "lng": location.lng, "alt": 30}
+
+
+GEOFENCE = {
+    "fence": [at(-500, -500), at(500, -500), at(500, 500), at(-500, 500)],
+    "obstacles": [
+        {"type": "circle", **at(0, 200), "radius": 50},
+        {"type": "polygon", "points": [at(200, -100), at(300, -100), at(250, 0)]},
+    ],
+}
+
+
+def test_route_inside_the_fence():
+    geofence = Geofence(PROJECTION, GEOFENCE)
+
+    assert geofence.violations([at(-100, 0), at(100, 100), at(-300, -300)], ["waypoint 0", "waypoint 1", "waypoint 2"]) == []
+
+
+def test_violations():
+    geofence = Geofence(PROJECTION, GEOFENCE)
+    points = [at(0, 0), at(0, 400), at(0, 600), at(250, -50)]
+    names = ["waypoint %d" % i for i in range(len(points))]
+
+    violations = geofence.violations(points, names)
+
+    assert sorted(violations) == sorted([
+        "Waypoint 2 is outside the geofence",
+        "Waypoint 3 is inside obstacle 1",
+        "The path from waypoint 0 to waypoint 1 crosses obstacle 0",
+        "The path from waypoint 1 to waypoint 2 crosses the geofence",
+        "The path from waypoint 2 to waypoint 3 crosses the geofence",
+        "The path from waypoint 2 to waypoint 3 crosses obstacle 1",
+    ])
+    with pytest.raises(GeofenceViolation) as raised:
+        geofence.check(points, names)
+    assert raised.value.violations == violations
+
+
+def test_route_back_into_the_fence():
+    geofence = Geofence(PROJECTION, GEOFENCE)
+
+    outside = {**at(0, 700), "name": "the current position"}
+    assert geofence.violations([at(0, 400)], ["point 0"], outside) == []
+
+    inside = {**at(0, 400), "name": "the current position"}
+    assert geofence.violations([at(0, 700)], ["point 0"], inside) == [
+        "Point 0 is outside the geofence",
+        "The path from the current position to point 0 crosses the geofence",
+    ]
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_set_geofence(vehicle: Vehicle, app):
+    response = app.put(geofence_endpoint, json=GEOFENCE)
+
+    assert response.status_code == 200
+    vehicle.set_geofence.assert_called_once_with(GEOFENCE)
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_set_invalid_geofence(vehicle: Vehicle, app):
+    vehicle.set_geofence.side_effect = Exception("The fence needs at least 3 points")
+
+    response = app.put(geofence_endpoint, json={"fence": [at(0, 0)]})
+
+    assert response.status_code == 400
+    assert json.loads(response.data) == {"error": "The fence needs at least 3 points"}
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_mission_rejected_by_geofence(vehicle: Vehicle, app):
+    violations = ["Waypoint 0 is outside the geofence"]
+    vehicle.waypoints.upload_mission_wps.side_effect = GeofenceViolation(violations)
+
+    response = app.post(mission_endpoint, json={"wps": [at(0, 700)], "takeoffAlt": 20, "rtl": False})
+
+    assert response.status_code == 400
+    assert json.loads(response.data)["violations"] == violations
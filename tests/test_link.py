@@ -0,0 +1,91 @@
+import socket
+import threading
+import time
+from types import SimpleNamespace
+
+from src.library.link import AsyncLink
+
+
+class FakeTelemetry:
+    """reads the bytes waiting on a socket, raising whatever the test queues up"""
+
+    def __init__(self):
+        self.sock, self.peer = socket.socketpair()
+        self.sock.setblocking(False)
+        self.heartbeats = []
+        self.mavlink_connection = SimpleNamespace(
+            fd=self.sock.fileno(),
+            mav=SimpleNamespace(heartbeat_send=lambda *args: self.heartbeats.append(time.monotonic())))
+        self.errors = []
+        self.received = []
+        self.read = threading.Event()
+
+    def receive_messages(self):
+        data = self.sock.recv(4096)
+        self.received.append(data)
+        self.read.set()
+        if self.errors:
+            raise self.errors.pop(0)
+
+    def send(self, data):
+        self.read.clear()
+        self.peer.send(data)
+        return self.read.wait(1)
+
+
+def stop(link):
+    link.loop.call_soon_threadsafe(link.loop.stop)
+    link.thread.join()
+
+
+def test_heartbeats_sent_on_a_fixed_schedule():
+    telemetry = FakeTelemetry()
+    link = AsyncLink(telemetry, heartbeat_interval=0.05)
+    link.start()
+    time.sleep(0.53)
+    stop(link)
+
+    intervals = [b - a for a, b in zip(telemetry.heartbeats, telemetry.heartbeats[1:])]
+    assert 10 <= len(telemetry.heartbeats) <= 12
+    assert all(0.03 < interval < 0.08 for interval in intervals)
+
+
+def test_blocked_loop_does_not_send_a_burst():
+    telemetry = FakeTelemetry()
+    link = AsyncLink(telemetry, heartbeat_interval=0.05)
+    link.start()
+    time.sleep(0.1)
+    # blocks the loop for 6 periods
+    link.loop.call_soon_threadsafe(time.sleep, 0.3)
+    time.sleep(0.5)
+    stop(link)
+
+    intervals = [b - a for a, b in zip(telemetry.heartbeats, telemetry.heartbeats[1:])]
+    assert max(intervals) > 0.25
+    assert min(intervals) > 0.03
+
+
+def test_reader_survives_errors_other_than_io():
+    telemetry = FakeTelemetry()
+    link = AsyncLink(telemetry)
+    link.start()
+
+    telemetry.errors.append(AttributeError("total"))
+    assert telemetry.send(b"first")
+    assert telemetry.send(b"second")
+    stop(link)
+
+    assert telemetry.received == [b"first", b"second"]
+
+
+def test_reader_removed_on_io_error():
+    telemetry = FakeTelemetry()
+    link = AsyncLink(telemetry)
+    link.start()
+
+    telemetry.errors.append(ConnectionResetError("closed"))
+    assert telemetry.send(b"first")
+    assert not telemetry.send(b"second")
+    stop(link)
+
+    assert telemetry.received == [b"first"]
@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+
+from pymavlink.dialects.v10 import ardupilotmega as mavlink1
+from pymavlink.dialects.v20 import ardupilotmega as mavlink2
+
+from src.library.mission_cache import MissionCache
+
+
+def mission_current(message):
+    message._header = mavlink2.MAVLink_header(message.id, srcSystem=1)
+    return message
+
+
+def cache_with_mission(items):
+    cache = MissionCache(SimpleNamespace(target_system=1, source_system=255))
+    cache.store([object()] * items)
+    return cache
+
+
+def test_total_change_invalidates():
+    cache = cache_with_mission(4)
+
+    cache.on_current(mission_current(mavlink2.MAVLink_mission_current_message(1, 3)))
+    assert cache.snapshot()[1] is not None
+    cache.on_current(mission_current(mavlink2.MAVLink_mission_current_message(1, 5)))
+
+    assert cache.snapshot() == (None, None)
+
+
+def test_mavlink1_mission_current_without_total_is_ignored():
+    cache = cache_with_mission(4)
+
+    cache.on_current(mission_current(mavlink1.MAVLink_mission_current_message(1)))
+
+    assert cache.snapshot()[1] is not None
@@ -0,0 +1,325 @@
+import queue
+import threading
+from types import SimpleNamespace
+
+import pytest
+from pymavlink import mavutil
+from pymavlink.dialects.v20 import ardupilotmega as mavlink2
+
+from src.library.dispatch import Dispatcher
+from src.library.mission_transfer import MissionDownload, MissionPartialUpload, MissionUpload, changed_ranges
+
+ACCEPTED = mavutil.mavlink.MAV_MISSION_ACCEPTED
+
+
+def from_vehicle(message):
+    message._header = mavlink2.MAVLink_header(message.id, srcSystem=1)
+    return message
+
+
+def request(seq):
+    return from_vehicle(mavlink2.MAVLink_mission_request_int_message(255, 0, seq))
+
+
+def ack(result=ACCEPTED):
+    return from_vehicle(mavlink2.MAVLink_mission_ack_message(255, 0, result))
+
+
+def item(seq, lat=49.2578):
+    return mavlink2.MAVLink_mission_item_int_message(
+        1, 1, seq, mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT, mavutil.mavlink.MAV_CMD_NAV_WAYPOINT,
+        0, 1, 0, 0, 0, 0, int((lat + seq * 1e-4) * 1e7), int(-123.2470 * 1e7), 50)
+
+
+def vehicle_item(seq):
+    msg = item(seq)
+    msg.target_system = 255
+    return from_vehicle(msg)
+
+
+class ScriptedLink:
+    """
+    the mavlink connection and dispatcher a transfer uses. everything sent is recorded,
+    and the replies script(sent) returns are dispatched from another thread, like the
+    telemetry does
+    """
+
+    target_system = 1
+    target_component = 1
+    source_system = 255
+
+    def __init__(self, script):
+        self.script = script
+        self.sent = []
+        self.dispatcher = Dispatcher()
+        self.telemetry = SimpleNamespace(dispatcher=self.dispatcher, mavlink_connection=self)
+        self.mav = self
+        self.outbox = queue.Queue()
+        threading.Thread(target=self.respond, daemon=True).start()
+
+    def record(self, sent):
+        self.sent.append(sent)
+        self.outbox.put(sent)
+
+    def respond(self):
+        while True:
+            for reply in self.script(self.outbox.get()):
+                self.dispatcher.dispatch(reply)
+
+    def sent_of(self, kind):
+        return [sent[1:] for sent in self.sent if sent[0] == kind]
+
+    def waypoint_count_send(self, count):
+        self.record(("count", count))
+
+    def waypoint_request_list_send(self):
+        self.record(("list",))
+
+    def send(self, msg):
+        self.record(("item", msg.seq, msg.get_type()))
+
+    def mission_write_partial_list_send(self, target_system, target_component, start, end):
+        self.record(("partial", start, end))
+
+    def mission_request_int_send(self, target_system, target_component, seq):
+        self.record(("request", seq))
+
+    def mission_ack_send(self, target_system, target_component, result):
+        self.record(("ack", result))
+
+
+def autopilot_upload(count, start=0, drop=(), duplicate=(), result=ACCEPTED):
+    """
+    replies like the autopilot to an upload of items start..count-1. requests for seqs
+    in drop are lost the first time, requests for seqs in duplicate are sent twice
+    """
+    dropped = set()
+
+    def script(sent):
+        if sent[0] in ("count", "partial"):
+            if result != ACCEPTED:
+                return [ack(result)]
+            seq = start
+        elif sent[0] == "item":
+            seq = sent[1] + 1
+            if seq == count:
+                return [ack()]
+        else:
+            return []
+        if seq in drop and seq not in dropped:
+            dropped.add(seq)
+            return []
+        return [request(seq)] * (2 if seq in duplicate else 1)
+
+    return script
+
+
+def test_upload_answers_every_request():
+    link = ScriptedLink(autopilot_upload(4))
+
+    assert MissionUpload(link.telemetry, [item(seq) for seq in range(4)]).run() == 4
+
+    assert link.sent_of("count") == [(4,)]
+    assert link.sent_of("item") == [(seq, "MISSION_ITEM_INT") for seq in range(4)]
+    assert not link.dispatcher.subscribed(mavutil.mavlink.MAVLINK_MSG_ID_MISSION_REQUEST_INT)
+    assert not link.dispatcher.subscribed(mavutil.mavlink.MAVLINK_MSG_ID_MISSION_ACK)
+
+
+def test_upload_answers_legacy_requests_with_float_items():
+    def script(sent):
+        if sent[0] == "count":
+            return [from_vehicle(mavlink2.MAVLink_mission_request_message(255, 0, 0))]
+        return [ack()]
+
+    link = ScriptedLink(script)
+    MissionUpload(link.telemetry, [item(0)]).run()
+
+    assert link.sent_of("item") == [(0, "MISSION_ITEM")]
+
+
+def test_upload_answers_a_duplicate_request_again():
+    link = ScriptedLink(autopilot_upload(3, duplicate={1}))
+
+    upload = MissionUpload(link.telemetry, [item(seq) for seq in range(3)], timeout=0.5)
+    upload.run()
+
+    assert [sent[0] for sent in link.sent_of("item")].count(1) == 2
+    assert upload.retransmits == 0
+
+
+def test_upload_retransmits_after_a_dropped_request():
+    link = ScriptedLink(autopilot_upload(3, drop={0, 2}))
+
+    upload = MissionUpload(link.telemetry, [item(seq) for seq in range(3)], timeout=0.05)
+    assert upload.run() == 3
+
+    # the count is sent again for the first request, the previous item for the last
+    assert link.sent_of("count") == [(3,), (3,)]
+    assert [sent[0] for sent in link.sent_of("item")] == [0, 1, 1, 2]
+    assert upload.retransmits == 2
+
+
+def test_upload_fails_on_a_nack():
+    link = ScriptedLink(autopilot_upload(3, result=mavutil.mavlink.MAV_MISSION_NO_SPACE))
+
+    with pytest.raises(Exception, match="MISSION_ACK type %d" % mavutil.mavlink.MAV_MISSION_NO_SPACE):
+        MissionUpload(link.telemetry, [item(seq) for seq in range(3)]).run()
+
+    assert link.sent_of("item") == []
+
+
+def test_upload_gives_up_without_a_response():
+    link = ScriptedLink(lambda sent: [])
+
+    with pytest.raises(Exception, match="no response"):
+        MissionUpload(link.telemetry, [item(0)], timeout=0.02, retries=2).run()
+
+    assert link.sent_of("count") == [(1,)] * 3
+
+
+def test_upload_ignores_other_systems():
+    def script(sent):
+        if sent[0] != "count":
+            return []
+        other = mavlink2.MAVLink_mission_ack_message(255, 0, mavutil.mavlink.MAV_MISSION_ERROR)
+        other._header = mavlink2.MAVLink_header(other.id, srcSystem=2)
+        return [other, request(0)]
+
+    link = ScriptedLink(script)
+    upload = MissionUpload(link.telemetry, [item(0)], timeout=0.05, retries=1)
+
+    with pytest.raises(Exception, match="no response"):
+        upload.run()
+    assert upload.result is None
+
+
+def test_partial_upload_writes_the_range():
+    link = ScriptedLink(autopilot_upload(4, start=2))
+
+    MissionPartialUpload(link.telemetry, [item(2), item(3)]).run()
+
+    assert link.sent_of("partial") == [(2, 3)]
+    assert link.sent_of("item") == [(2, "MISSION_ITEM_INT"), (3, "MISSION_ITEM_INT")]
+
+
+def autopilot_download(count, drop=(), duplicate=(), legacy=()):
+    """
+    replies like the autopilot to a download of count items. the first request for
+    each seq in drop is lost, items in duplicate are sent twice and items in legacy as
+    float MISSION_ITEMs
+    """
+    dropped = set()
+
+    def script(sent):
+        if sent[0] == "list":
+            return [from_vehicle(mavlink2.MAVLink_mission_count_message(255, 0, count))]
+        if sent[0] != "request":
+            return []
+        seq = sent[1]
+        if seq in drop and seq not in dropped:
+            dropped.add(seq)
+            return []
+        if seq in legacy:
+            msg = item(seq)
+            reply = from_vehicle(mavlink2.MAVLink_mission_item_message(
+                255, 0, seq, msg.frame, msg.command, msg.current, msg.autocontinue,
+                0, 0, 0, 0, msg.x * 1e-7, msg.y * 1e-7, msg.z))
+        else:
+            reply = vehicle_item(seq)
+        return [reply] * (2 if seq in duplicate else 1)
+
+    return script
+
+
+def test_download_keeps_a_window_of_requests():
+    link = ScriptedLink(autopilot_download(12, duplicate={3}, legacy={5}))
+
+    download = MissionDownload(link.telemetry, window=4)
+    items = download.run()
+
+    assert [msg.seq for msg in items] == list(range(12))
+    assert items[5].x == item(5).x
+    assert sorted(seq for (seq,) in link.sent_of("request")) == list(range(12))
+    assert link.sent_of("ack") == [(ACCEPTED,)]
+    assert download.retransmits == 0
+
+
+def test_download_requests_a_dropped_item_again():
+    link = ScriptedLink(autopilot_download(6, drop={2}))
+
+    download = MissionDownload(link.telemetry, timeout=0.05)
+    items = download.run()
+
+    assert [msg.seq for msg in items] == list(range(6))
+    assert [seq for (seq,) in link.sent_of("request")].count(2) == 2
+    assert download.retransmits == 1
+
+
+def test_download_gives_up_without_a_count():
+    link = ScriptedLink(lambda sent: [])
+
+    with pytest.raises(Exception, match="no MISSION_COUNT"):
+        MissionDownload(link.telemetry, timeout=0.02, retries=1).run()
+
+    assert link.sent_of("list") == [()] * 2
+
+
+def test_download_fails_after_the_deadline():
+    # every item is lost, but the per item retries would outlast the deadline
+    link = ScriptedLink(autopilot_download(3, drop=range(3)))
+
+    with pytest.raises(Exception, match="deadline"):
+        MissionDownload(link.telemetry, timeout=1, retries=10, deadline=0.1).run()
+
+    assert link.sent_of("ack") == []
+
+
+def test_changed_ranges_of_empty_missions():
+    assert changed_ranges([], []) == []
+    # the home item is not compared
+    assert changed_ranges([item(0)], [item(0, lat=0)]) == []
+
+
+def test_changed_ranges_all_changed():
+    current = [item(seq) for seq in range(5)]
+    wanted = [item(seq, lat=0) for seq in range(5)]
+
+    assert changed_ranges(current, wanted) == [(1, 4)]
+    assert changed_ranges(current, wanted, first=0) == [(0, 4)]
+
+
+def test_changed_ranges_splits_runs():
+    current = [item(seq) for seq in range(8)]
+    wanted = list(current)
+    for seq in (1, 2, 4, 7):
+        wanted[seq] = item(seq, lat=0)
+
+    assert changed_ranges(current, wanted) == [(1, 2), (4, 4), (7, 7)]
+
+
+def test_changed_ranges_ignores_autopilot_rounding():
+    current = [item(seq) for seq in range(3)]
+    wanted = [item(seq) for seq in range(3)]
+    wanted[1].z += 0.005
+    wanted[2].autocontinue = 0
+
+    assert changed_ranges(current, wanted) == []
+
+
+def test_round_trip_over_a_lossy_link():
+    from benchmarks.fake_autopilot import FakeAutopilot, connect
+
+    autopilot = FakeAutopilot(baud=0, latency=0.005, loss=0.05, stream_rate=0, seed=3).start()
+    vehicle = connect(autopilot)
+    try:
+        items = [item(seq) for seq in range(20)]
+        MissionUpload(vehicle.telemetry, items, timeout=0.2, retries=10).run()
+        wanted = items[:5] + [item(seq, lat=0) for seq in range(5, 8)] + items[8:]
+        MissionPartialUpload(vehicle.telemetry, wanted[5:8], timeout=0.2, retries=10).run()
+
+        downloaded = MissionDownload(vehicle.telemetry, timeout=0.2, retries=10).run()
+
+        assert changed_ranges(downloaded, wanted, first=0) == []
+    finally:
+        autopilot.close()
+        vehicle.mavlink_connection.close()
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from src.library.planner import CircleObstacle, PolygonObstacle, VisibilityPlanner
+
+
+def path_length(path):
+    return np.linalg.norm(np.diff(np.array(path), axis=0), axis=1).sum()
+
+
+def min_clearance(planner, path):
+    """smallest distance to an obstacle along the path, sampled every few centimetres"""
+    worst = np.inf
+    for a, b in zip(np.array(path[:-1]), np.array(path[1:])):
+        samples = a + np.linspace(0, 1, 2000)[:, None] * (b - a)
+        worst = min(worst, planner.clearances(samples).min())
+    return worst
+
+
+def test_straight_line_without_obstacles_in_the_way():
+    planner = VisibilityPlanner([CircleObstacle(0, 500, 50)], margin=10)
+
+    assert planner.plan((0, 0), (100, 0)) == [(0, 0), (100, 0)]
+
+
+def test_detours_around_circle_with_margin():
+    planner = VisibilityPlanner([CircleObstacle(0, 0, 50)], margin=10)
+
+    path = planner.plan((-200, 0), (200, 0))
+
+    assert len(path) > 2
+    assert min_clearance(planner, path) >= 10 - 1e-6
+    # hugging the 60 m clearance circle is about 2 * sqrt(200^2 - 60^2) + 60 * (pi - 2 acos(60 / 200))
+    shortest = 2 * np.sqrt(200 ** 2 - 60 ** 2) + 60 * (np.pi - 2 * np.arccos(60 / 200))
+    assert shortest <= path_length(path) < shortest * 1.02
+
+
+def test_detours_around_concave_polygon():
+    # a U opening to the west, with the start inside it
+    u_shape = PolygonObstacle([(0, -100), (100, -100), (100, 100), (0, 100), (0, 80), (80, 80), (80, -80), (0, -80)])
+    planner = VisibilityPlanner([u_shape], margin=5)
+
+    path = planner.plan((40, 0), (200, 0))
+
+    assert min_clearance(planner, path) >= 5 - 1e-6
+    # out of the U, around a corner and back
+    assert path_length(path) > 200
+
+
+def test_route_through_several_goals():
+    planner = VisibilityPlanner([CircleObstacle(100, 0, 30), PolygonObstacle([(250, -40), (290, -40), (270, 40)])],
+                                margin=10)
+
+    legs = planner.plan_route((0, 0), [(200, 0), (400, 0)])
+
+    assert len(legs) == 2
+    assert legs[0][-1] == (200, 0)
+    assert legs[1][-1] == (400, 0)
+    assert min_clearance(planner, [(0, 0)] + legs[0]) >= 10 - 1e-6
+    assert min_clearance(planner, [(200, 0)] + legs[1]) >= 10 - 1e-6
+
+
+def test_start_close_to_obstacle_can_leave():
+    planner = VisibilityPlanner([CircleObstacle(0, 0, 50)], margin=10)
+
+    path = planner.plan((0, 55), (0, 300))
+
+    assert path == [(0, 55), (0, 300)]
+
+
+def test_goal_inside_obstacle():
+    planner = VisibilityPlanner([CircleObstacle(0, 0, 50)], margin=10)
+
+    with pytest.raises(Exception, match="goal is inside an obstacle"):
+        planner.plan((-200, 0), (10, 0))
+
+
+def test_goal_enclosed_by_obstacles():
+    ring = [CircleObstacle(100 * np.cos(a), 100 * np.sin(a), 30) for a in np.linspace(0, 2 * np.pi, 12, endpoint=False)]
+    planner = VisibilityPlanner(ring, margin=10)
+
+    with pytest.raises(Exception, match="No path"):
+        planner.plan((-300, 0), (0, 0))
+
+
+def test_update_matches_a_new_planner():
+    obstacles = [CircleObstacle(100, 0, 30), CircleObstacle(250, 40, 40),
+                 PolygonObstacle([(150, -80), (200, -80), (175, -20)])]
+    planner = VisibilityPlanner(obstacles, margin=10)
+    planner.plan((0, 0), (400, 0))
+
+    for east in [100, 110, 130, 180]:
+        obstacles = [CircleObstacle(east, 0, 30)] + obstacles[1:]
+        planner.update(obstacles)
+
+        expected = VisibilityPlanner(obstacles, margin=10).plan((0, 0), (400, 0))
+        assert path_length(planner.plan((0, 0), (400, 0))) == pytest.approx(path_length(expected))
+
+    planner.update(obstacles[1:])
+    assert planner.plan((0, 0), (400, 0)) == VisibilityPlanner(obstacles[1:], margin=10).plan((0, 0), (400, 0))
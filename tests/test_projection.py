@@ -0,0 +1,99 @@
+import math
+
+import numpy as np
+import pytest
+from geographiclib.geodesic import Geodesic
+
+from src.library.projection import LocalProjection
+
+ORIGINS = [(0, -123.25), (49.2578, -123.247), (75, 20)]
+
+
+def angle_difference(a, b):
+    return abs((a - b + 180) % 360 - 180)
+
+
+def pairs(projection, n, seed):
+    """n random pairs of local points, half of them on the edge of the radius"""
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        points = []
+        for edge in (True, rng.random() < 0.5):
+            angle = rng.uniform(0, 2 * math.pi)
+            distance = projection.radius * (0.999 if edge else rng.uniform(0, 1))
+            location = projection.from_enu(distance * math.sin(angle), distance * math.cos(angle))
+            points.append(projection.point(location.lat, location.lng))
+        yield points
+
+
+@pytest.mark.parametrize("lat, lng", ORIGINS)
+@pytest.mark.parametrize("max_error", [0.1, 1.0])
+def test_distance_error_within_bound_up_to_the_radius(lat, lng, max_error):
+    projection = LocalProjection(lat, lng, max_error=max_error)
+
+    for a, b in pairs(projection, 500, seed=1):
+        assert a.local and b.local
+        expected = Geodesic.WGS84.Inverse(a.lat, a.lng, b.lat, b.lng)["s12"]
+        assert abs(projection.distance(a, b) - expected) <= max_error
+
+
+@pytest.mark.parametrize("lat, lng", ORIGINS)
+def test_bearing_corrected_for_meridian_convergence(lat, lng):
+    projection = LocalProjection(lat, lng)
+
+    for a, b in pairs(projection, 500, seed=2):
+        inverse = Geodesic.WGS84.Inverse(a.lat, a.lng, b.lat, b.lng)
+        if inverse["s12"] < 100:
+            continue
+        assert angle_difference(projection.bearing(a, b), inverse["azi1"]) < 0.01
+
+
+def test_bearing_off_the_origin_meridian():
+    projection = LocalProjection(60, 10)
+    east = projection.from_enu(projection.radius * 0.9, 0)
+    a = projection.point(east.lat, east.lng)
+    north = projection.from_enu(projection.radius * 0.9, 1000)
+    b = projection.point(north.lat, north.lng)
+
+    expected = Geodesic.WGS84.Inverse(a.lat, a.lng, b.lat, b.lng)["azi1"]
+    grid = math.degrees(math.atan2(b.east - a.east, b.north - a.north))
+
+    # grid north is a fraction of a degree off true north this far from the meridian
+    assert angle_difference(grid, expected) > 0.2
+    assert angle_difference(projection.bearing(a, b), expected) < 0.01
+
+
+def test_falls_back_to_the_geodesic_past_the_radius():
+    projection = LocalProjection(49.2578, -123.247, max_error=0.1)
+    outside = projection.from_enu(projection.radius * 1.01, 0)
+    inside = projection.from_enu(0, projection.radius * 0.5)
+    a = projection.point(inside.lat, inside.lng)
+    b = projection.point(outside.lat, outside.lng)
+
+    assert a.local and not b.local
+    assert not projection.contains(outside.lat, outside.lng)
+    expected = Geodesic.WGS84.Inverse(a.lat, a.lng, b.lat, b.lng)
+    assert projection.distance(a, b) == pytest.approx(expected["s12"], abs=1e-6)
+    assert projection.bearing(a, b) == pytest.approx(expected["azi1"] % 360, abs=1e-9)
+
+
+@pytest.mark.parametrize("lat, lng", ORIGINS)
+def test_enu_round_trip(lat, lng):
+    projection = LocalProjection(lat, lng, 50)
+    rng = np.random.default_rng(3)
+
+    for east, north, up in rng.uniform(-20000, 20000, (200, 3)):
+        location = projection.from_enu(east, north, up / 100)
+        point = projection.point(location.lat, location.lng, location.alt)
+        assert point.east == pytest.approx(east, abs=1e-4)
+        assert point.north == pytest.approx(north, abs=1e-4)
+        assert point.up == pytest.approx(up / 100, abs=1e-4)
+
+
+def test_origin_altitude_is_up():
+    projection = LocalProjection(49.2578, -123.247, 100)
+
+    point = projection.point(49.2578, -123.247, 130)
+
+    assert (point.east, point.north) == pytest.approx((0, 0), abs=1e-6)
+    assert point.up == pytest.approx(30, abs=1e-6)
@@ -41,3 +41,62 @@ def test_reroute_endpoint_calls_vehicle_reroute_with_waypoints(vehicle: Vehicle,
     assert json.loads(response.data) == gps_response
 
     vehicle.reroute.assert_called_once_with(test_data["waypoints"])
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_reroute_endpoint_plans_around_obstacles(vehicle: Vehicle, app):
+    test_data = {
+        "waypoints": [{"alt": 15, "lat": 49.2590, "lng": -123.2400}],
+        "obstacles": [
+            {"type": "circle", "lat": 49.2585, "lng": -123.2405, "radius": 20},
+            {"type": "polygon", "points": [
+                {"lat": 49.2580, "lng": -123.2410},
+                {"lat": 49.2582, "lng": -123.2408},
+                {"lat": 49.2579, "lng": -123.2407},
+            ]},
+        ],
+    }
+    vehicle.telemetry.get_location.return_value = {"alt": 111.0, "heading": 131, "lat": 49.2578, "lng": -123.2412}
+
+    response = app.post(reroute_endpoint, json=test_data)
+
+    assert response.status_code == 200
+    vehicle.reroute.assert_called_once_with(test_data["waypoints"], test_data["obstacles"])
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_reroute_endpoint_rejects_unreachable_waypoints(vehicle: Vehicle, app):
+    test_data = {
+        "waypoints": [{"alt": 15, "lat": 49.2585, "lng": -123.2405}],
+        "obstacles": [{"type": "circle", "lat": 49.2585, "lng": -123.2405, "radius": 20}],
+    }
+    vehicle.reroute.side_effect = Exception("The goal is inside an obstacle")
+
+    response = app.post(reroute_endpoint, json=test_data)
+
+    assert response.status_code == 400
+    assert json.loads(response.data) == {"error": "The goal is inside an obstacle"}
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_obstacle_update_replans_active_reroute(vehicle: Vehicle, app):
+    obstacles = [{"type": "circle", "lat": 49.2585, "lng": -123.2405, "radius": 20}]
+    remaining = [{"alt": 15, "lat": 49.2586, "lng": -123.2409}, {"alt": 15, "lat": 49.2590, "lng": -123.2400}]
+    vehicle.replan_reroute.return_value = remaining
+
+    response = app.put(reroute_endpoint + "/obstacles", json={"obstacles": obstacles})
+
+    assert response.status_code == 200
+    assert json.loads(response.data) == {"waypoints": remaining}
+    vehicle.replan_reroute.assert_called_once_with(obstacles)
+    vehicle.reroute.assert_not_called()
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_obstacle_update_without_reroute(vehicle: Vehicle, app):
+    vehicle.replan_reroute.side_effect = Exception("No reroute in progress")
+
+    response = app.put(reroute_endpoint + "/obstacles", json={"obstacles": []})
+
+    assert response.status_code == 400
+    assert json.loads(response.data) == {"error": "No reroute in progress"}
@@ -0,0 +1,54 @@
+from src.library.route import Route
+
+
+def point(lat):
+    return {"lat": lat, "lng": -123.24, "alt": 20}
+
+
+def test_follows_legs_then_finishes():
+    goals = [point(1), point(2)]
+    detour = point(0.5)
+    route = Route(goals, [[detour, goals[0]], [goals[1]]])
+
+    for expected in [detour, goals[0], goals[1]]:
+        assert route.target() is expected
+        route.reached(expected)
+
+    assert route.target() is None
+    assert route.finished()
+
+
+def test_replace_while_flying_a_detour():
+    goals = [point(1), point(2)]
+    route = Route(goals, [[point(0.5), goals[0]], [goals[1]]])
+    remaining, version = route.remaining_goals()
+
+    detour = point(0.7)
+    route.replace([[detour, goals[0]], [goals[1]]], version)
+
+    assert remaining == goals
+    assert route.target() is detour
+
+
+def test_replace_drops_goals_reached_while_planning():
+    goals = [point(1), point(2)]
+    route = Route(goals, [[goals[0]], [goals[1]]])
+    _, version = route.remaining_goals()
+    route.reached(goals[0])
+
+    route.replace([[point(0.5), goals[0]], [point(1.5), goals[1]]], version)
+
+    assert route.target()["lat"] == 1.5
+    assert route.remaining_goals()[0] == [goals[1]]
+
+
+def test_stale_arrival_is_ignored():
+    goals = [point(1)]
+    old_detour = point(0.5)
+    route = Route(goals, [[old_detour, goals[0]]])
+    _, version = route.remaining_goals()
+    route.replace([[point(0.7), goals[0]]], version)
+
+    route.reached(old_detour)
+
+    assert route.target()["lat"] == 0.7
@@ -0,0 +1,143 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.library.dispatch import Dispatcher
+from src.library.executor import Arrival, RerouteExecutor
+from src.library.projection import LocalProjection
+from src.library.route import Route
+from src.library.setpoints import SetpointStreamer, lookahead_point
+
+ORIGIN = (49.2578, -123.2470)
+PROJECTION = LocalProjection(*ORIGIN)
+
+# east, north, alt: a leg north from the origin, then east
+PATH = [(0, 0, 30), (0, 100, 30), (100, 100, 50)]
+
+
+def at(east, north, alt=30):
+    location = PROJECTION.from_enu(east, north)
+    return {"lat": location.lat, "lng": location.lng, "alt": alt}
+
+
+def local(east, north):
+    point = at(east, north)
+    return PROJECTION.point(point["lat"], point["lng"])
+
+
+class FakeVehicle:
+    def __init__(self):
+        self.telemetry = SimpleNamespace(dispatcher=Dispatcher(), lat=None, lng=None, alt=None, vx=None, vy=None)
+        self.commands = []
+        self.setpoints = []
+
+    def local_projection(self, lat, lng):
+        return PROJECTION
+
+    def fly_to(self, lat, lng, alt):
+        self.commands.append("fly_to")
+
+    def set_guided(self):
+        self.commands.append("guided")
+
+    def set_auto(self):
+        self.commands.append("auto")
+
+    def send_setpoint(self, lat, lng, alt):
+        local = PROJECTION.point(lat, lng)
+        self.setpoints.append((local.east, local.north, alt))
+
+    def move(self, east, north):
+        point = at(east, north)
+        self.telemetry.lat, self.telemetry.lng, self.telemetry.alt = point["lat"], point["lng"], point["alt"]
+
+
+def test_lookahead_along_the_leg():
+    assert lookahead_point(PATH, (0, 20), 40) == pytest.approx([0, 60, 30])
+    # off to the side of the leg, the setpoint pulls back onto it
+    assert lookahead_point(PATH, (15, 20), 40) == pytest.approx([0, 60, 30])
+
+
+def test_lookahead_cuts_the_corner():
+    assert lookahead_point(PATH, (0, 80), 40) == pytest.approx([20, 100, 34])
+
+
+def test_lookahead_stops_at_the_end():
+    assert lookahead_point(PATH, (0, 100), 500) == pytest.approx([100, 100, 50])
+    assert lookahead_point(PATH[1:2], (0, 0), 40) == pytest.approx([0, 100, 30])
+
+
+def test_streamer_sends_the_lookahead_point():
+    vehicle = FakeVehicle()
+    streamer = SetpointStreamer(vehicle, rate=10, lookahead=40)
+    streamer.tick()
+    streamer.follow(PROJECTION, PATH)
+    streamer.tick()
+    vehicle.move(0, 20)
+    streamer.tick()
+
+    assert len(vehicle.setpoints) == 1
+    assert np.allclose(vehicle.setpoints[0], [0, 60, 30], atol=0.01)
+
+
+def test_executor_streams_instead_of_fly_to():
+    vehicle = FakeVehicle()
+    points = [at(0, 100), at(100, 100, 50)]
+    streamer = SetpointStreamer(vehicle, rate=100, lookahead=40)
+    executor = RerouteExecutor(vehicle, Route(points, [[point] for point in points]),
+                               Arrival(radius=1, pass_plane=True), streamer)
+    vehicle.move(0, 0)
+
+    executor.start()
+    assert streamer.path == pytest.approx(np.array(PATH), abs=0.01)
+    # past the corner, the path now starts at it
+    vehicle.move(20, 101)
+    executor.on_position(None)
+    assert streamer.path == pytest.approx(np.array([PATH[1], PATH[2]]), abs=0.01)
+    vehicle.move(100, 100)
+    executor.on_position(None)
+
+    assert vehicle.commands == ["guided", "auto"]
+    assert streamer.stopped.is_set()
+    assert not streamer.thread.is_alive()
+
+
+def test_failing_setpoints_fall_back_to_fly_to():
+    vehicle = FakeVehicle()
+    points = [at(0, 100), at(100, 100, 50)]
+    streamer = SetpointStreamer(vehicle, rate=100, lookahead=40)
+    executor = RerouteExecutor(vehicle, Route(points, [[point] for point in points]),
+                               Arrival(radius=1, pass_plane=True), streamer)
+    vehicle.move(0, 0)
+    vehicle.send_setpoint = lambda lat, lng, alt: 1 / 0
+
+    executor.start()
+    streamer.thread.join(2)
+
+    assert not streamer.thread.is_alive()
+    assert vehicle.commands == ["guided", "fly_to"]
+    # the next point is flown to with fly_to too
+    vehicle.move(20, 101)
+    executor.on_position(None)
+    assert vehicle.commands == ["guided", "fly_to", "fly_to"]
+    assert executor.status()["state"] == "flying"
+
+
+def test_lookahead_follows_the_next_leg_through_a_sharp_turn():
+    hairpin = [(0, 0, 30), (0, 100, 30), (30, 0, 30)]
+
+    # cutting inside the turn, nearer the next leg than the current one
+    east, north, _ = lookahead_point(hairpin, (12, 80), 20)
+
+    assert east > 12 and north < 80
+
+
+def test_pass_plane_bisects_the_turn():
+    arrival = Arrival(radius=1, pass_plane=True)
+    start, target, after = local(0, 0), local(0, 100), local(30, 0)
+    # inside the hairpin, short of the plane square to the leg but past the bisector
+    current = local(12, 96)
+
+    assert arrival.reached(start, current, target, 12.6, 0) is None
+    assert arrival.reached(start, current, target, 12.6, 0, after) == "pass plane"
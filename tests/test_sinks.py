@@ -0,0 +1,137 @@
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from src.library.sinks import CallbackSink, FileSink, HttpPostSink, SinkFanout, TelemetrySink, UdpSink, create_sink
+
+
+def sample(i=0):
+    return {
+        "timestamp": 1000.0 + i,
+        "lat": 49.2578,
+        "lng": -123.247,
+        "alt": 100.0 + i,
+        "heading": 90.0,
+        "groundspeed": 12.0,
+        "armed": True,
+    }
+
+
+def wait_until(condition, timeout=1):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_create_sink_from_config(tmp_path):
+    udp = create_sink({"type": "udp", "host": "127.0.0.1", "port": 14600, "rate": 5, "fields": ["lat", "lng"]})
+    file = create_sink({"type": "file", "path": str(tmp_path / "track.jsonl")})
+    http = create_sink({"type": "http", "url": "http://127.0.0.1:1/telemetry", "timeout": 1})
+
+    assert isinstance(udp, UdpSink)
+    assert udp.address == ("127.0.0.1", 14600)
+    assert udp.min_interval == pytest.approx(0.2)
+    assert udp.fields == ("lat", "lng")
+    assert isinstance(file, FileSink)
+    assert isinstance(http, HttpPostSink)
+    assert http.timeout == 1
+
+
+def test_create_sink_rejects_bad_config():
+    with pytest.raises(Exception, match="Invalid sink type"):
+        create_sink({"type": "carrier pigeon"})
+    with pytest.raises(Exception, match="Invalid sink field: speed"):
+        create_sink({"type": "udp", "host": "127.0.0.1", "port": 14600, "fields": ["speed"]})
+
+
+def test_sink_must_implement_send():
+    with pytest.raises(TypeError):
+        TelemetrySink()
+
+
+def test_udp_sink_sends_one_json_datagram_per_sample():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(1)
+    sink = UdpSink("127.0.0.1", receiver.getsockname()[1], fields=["timestamp", "lat", "armed"])
+    sink.start()
+
+    sink.offer(sample())
+
+    assert json.loads(receiver.recv(4096)) == {"timestamp": 1000.0, "lat": 49.2578, "armed": True}
+    receiver.close()
+
+
+def test_file_sink_appends_json_lines(tmp_path):
+    path = tmp_path / "track.jsonl"
+    path.write_text(json.dumps({"lat": 0}) + "\n")
+    sink = FileSink(str(path))
+    sink.start()
+
+    sink.offer(sample(0))
+    sink.offer(sample(1))
+    assert wait_until(lambda: sink.sent == 2)
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert lines == [{"lat": 0}, sample(0), sample(1)]
+
+
+def test_failing_and_slow_sinks_do_not_affect_the_others():
+    received = []
+    release = threading.Event()
+
+    def fail(record):
+        raise ValueError("unreachable")
+
+    fanout = SinkFanout()
+    failing = fanout.add(CallbackSink(fail))
+    slow = fanout.add(CallbackSink(lambda record: release.wait(), queue_size=2))
+    healthy = fanout.add(CallbackSink(received.append, queue_size=20))
+
+    start = time.monotonic()
+    for i in range(10):
+        fanout.publish(sample(i))
+    # the telemetry thread is never held up by a sink
+    assert time.monotonic() - start < 0.1
+
+    assert wait_until(lambda: len(received) == 10 and failing.errors == 10)
+    assert [record["alt"] for record in received] == [100.0 + i for i in range(10)]
+    # the blocked sink keeps the newest samples and drops the rest
+    assert slow.dropped >= 7
+    release.set()
+    assert wait_until(lambda: slow.sent + slow.dropped == 10)
+    assert failing.stats() == {"type": "CallbackSink", "sent": 0, "dropped": 0, "errors": 10}
+
+
+def test_rate_limit_skips_samples():
+    received = []
+    sink = CallbackSink(received.append, rate=10)
+    sink.start()
+
+    for i in range(3):
+        sink.offer(sample(i))
+    time.sleep(0.12)
+    sink.offer(sample(3))
+
+    assert wait_until(lambda: len(received) == 2)
+    assert [record["alt"] for record in received] == [100.0, 103.0]
+
+
+def test_removed_sink_gets_no_more_samples():
+    received = []
+    fanout = SinkFanout()
+    sink = fanout.add(CallbackSink(received.append))
+
+    fanout.publish(sample(0))
+    fanout.remove(sink)
+    fanout.publish(sample(1))
+
+    assert wait_until(lambda: sink.sent == 1)
+    time.sleep(0.02)
+    assert received == [sample(0)]
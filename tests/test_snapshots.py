@@ -0,0 +1,59 @@
+import threading
+import time
+
+from src.library.snapshots import SnapshotStore
+from src.library.waiters import MessageWaiters
+
+
+def receive(store, msg_type, msg):
+    """what the telemetry dispatch does for each message"""
+    store.update(msg_type, msg)
+    store.waiters.notify(msg_type, msg)
+
+
+def receive_later(store, msg_type, msg, delay=0.05):
+    timer = threading.Timer(delay, receive, (store, msg_type, msg))
+    timer.start()
+    return timer
+
+
+def test_fresh_snapshot_is_returned_without_waiting():
+    store = SnapshotStore(MessageWaiters())
+    receive(store, "VFR_HUD", "first")
+    receive(store, "VFR_HUD", "second")
+
+    snapshot = store.latest("VFR_HUD", max_age=1, timeout=0)
+
+    assert snapshot.msg == "second"
+    assert snapshot.seq == 2
+
+
+def test_stale_snapshot_waits_for_the_next_message():
+    store = SnapshotStore(MessageWaiters())
+    receive(store, "VFR_HUD", "old")
+    store.get("VFR_HUD").received -= 1
+    receive_later(store, "VFR_HUD", "new")
+
+    snapshot = store.latest("VFR_HUD", max_age=0.5, timeout=1)
+
+    assert snapshot.msg == "new"
+    assert snapshot.age() < 0.5
+
+
+def test_predicate_skips_messages():
+    store = SnapshotStore(MessageWaiters())
+    receive_later(store, "COMMAND_ACK", 1, delay=0.02)
+    receive_later(store, "COMMAND_ACK", 2, delay=0.05)
+
+    snapshot = store.latest("COMMAND_ACK", max_age=0, timeout=1, predicate=lambda msg: msg == 2)
+
+    assert snapshot.msg == 2
+
+
+def test_timeout_returns_none():
+    store = SnapshotStore(MessageWaiters())
+
+    start = time.monotonic()
+    assert store.latest("HEARTBEAT", max_age=1, timeout=0.05) is None
+    assert time.monotonic() - start >= 0.05
+    assert store.get("HEARTBEAT") is None
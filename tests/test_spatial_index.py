@@ -0,0 +1,64 @@
+import numpy as np
+
+from src.library.planner import CircleObstacle, PolygonObstacle, segment_distance
+from src.library.spatial_index import SpatialIndex
+
+SHAPES = [
+    PolygonObstacle([(0, 0), (100, 0), (100, 100), (0, 100)]),
+    CircleObstacle(300, 50, 40),
+    # concave, a U opening to the north
+    PolygonObstacle([(500, 0), (700, 0), (700, 200), (650, 200), (650, 50), (550, 50), (550, 200), (500, 200)]),
+]
+
+
+def brute_force_crossings(starts, ends):
+    pairs = set()
+    for index, shape in enumerate(SHAPES):
+        if isinstance(shape, CircleObstacle):
+            hit = segment_distance(starts, ends, shape.center, shape.center) < shape.radius
+        else:
+            a, b = shape.vertices, np.roll(shape.vertices, -1, axis=0)
+            hit = segment_distance(starts[:, None], ends[:, None], a[None], b[None]).min(axis=1) < 1e-6
+        pairs.update((i, index) for i in np.flatnonzero(hit))
+    return pairs
+
+
+def test_crossings():
+    index = SpatialIndex(SHAPES, cell_size=30)
+    starts = np.array([[-50, 50], [200, 50], [600, 100], [600, 100], [-50, -50], [50, 50], [150, 250]])
+    ends = np.array([[50, 50], [400, 50], [600, 300], [800, 100], [-50, 500], [60, 60], [1000, 250]])
+
+    segments, shapes = index.crossings(starts, ends)
+
+    assert set(zip(segments.tolist(), shapes.tolist())) == {(0, 0), (1, 1), (3, 2)}
+
+
+def test_crossings_match_brute_force():
+    rng = np.random.default_rng(0)
+    starts = rng.uniform(-100, 800, (500, 2))
+    ends = starts + rng.uniform(-300, 300, (500, 2))
+    # along grid lines and degenerate
+    ends[:20, 0] = starts[:20, 0]
+    ends[20:40, 1] = starts[20:40, 1]
+    ends[40:50] = starts[40:50]
+
+    for cell_size in [7, 50, 1000]:
+        segments, shapes = SpatialIndex(SHAPES, cell_size).crossings(starts, ends)
+        assert set(zip(segments.tolist(), shapes.tolist())) == brute_force_crossings(starts, ends)
+
+
+def test_containing():
+    index = SpatialIndex(SHAPES, cell_size=30)
+    points = np.array([[50, 50], [300, 60], [600, 150], [600, 25], [200, 200]])
+
+    point_ids, shapes = index.containing(points)
+
+    # the third point is in the U's opening
+    assert set(zip(point_ids.tolist(), shapes.tolist())) == {(0, 0), (1, 1), (3, 2)}
+
+
+def test_empty_index():
+    index = SpatialIndex([], cell_size=30)
+
+    assert [len(a) for a in index.crossings([[0, 0]], [[10, 10]])] == [0, 0]
+    assert [len(a) for a in index.containing([[0, 0]])] == [0, 0]
@@ -0,0 +1,125 @@
+import os
+
+from src.library.spool import RECORD, SEGMENT_MAGIC, TelemetrySpool
+
+# three records per segment
+SEGMENT_BYTES = len(SEGMENT_MAGIC) + 3 * RECORD.size
+
+
+def payload(i):
+    return {
+        "latitude_dege7": 492600000 + i,
+        "longitude_dege7": -1232400000,
+        "altitude_msl_m": 100.0 + i,
+        "heading_deg": None,
+        "groundspeed_m_s": 12.0,
+        "winch_status": 0,
+    }
+
+
+def fill(spool, count, start=0):
+    for i in range(start, start + count):
+        spool.append(float(i), payload(i))
+
+
+def timestamps(batch):
+    return [sample["timestamp"] for sample in batch]
+
+
+def segment_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".seg"))
+
+
+def test_rolls_over_into_new_segments(tmp_path):
+    spool = TelemetrySpool(str(tmp_path), SEGMENT_BYTES, 10000)
+    fill(spool, 7)
+
+    assert len(segment_files(tmp_path)) == 3
+    assert spool.pending() == 7
+
+    batch, cursor = spool.read_batch(10)
+    # a batch never spans segments
+    assert timestamps(batch) == [0.0, 1.0, 2.0]
+    assert batch[0]["heading_deg"] is None
+    assert batch[0]["altitude_msl_m"] == 100.0
+    spool.commit(cursor, len(batch))
+
+    batch, cursor = spool.read_batch(10)
+    assert timestamps(batch) == [3.0, 4.0, 5.0]
+    assert len(segment_files(tmp_path)) == 2
+
+
+def test_size_cap_evicts_the_oldest_segments(tmp_path):
+    spool = TelemetrySpool(str(tmp_path), SEGMENT_BYTES, 2 * SEGMENT_BYTES)
+    fill(spool, 9)
+
+    assert len(segment_files(tmp_path)) == 2
+    assert spool.evicted == 3
+    assert spool.pending() == 6
+    assert timestamps(spool.read_batch(10)[0]) == [3.0, 4.0, 5.0]
+
+
+def test_unacknowledged_batch_is_read_again(tmp_path):
+    spool = TelemetrySpool(str(tmp_path), SEGMENT_BYTES, 10000)
+    fill(spool, 3)
+
+    first, cursor = spool.read_batch(2)
+    again, _ = spool.read_batch(2)
+    assert timestamps(again) == timestamps(first) == [0.0, 1.0]
+
+    spool.commit(cursor, len(first))
+    # a second ack of the same batch is stale and ignored
+    spool.commit(cursor, len(first))
+
+    batch, _ = spool.read_batch(2)
+    assert timestamps(batch) == [2.0]
+    assert spool.pending() == 1
+
+
+def test_commit_after_eviction_is_ignored(tmp_path):
+    spool = TelemetrySpool(str(tmp_path), SEGMENT_BYTES, 2 * SEGMENT_BYTES)
+    fill(spool, 3)
+    batch, cursor = spool.read_batch(3)
+    fill(spool, 6, start=3)
+
+    spool.commit(cursor, len(batch))
+
+    assert spool.pending() == 6
+
+
+def test_restart_resumes_after_the_delivered_samples(tmp_path):
+    spool = TelemetrySpool(str(tmp_path), SEGMENT_BYTES, 10000)
+    fill(spool, 5)
+    batch, cursor = spool.read_batch(2)
+    spool.commit(cursor, len(batch))
+
+    restarted = TelemetrySpool(str(tmp_path), SEGMENT_BYTES, 10000)
+
+    assert restarted.pending() == 3
+    assert timestamps(restarted.read_batch(10)[0]) == [2.0]
+
+
+def test_restart_after_everything_was_delivered(tmp_path):
+    spool = TelemetrySpool(str(tmp_path), SEGMENT_BYTES, 10000)
+    fill(spool, 2)
+    batch, cursor = spool.read_batch(10)
+    spool.commit(cursor, len(batch))
+
+    restarted = TelemetrySpool(str(tmp_path), SEGMENT_BYTES, 10000)
+    assert restarted.pending() == 0
+    fill(restarted, 1, start=2)
+
+    assert timestamps(restarted.read_batch(10)[0]) == [2.0]
+
+
+def test_corrupt_segment_is_skipped(tmp_path):
+    spool = TelemetrySpool(str(tmp_path), SEGMENT_BYTES, 10000)
+    fill(spool, 6)
+    with open(os.path.join(str(tmp_path), segment_files(tmp_path)[0]), "r+b") as f:
+        f.write(b"junk!")
+
+    restarted = TelemetrySpool(str(tmp_path), SEGMENT_BYTES, 10000)
+
+    assert restarted.pending() == 3
+    assert timestamps(restarted.read_batch(10)[0]) == [3.0, 4.0, 5.0]
+    assert "0000000000.seg.corrupt" in os.listdir(str(tmp_path))
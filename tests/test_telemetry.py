@@ -1,14 +1,24 @@
 import pytest
 import json
+import time
 from unittest.mock import patch
+from src.library.history import TelemetryHistory
+from src.library.responses import ResponseCache
+from src.library.stream import TelemetryStream
+from src.library.uplink import UplinkStats
 from src.library.vehicle import Vehicle
 
 flightmode_endpoint = "/aircraft/telemetry/flightmode"
 gps_endpoint = "/aircraft/telemetry/gps"
+gps_with_timestamp_endpoint = "/aircraft/telemetry/gps_with_timestamp"
 heartbeat_endpoint = "/aircraft/telemetry/heartbeat"
+history_endpoint = "/aircraft/telemetry/history"
+stream_endpoint = "/aircraft/telemetry/stream"
+uplink_endpoint = "/aircraft/telemetry/uplink"
 
 
-telemetry_endpoints = [flightmode_endpoint, gps_endpoint, heartbeat_endpoint]
+telemetry_endpoints = [flightmode_endpoint, gps_endpoint, heartbeat_endpoint, history_endpoint, stream_endpoint,
+                       uplink_endpoint]
 
 
 @patch("src.routes.aircraft.controllers.vehicle")
@@ -42,6 +52,8 @@ def test_gps_calls_vehicle_get_location(vehicle: Vehicle, app):
     }
 
     vehicle.telemetry.get_location.return_value = test_location
+    # before the first position message
+    vehicle.telemetry.responses = ResponseCache()
 
     response = app.get(gps_endpoint)
 
@@ -62,8 +74,151 @@ def test_heartbeat_calls_vehicle_telemetry_heartbeat(vehicle: Vehicle, app):
     }
 
     vehicle.telemetry.heartbeat.to_dict.return_value = test_heartbeat
+    vehicle.telemetry.responses = ResponseCache()
 
     response = app.get(heartbeat_endpoint)
 
     assert response.status_code == 200
     assert json.loads(response.data) == test_heartbeat
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_gps_served_from_the_response_cache(vehicle: Vehicle, app):
+    location = {"lat": 1, "lng": 2, "alt": 3, "heading": 4}
+    vehicle.telemetry.responses = ResponseCache()
+    vehicle.telemetry.responses.update("gps", location, timestamp=1700000000.0)
+    vehicle.telemetry.responses.update("gps_with_timestamp", dict(location, timestamp=1700000000),
+                                       timestamp=1700000000.0)
+
+    response = app.get(gps_endpoint)
+
+    assert response.status_code == 200
+    assert json.loads(response.data) == location
+    assert response.headers["X-Telemetry-Timestamp"] == "1700000000.000"
+    assert float(response.headers["X-Telemetry-Age"]) < 1
+    vehicle.telemetry.get_location.assert_not_called()
+
+    response = app.get(gps_with_timestamp_endpoint)
+    assert json.loads(response.data) == dict(location, timestamp=1700000000)
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_conditional_get_until_the_value_changes(vehicle: Vehicle, app):
+    vehicle.telemetry.responses = ResponseCache()
+    vehicle.telemetry.responses.update("heartbeat", {"type": 2, "base_mode": 81})
+    etag = app.get(heartbeat_endpoint).headers["ETag"]
+
+    # the same heartbeat again keeps its ETag
+    vehicle.telemetry.responses.update("heartbeat", {"type": 2, "base_mode": 81})
+    response = app.get(heartbeat_endpoint, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+    vehicle.telemetry.responses.update("heartbeat", {"type": 2, "base_mode": 209})
+    response = app.get(heartbeat_endpoint, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert json.loads(response.data) == {"type": 2, "base_mode": 209}
+    assert response.headers["ETag"] != etag
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_history_returns_window_and_aggregates(vehicle: Vehicle, app):
+    history = TelemetryHistory(100)
+    now = time.monotonic()
+    # 20 samples at 10hz, climbing 1m per sample; the oldest ten are outside the window
+    for i in range(20):
+        history.record(now - 1.9 + i * 0.1, 49.25, -123.24, 100 + i, 90, 12, True)
+    vehicle.telemetry.history = history
+
+    response = app.get(history_endpoint + "?seconds=1")
+    data = json.loads(response.data)
+
+    assert response.status_code == 200
+    assert data["count"] == 10
+    assert data["samples"]["alt"] == [110 + i for i in range(10)]
+    assert data["aggregates"]["alt"]["min"] == 110
+    assert data["aggregates"]["alt"]["max"] == 119
+    assert data["aggregates"]["alt"]["rate"] == pytest.approx(10)
+    assert data["sample_rate"] == pytest.approx(10)
+    # served as unix time, armed as a bool
+    assert data["samples"]["timestamp"][-1] == pytest.approx(time.time(), abs=0.5)
+    assert data["samples"]["armed"] == [True] * 10
+
+    response = app.get(history_endpoint + "?seconds=1&maxPoints=5")
+    data = json.loads(response.data)
+
+    assert data["samples"]["alt"] == [110, 112, 114, 116, 118]
+    assert data["count"] == 10
+
+
+def test_history_window_ignores_system_clock_steps():
+    history = TelemetryHistory(10)
+    now = time.monotonic()
+    for i in range(5):
+        history.record(now - 0.4 + i * 0.1, 49.25, -123.24, 100 + i, 90, 12, False)
+
+    # an NTP step back by an hour changes nothing for the window
+    with patch("src.library.history.time.time", return_value=time.time() - 3600):
+        summary = history.summary(now - 0.25)
+
+    assert summary["count"] == 3
+    assert summary["samples"]["armed"] == [False] * 3
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_history_rejects_invalid_window(vehicle: Vehicle, app):
+    response = app.get(history_endpoint + "?seconds=-1")
+
+    assert response.status_code == 400
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_stream_sends_newest_value_of_subscribed_channels(vehicle: Vehicle, app):
+    stream = TelemetryStream()
+    vehicle.telemetry.stream = stream
+
+    response = app.get(stream_endpoint + "?channels=gps&rate=50")
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+
+    # the client has not read yet, so only the newest gps value is sent
+    stream.publish("gps", lambda: {"lat": 1, "lng": 2, "alt": 3, "heading": 4})
+    stream.publish("gps", lambda: {"lat": 5, "lng": 6, "alt": 7, "heading": 8})
+    stream.publish("speed", lambda: {"groundspeed": 9})
+
+    event = next(response.response)
+    if event == b": connected\n\n":
+        event = next(response.response)
+    assert event == b'event: gps\ndata: {"lat": 5, "lng": 6, "alt": 7, "heading": 8}\n\n'
+
+    response.close()
+    assert stream.subscribers == ()
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_stream_rejects_unknown_channel(vehicle: Vehicle, app):
+    response = app.get(stream_endpoint + "?channels=gps,attitude")
+
+    assert response.status_code == 400
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def test_uplink_returns_uplink_stats(vehicle: Vehicle, app):
+    stats = UplinkStats()
+    for i in range(5):
+        stats.on_send(i * 0.1)
+        stats.on_response(i != 4, 0.02)
+    stats.on_error(Exception("timed out"))
+    vehicle.uplink.stats = stats
+
+    response = app.get(uplink_endpoint)
+    data = json.loads(response.data)
+
+    assert response.status_code == 200
+    assert data["sent"] == 5
+    assert data["ok"] == 4
+    assert data["failed"] == 1
+    assert data["errors"] == 1
+    assert data["last_error"] == "timed out"
+    assert data["rate_hz"] == pytest.approx(10)
+    assert data["jitter_ms"] == pytest.approx(0, abs=1e-6)
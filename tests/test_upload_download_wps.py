@@ -135,3 +135,74 @@ def testUploadDownloadNonEmpty(app):
     # first and last WPs
     assert response.status_code == 200
     assert len(responseData["wps"]) == 4
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def testDownloadCachedMission(vehicle: Vehicle, app):
+    global mission_endpoint
+    mission = {
+        "homePos": {"lat": 49.2578, "lng": -123.247, "alt": 80},
+        "rtl": True,
+        "takeoffAlt": 12,
+        "airdrop": {"lat": 0, "lng": 0, "alt": 0},
+        "wps": [{"lat": 49.2572585, "lng": -123.2423108, "alt": 77}],
+    }
+    vehicle.waypoints.get_mission.return_value = ("5f1a-3", mission)
+
+    response = app.get(mission_endpoint)
+
+    # served with the version of the cached copy
+    assert response.status_code == 200
+    assert json.loads(response.data) == mission
+    assert response.headers["ETag"] == '"5f1a-3"'
+    vehicle.waypoints.get_mission.assert_called_with(refresh=False)
+
+    # unchanged since the client's copy
+    response = app.get(mission_endpoint, headers={"If-None-Match": '"5f1a-3"'})
+    assert response.status_code == 304
+
+    # forced download
+    response = app.get(mission_endpoint + "?refresh=true", headers={"If-None-Match": '"5f1a-2"'})
+    assert response.status_code == 200
+    vehicle.waypoints.get_mission.assert_called_with(refresh=True)
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def testDownloadMissionFailure(vehicle: Vehicle, app):
+    global mission_endpoint
+    vehicle.waypoints.get_mission.side_effect = Exception("Waypoints failed to download")
+
+    response = app.get(mission_endpoint)
+
+    assert response.status_code == 504
+
+
+@patch("src.routes.aircraft.controllers.vehicle")
+def testPatchMission(vehicle: Vehicle, app):
+    global mission_endpoint
+    missionReq = {
+        "takeoffAlt": 12,
+        "wps": [
+            {"lat": 49.2572585, "lng": -123.2423108, "alt": 77},
+            {"lat": 49.255752, "lng": -123.241613, "alt": 10},
+        ],
+        "rtl": True,
+    }
+    vehicle.waypoints.patch_mission_wps.return_value = (2, 1)
+
+    response = app.patch(
+        mission_endpoint, data=json.dumps(missionReq), content_type="application/json"
+    )
+    responseData = json.loads(response.data)
+
+    # only the changed item was sent
+    assert response.status_code == 200
+    assert responseData["wps_uploaded"] == 2
+    assert responseData["items_sent"] == 1
+    vehicle.waypoints.patch_mission_wps.assert_called_with(missionReq["wps"], 12, True)
+
+    # same validation as an upload
+    response = app.patch(
+        mission_endpoint, data=json.dumps({"wps": []}), content_type="application/json"
+    )
+    assert response.status_code == 402
@@ -0,0 +1,110 @@
+import threading
+import time
+
+from src.library.waiters import MessageWaiters
+
+
+def notify_later(waiters, msg_type, msg, delay=0.05):
+    timer = threading.Timer(delay, waiters.notify, (msg_type, msg))
+    timer.start()
+    return timer
+
+
+def test_wait_returns_the_next_message():
+    waiters = MessageWaiters()
+    notify_later(waiters, "HEARTBEAT", "hb")
+
+    assert waiters.wait("HEARTBEAT", timeout=1) == "hb"
+    assert waiters.waiters == {}
+
+
+def test_wait_times_out_and_unregisters():
+    waiters = MessageWaiters()
+
+    start = time.monotonic()
+    assert waiters.wait("HEARTBEAT", timeout=0.05) is None
+    assert time.monotonic() - start >= 0.05
+    assert waiters.waiters == {}
+
+
+def test_predicate_skips_messages():
+    waiters = MessageWaiters()
+    future = waiters.register("COMMAND_ACK", predicate=lambda msg: msg == 2)
+
+    waiters.notify("COMMAND_ACK", 1)
+    assert not future.done()
+    waiters.notify("COMMAND_ACK", 2)
+
+    assert future.result(0) == 2
+    assert waiters.waiters == {}
+
+
+def test_unregister_only_pending_futures():
+    waiters = MessageWaiters()
+    pending = waiters.register("HEARTBEAT")
+    resolved = waiters.register("VFR_HUD")
+    waiters.notify("VFR_HUD", "hud")
+
+    assert waiters.unregister("HEARTBEAT", pending)
+    assert not waiters.unregister("HEARTBEAT", pending)
+    assert not waiters.unregister("VFR_HUD", resolved)
+
+
+def test_cancelled_future_does_not_block_the_others():
+    waiters = MessageWaiters()
+    cancelled = waiters.register("HEARTBEAT")
+    other = waiters.register("HEARTBEAT")
+    cancelled.cancel()
+
+    waiters.notify("HEARTBEAT", "hb")
+
+    assert cancelled.cancelled()
+    assert other.result(0) == "hb"
+
+
+def test_concurrent_waiters_each_get_one_message():
+    waiters = MessageWaiters()
+    results = []
+    lock = threading.Lock()
+
+    def wait():
+        msg = waiters.wait("HEARTBEAT", timeout=2)
+        with lock:
+            results.append(msg)
+
+    threads = [threading.Thread(target=wait) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    def notify(n):
+        # until every waiter has been resolved
+        while any(thread.is_alive() for thread in threads):
+            waiters.notify("HEARTBEAT", n)
+
+    notifiers = [threading.Thread(target=notify, args=(n,)) for n in range(4)]
+    for thread in notifiers:
+        thread.start()
+    for thread in threads + notifiers:
+        thread.join()
+
+    assert len(results) == 20
+    assert None not in results
+
+
+def test_timeout_racing_notify_never_loses_a_message():
+    waiters = MessageWaiters()
+    stop = threading.Event()
+
+    def notify():
+        while not stop.is_set():
+            waiters.notify("HEARTBEAT", "hb")
+
+    notifier = threading.Thread(target=notify)
+    notifier.start()
+    try:
+        results = [waiters.wait("HEARTBEAT", timeout=0.0001) for _ in range(200)]
+    finally:
+        stop.set()
+        notifier.join()
+
+    assert set(results) <= {None, "hb"}
+    assert waiters.waiters == {}
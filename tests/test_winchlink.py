@@ -0,0 +1,124 @@
+import queue
+import threading
+import time
+from unittest.mock import patch
+
+from src.library.vehicle import Vehicle
+from src.library.winchlink import WinchLink
+
+
+class FakePort:
+    """serial port whose incoming bytes are fed by the test, in arbitrary chunks"""
+
+    def __init__(self):
+        self.incoming = queue.Queue()
+        self.written = []
+        self.timeout = None
+        self.in_waiting = 0
+
+    def feed(self, data):
+        self.incoming.put(data)
+
+    def read(self, size=1):
+        try:
+            return self.incoming.get(timeout=self.timeout)
+        except queue.Empty:
+            return b""
+
+    def write(self, data):
+        self.written.append((time.monotonic(), data.decode()))
+
+    def close(self):
+        pass
+
+
+class FakeArduino:
+    """ArduinoConnector over a WinchLink and a FakePort"""
+
+    def __init__(self, link):
+        self.link = link
+
+    def sendCommandMessage(self, message, acks=(), timeout=None):
+        return self.link.send(message, acks, timeout)
+
+    def nextEvent(self, timeout=None):
+        return self.link.next_event(timeout)
+
+
+def test_lines_framed_across_reads():
+    port = FakePort()
+    link = WinchLink(port, read_timeout=0.05)
+    link.start()
+
+    port.feed(b"AIRDROP")
+    port.feed(b"ERROR\r\nAIRDROPCOMPLETE\r\nnoise")
+    port.feed(b"\r\n")
+
+    events = [link.next_event(timeout=1) for _ in range(3)]
+    link.stop()
+    assert [(event.type, event.line) for event in events] == [
+        ("error", "AIRDROPERROR"), ("complete", "AIRDROPCOMPLETE"), ("unknown", "noise")]
+
+
+def test_command_acknowledged_by_its_reply():
+    port = FakePort()
+    link = WinchLink(port, read_timeout=0.05)
+    link.start()
+
+    command = link.send("AIRDROPBEGIN1", acks=("AIRDROPCOMPLETE",), timeout=5)
+    assert port.written[-1][1] == "AIRDROPBEGIN1"
+    assert command.state == "pending"
+
+    port.feed(b"AIRDROPCOMPLETE\n")
+    assert command.wait(timeout=1)
+    event = link.next_event(timeout=1)
+    link.stop()
+    assert event.type == "complete" and event.command is command
+
+
+def test_command_times_out_at_its_deadline():
+    port = FakePort()
+    link = WinchLink(port, read_timeout=0.05)
+    link.start()
+
+    command = link.send("AIRDROPBEGIN1", acks=("AIRDROPCOMPLETE",), timeout=0.2)
+    event = link.next_event(timeout=1)
+    link.stop()
+
+    assert event.type == "timeout" and event.command is command
+    assert not command.wait(0) and command.state == "expired"
+
+
+def test_drop_completes_on_the_winch_event():
+    port = FakePort()
+    link = WinchLink(port, read_timeout=0.05)
+    link.start()
+    vehicle = Vehicle()
+
+    threading.Timer(0.2, port.feed, [b"AIRDROPERROR\nAIRDROPCOMPLETE\n"]).start()
+    with patch.object(vehicle, "set_auto") as set_auto:
+        assert vehicle.drop_payload(FakeArduino(link))
+    link.stop()
+
+    set_auto.assert_called_once()
+    assert vehicle.winch_status == 4
+
+
+def test_emergency_reel_cancels_within_a_read_cycle():
+    port = FakePort()
+    link = WinchLink(port, read_timeout=0.05)
+    link.start()
+    vehicle = Vehicle()
+
+    def reel():
+        reel.requested = time.monotonic()
+        vehicle.winch_status = 5
+    threading.Timer(0.2, reel).start()
+    with patch("src.library.vehicle.config", {"winch": {"readTimeout": 0.05, "dropTimeout": 120}}):
+        assert not vehicle.drop_payload(FakeArduino(link))
+    link.stop()
+
+    cancelled, message = port.written[-1]
+    assert message == "AIRDROPCANCEL1"
+    assert cancelled - reel.requested < 0.1
+    assert vehicle.winch_status == 1